@@ -1,2 +1,2 @@
 # Initialisation du module API
-from . import repos
+from . import export, profiling, repos, scheduler, singleflight, webhooks
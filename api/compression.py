@@ -0,0 +1,204 @@
+import gzip
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Sans brotli, seul gzip est proposé
+    brotli = None
+
+# Taille minimale (octets) en dessous de laquelle la compression ne vaut pas le coût
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+# Qualité brotli pour les réponses dynamiques (11 est réservé aux assets précompressés)
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+# Flux d'événements : chaque événement doit partir immédiatement, jamais retenu par un compresseur
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+def supported_encodings():
+    """Encodages proposés par ordre de préférence"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding, available=None):
+    """
+    Choisit le meilleur encodage accepté par le client (en-tête Accept-Encoding).
+    Respecte les facteurs de qualité (q=0 exclut un encodage).
+    Retourne None si aucun encodage commun n'est trouvé.
+    """
+    available = supported_encodings() if available is None else available
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for token in accept_encoding.split(","):
+        parts = token.strip().split(";")
+        name = parts[0].strip().lower()
+        quality = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            qualities[name] = quality
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type):
+    """Indique si un type de contenu gagne à être compressé"""
+    if not content_type:
+        return False
+    content_type = content_type.split(";")[0].strip().lower()
+    if content_type in UNCOMPRESSED_TYPES:
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES) or content_type.endswith("+json")
+
+
+def compress(data, encoding):
+    """Compresse un corps de réponse complet"""
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Encodage non supporté: {encoding}")
+
+
+class _StreamCompressor:
+    """Compression incrémentale pour les réponses envoyées en plusieurs morceaux"""
+
+    def __init__(self, encoding):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress = self._compressor.process
+            self._sync = self._compressor.flush
+            self._flush = self._compressor.finish
+        else:
+            # wbits=31 : conteneur gzip
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._compress = self._compressor.compress
+            self._sync = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._flush = self._compressor.flush
+
+    def compress(self, data, flush=True):
+        """Morceau compressé ; vidé (`flush`) pour que le client le décode sans attendre la suite"""
+        data = self._compress(data)
+        return data + self._sync() if flush else data
+
+    def finish(self):
+        return self._flush()
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI de compression négociée (brotli ou gzip).
+    Les réponses plus petites que `minimum_size`, déjà encodées ou d'un type
+    non compressible sont transmises telles quelles.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        encoding = negotiate_encoding(headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressedResponder:
+    def __init__(self, app, encoding, minimum_size):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message):
+        if message["type"] == "http.response.start":
+            # On attend le premier morceau du corps pour décider
+            self.start_message = message
+            headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in message["headers"]}
+            self.passthrough = (
+                "content-encoding" in headers
+                or not is_compressible(headers.get("content-type"))
+                or "no-transform" in headers.get("cache-control", "")
+            )
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            if self.start_message is not None:
+                await self.send(self.start_message)
+                self.start_message = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if not more_body:
+                # Réponse en un seul morceau : compression directe si assez grande
+                if len(body) < self.minimum_size:
+                    await self.send(start)
+                    await self.send(message)
+                    return
+                body = compress(body, self.encoding)
+                start["headers"] = self._headers(start["headers"], len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            # Réponse en flux : compression incrémentale
+            self.compressor = _StreamCompressor(self.encoding)
+            start["headers"] = self._headers(start["headers"], None)
+            await self.send(start)
+
+        data = self.compressor.compress(body, flush=more_body)
+        if not more_body:
+            data += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def _headers(self, raw_headers, length):
+        headers = [
+            (key, value) for key, value in raw_headers
+            if key.lower() not in (b"content-length", b"vary", b"etag")
+        ]
+        # Le corps encodé diffère : un ETag fort ne peut plus être réutilisé tel quel
+        for key, value in raw_headers:
+            if key.lower() == b"etag":
+                headers.append((b"etag", value if value.startswith(b"W/") else b"W/" + value))
+        vary = [value.decode("latin-1") for key, value in raw_headers if key.lower() == b"vary"]
+        vary.append("Accept-Encoding")
+        headers.append((b"vary", ", ".join(vary).encode("latin-1")))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode("latin-1")))
+        return headers
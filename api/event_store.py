@@ -0,0 +1,125 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Statuts de pipeline définitifs
+FINAL_PIPELINE_STATUSES = ("success", "failed", "canceled", "skipped")
+# Nombre maximal de projets suivis en mémoire
+MAX_TRACKED_PROJECTS = int(os.getenv("EVENT_STORE_MAX_PROJECTS", "5000"))
+
+
+class ForgeEventStore:
+    """
+    Stockage en mémoire de l'état des projets alimenté par les webhooks de la forge.
+    Conserve le dernier pipeline connu et les métadonnées de chaque dépôt, et
+    réveille les tâches qui attendent la fin d'un pipeline.
+    """
+
+    def __init__(self, max_projects: int = MAX_TRACKED_PROJECTS):
+        self.max_projects = max_projects
+        self._projects: "OrderedDict[int, Dict]" = OrderedDict()
+        # (project_id, pipeline_id) -> événements asyncio à réveiller
+        self._waiters: Dict[tuple, asyncio.Event] = {}
+
+    def _entry(self, project_id: int) -> Dict:
+        entry = self._projects.get(project_id)
+        if entry is None:
+            entry = {"project_id": project_id, "pipeline": None, "repo": {}, "head": None, "updated_at": None}
+            self._projects[project_id] = entry
+            while len(self._projects) > self.max_projects:
+                self._projects.popitem(last=False)
+        else:
+            self._projects.move_to_end(project_id)
+        entry["updated_at"] = time.time()
+        return entry
+
+    def record_pipeline(self, project_id: int, pipeline: Dict):
+        """Enregistre l'état d'un pipeline (webhook ou interrogation de la forge)"""
+        entry = self._entry(project_id)
+        current = entry["pipeline"]
+        # Ignorer un événement plus ancien que le pipeline déjà connu
+        if current and pipeline.get("id") and current.get("id") and pipeline["id"] < current["id"]:
+            return
+        entry["pipeline"] = {
+            "id": pipeline.get("id"),
+            "status": pipeline.get("status", ""),
+            "ref": pipeline.get("ref"),
+            "sha": pipeline.get("sha"),
+            "pages_deployed": pipeline.get("pages_deployed", False),
+        }
+        waiter = self._waiters.get((project_id, pipeline.get("id")))
+        if waiter and pipeline.get("status") in FINAL_PIPELINE_STATUSES:
+            waiter.set()
+
+    def record_push(self, project_id: int, ref: Optional[str], sha: Optional[str], project: Optional[Dict] = None):
+        """Enregistre le nouveau commit de tête poussé sur une branche"""
+        entry = self._entry(project_id)
+        entry["head"] = {"ref": ref, "sha": sha}
+        if project:
+            self.record_repo(project_id, project)
+
+    def record_repo(self, project_id: int, metadata: Dict):
+        """Met à jour les métadonnées connues d'un dépôt"""
+        entry = self._entry(project_id)
+        entry["repo"].update({key: value for key, value in metadata.items() if value is not None})
+
+    def forget(self, project_id: int):
+        """Oublie un projet supprimé"""
+        self._projects.pop(project_id, None)
+
+    def get(self, project_id: int) -> Optional[Dict]:
+        return self._projects.get(project_id)
+
+    def snapshot(self, project_ids) -> Dict[int, Dict]:
+        """État connu d'un ensemble de projets (les projets inconnus sont omis)"""
+        return {project_id: self._projects[project_id] for project_id in project_ids if project_id in self._projects}
+
+    async def wait_for_pipeline(self, project_id: int, pipeline_id: int, timeout: float) -> Optional[str]:
+        """
+        Attend qu'un pipeline atteigne un statut définitif.
+        Retourne ce statut, ou None si le délai expire avant.
+        """
+        entry = self._projects.get(project_id)
+        pipeline = entry["pipeline"] if entry else None
+        if pipeline and pipeline["id"] == pipeline_id and pipeline["status"] in FINAL_PIPELINE_STATUSES:
+            return pipeline["status"]
+        key = (project_id, pipeline_id)
+        waiter = self._waiters.setdefault(key, asyncio.Event())
+        try:
+            await asyncio.wait_for(waiter.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            # Un attendant encore actif retombera sur l'interrogation de secours
+            if self._waiters.get(key) is waiter:
+                del self._waiters[key]
+        pipeline = self._projects.get(project_id, {}).get("pipeline")
+        return pipeline["status"] if pipeline else None
+
+
+# Instance partagée par les routes de l'API
+store = ForgeEventStore()
+
+
+async def wait_for_pipeline(client, project_id: int, pipeline_id: int, timeout: float = 60, poll_interval: float = 5):
+    """
+    Attend la fin d'un pipeline en s'appuyant sur les webhooks.
+    La forge n'est interrogée qu'à intervalle `poll_interval`, en secours
+    si aucun événement n'arrive (webhook absent ou perdu).
+    """
+    deadline = time.monotonic() + timeout
+    status = None
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return status
+        status = await store.wait_for_pipeline(project_id, pipeline_id, min(poll_interval, remaining))
+        if status in FINAL_PIPELINE_STATUSES:
+            return status
+        pipeline = await client.get_pipeline_status(project_id, pipeline_id)
+        store.record_pipeline(project_id, pipeline)
+        status = pipeline.get("status")
+        if status in FINAL_PIPELINE_STATUSES:
+            return status
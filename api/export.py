@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import tempfile
+import time
+import zipfile
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from pydantic import BaseModel
+
+from .forge_client import ForgeClient
+from .responses import FastJSONResponse
+
+# Nombre maximal d'archives téléchargées en parallèle pour un export
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", "4"))
+# Au-delà de cette taille, une archive en attente est écrite sur disque plutôt qu'en mémoire
+EXPORT_SPOOL_BYTES = int(os.getenv("EXPORT_SPOOL_BYTES", str(8 * 1024 * 1024)))
+# Durée de conservation (secondes) de l'état d'un export pour le suivi et la reprise
+EXPORT_JOB_TTL = float(os.getenv("EXPORT_JOB_TTL", str(24 * 3600)))
+EXPORT_MAX_JOBS = 1000
+ARCHIVE_FORMATS = ("tar.gz", "zip", "tar.bz2", "tar")
+COPY_CHUNK_SIZE = 256 * 1024
+
+router = APIRouter()
+security = HTTPBasic()
+logger = logging.getLogger(__name__)
+
+
+class ExportRequest(BaseModel):
+    project_ids: Optional[List[int]] = None  # Absent : tous les dépôts dont l'utilisateur est membre
+    archive_format: str = "tar.gz"
+    resume: Optional[str] = None  # Identifiant d'un export interrompu à reprendre
+
+
+def _owner_key(credentials: HTTPBasicCredentials) -> str:
+    return hashlib.sha256(f"{credentials.username}:{credentials.password}".encode("utf-8")).hexdigest()
+
+
+class ExportJobs:
+    """État en mémoire des exports : progression par projet, consultable et reprenable"""
+
+    def __init__(self, ttl: float = EXPORT_JOB_TTL, max_jobs: int = EXPORT_MAX_JOBS):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def _purge(self):
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items() if now - job["updated_at"] > self.ttl]:
+            del self._jobs[job_id]
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+    def create(self, owner: str, projects: List[Dict], archive_format: str) -> Dict:
+        self._purge()
+        job = {
+            "id": secrets.token_urlsafe(12),
+            "owner": owner,
+            "archive_format": archive_format,
+            "created_at": time.time(),
+            "updated_at": time.time(),
+            "projects": OrderedDict(
+                (project["id"], {"name": project["path_with_namespace"], "status": "pending", "bytes": 0, "error": None})
+                for project in projects
+            ),
+        }
+        self._jobs[job["id"]] = job
+        return job
+
+    def get(self, job_id: str, owner: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        if job is None or job["owner"] != owner:
+            return None
+        return job
+
+    def update(self, job: Dict, project_id: int, **changes):
+        job["projects"][project_id].update(changes)
+        job["updated_at"] = time.time()
+
+    @staticmethod
+    def summary(job: Dict) -> Dict:
+        projects = job["projects"]
+        counts = {}
+        for entry in projects.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return {
+            "id": job["id"],
+            "archive_format": job["archive_format"],
+            "total": len(projects),
+            "counts": counts,
+            "projects": [{"project_id": project_id, **entry} for project_id, entry in projects.items()],
+        }
+
+
+jobs = ExportJobs()
+
+
+class _StreamSink:
+    """Destination non positionnable du ZipFile : les octets écrits sont récupérés par paquets"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _entry_name(project: Dict, archive_format: str) -> str:
+    name = re.sub(r"[^\w.@/-]+", "_", project["name"]).strip("/")
+    return f"{name}.{archive_format}"
+
+
+async def _download(client: ForgeClient, job: Dict, project_id: int, slots: asyncio.Semaphore, ready: asyncio.Queue):
+    """Télécharge une archive dans un fichier temporaire puis la signale comme prête"""
+    await slots.acquire()
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+    try:
+        jobs.update(job, project_id, status="downloading")
+        size = await client.download_archive(project_id, spool, job["archive_format"])
+        jobs.update(job, project_id, bytes=size)
+        spool.seek(0)
+        await ready.put((project_id, spool, None))
+    except asyncio.CancelledError:
+        spool.close()
+        slots.release()
+        raise
+    except Exception as e:
+        spool.close()
+        await ready.put((project_id, None, str(e)))
+
+
+def _copy_chunk(spool, member) -> int:
+    """Copie un morceau d'une archive en attente dans le ZIP ; 0 une fois l'archive entièrement copiée"""
+    chunk = spool.read(COPY_CHUNK_SIZE)
+    if chunk:
+        member.write(chunk)
+    return len(chunk)
+
+
+async def _stream_export(client: ForgeClient, job: Dict, project_ids: List[int]):
+    """
+    Produit le ZIP de l'export au fil de l'eau : chaque archive y est écrite dès
+    que son téléchargement est terminé. La mémoire reste bornée par
+    EXPORT_CONCURRENCY archives en attente, chacune au plus EXPORT_SPOOL_BYTES
+    en mémoire (le reste sur disque).
+    """
+    slots = asyncio.Semaphore(EXPORT_CONCURRENCY)
+    ready: asyncio.Queue = asyncio.Queue()
+    tasks = [asyncio.create_task(_download(client, job, project_id, slots, ready)) for project_id in project_ids]
+    sink = _StreamSink()
+    try:
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for _ in range(len(tasks)):
+                project_id, spool, error = await ready.get()
+                try:
+                    if error is not None:
+                        jobs.update(job, project_id, status="failed", error=error)
+                        continue
+                    entry = job["projects"][project_id]
+                    # Les archives sont déjà compressées : stockage sans recompression
+                    with archive.open(_entry_name(entry, job["archive_format"]), mode="w", force_zip64=True) as member:
+                        while True:
+                            # Lecture (éventuellement sur disque) et écriture hors de la boucle d'événements
+                            copy = asyncio.ensure_future(asyncio.to_thread(_copy_chunk, spool, member))
+                            try:
+                                copied = await asyncio.shield(copy)
+                            except asyncio.CancelledError:
+                                # Le thread écrit encore dans l'archive : on l'attend avant de la fermer
+                                await asyncio.wait({copy})
+                                raise
+                            if not copied:
+                                break
+                            yield sink.drain()
+                    yield sink.drain()
+                    jobs.update(job, project_id, status="done")
+                finally:
+                    if spool is not None:
+                        spool.close()
+                    slots.release()
+
+            # Récapitulatif de l'export (projets en échec à reprendre)
+            archive.writestr("export.json", json.dumps(ExportJobs.summary(job), ensure_ascii=False, indent=2))
+        yield sink.drain()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Archives téléchargées mais jamais transmises : fichiers temporaires libérés
+        while not ready.empty():
+            _, spool, _ = ready.get_nowait()
+            if spool is not None:
+                spool.close()
+        # Export interrompu : les projets non transmis restent à reprendre
+        for entry in job["projects"].values():
+            if entry["status"] == "downloading":
+                entry["status"] = "pending"
+
+
+@router.post("/export")
+async def export_repos(export: ExportRequest, credentials: HTTPBasicCredentials = Depends(security)):
+    """
+    Exporte les archives de plusieurs dépôts dans un seul ZIP transmis en flux.
+    L'identifiant de l'export est renvoyé dans l'en-tête X-Export-Id ; s'il est
+    passé dans `resume`, seuls les projets non encore transmis sont exportés.
+    """
+    owner = _owner_key(credentials)
+    client = ForgeClient(credentials.username, credentials.password)
+    try:
+        if export.resume:
+            job = jobs.get(export.resume, owner)
+            if job is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Export inconnu ou expiré")
+        else:
+            if export.archive_format not in ARCHIVE_FORMATS:
+                raise ValueError(f"Format d'archive inconnu: {export.archive_format}")
+            projects = await client.list_all_repos()
+            if export.project_ids is not None:
+                wanted = set(export.project_ids)
+                projects = [project for project in projects if project["id"] in wanted]
+                missing = wanted - {project["id"] for project in projects}
+                if missing:
+                    raise ValueError(f"Projets introuvables: {', '.join(str(project_id) for project_id in sorted(missing))}")
+            job = jobs.create(owner, projects, export.archive_format)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    remaining = [project_id for project_id, entry in job["projects"].items() if entry["status"] != "done"]
+    for project_id in remaining:
+        jobs.update(job, project_id, status="pending", error=None)
+    return StreamingResponse(
+        _stream_export(client, job, remaining),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="etabli-export-{job["id"]}.zip"',
+            "X-Export-Id": job["id"],
+        }
+    )
+
+
+@router.get("/export/{job_id}", response_class=FastJSONResponse)
+async def export_status(job_id: str, credentials: HTTPBasicCredentials = Depends(security)):
+    """Progression d'un export, projet par projet"""
+    job = jobs.get(job_id, _owner_key(credentials))
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Export inconnu ou expiré")
+    return FastJSONResponse(ExportJobs.summary(job))
@@ -1,7 +1,22 @@
+import asyncio
+import base64
 import httpx
 import os
+from urllib.parse import quote
 from typing import List, Dict, Optional, Union
 import logging
+from .images import prepare_avatar
+from .webhooks import hook_settings, webhooks_enabled
+from .pages_ci import CI_FILE_PATH, build_pages_ci
+from .scheduler import HEAVY_COST, scheduler, user_key
+from .imports import IMPORT_TIMEOUT, watcher
+from .singleflight import transport as singleflight_transport
+
+class ForgeAPIError(Exception):
+    """Erreur renvoyée par la forge, avec son code HTTP"""
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
 
 class ForgeClient:
     def __init__(self, username: str, password: str):
@@ -17,30 +32,76 @@ class ForgeClient:
             self.auth = httpx.BasicAuth(username, password)
             self.headers = {"Content-Type": "application/json"}
         self.logger = logging.getLogger(__name__)
+        # Clé de l'utilisateur pour la répartition équitable des connexions vers la forge
+        self.user_key = user_key(username)
 
-    async def _make_request(self, method: str, endpoint: str, **kwargs):
+    async def _make_request(self, method: str, endpoint: str, raw: bool = False, **kwargs):
+        """Exécute une requête sur la forge ; `raw` renvoie le corps JSON non décodé"""
         url = f"{self.base_url}{endpoint}"
+        headers = self.headers
+        if "files" in kwargs:
+            # httpx génère lui-même l'en-tête multipart avec sa frontière
+            headers = {key: value for key, value in self.headers.items() if key != "Content-Type"}
         try:
-            async with httpx.AsyncClient() as client:
+            # Les GET identiques simultanés (même URL, mêmes identifiants) partagent une requête
+            async with scheduler.slot(self.user_key), httpx.AsyncClient(transport=singleflight_transport) as client:
                 response = await client.request(
                     method,
                     url,
                     auth=self.auth,
-                    headers=self.headers,
+                    headers=headers,
                     **kwargs
                 )
                 response.raise_for_status()
+                if raw:
+                    return response.content
                 return response.json()
         except httpx.HTTPStatusError as e:
             self.logger.error(f"Forge API error: {e.response.text}")
-            raise Exception(f"Forge API error: {e.response.json().get('message', str(e))}")
+            try:
+                message = e.response.json().get('message', str(e))
+            except ValueError:
+                message = str(e)
+            raise ForgeAPIError(f"Forge API error: {message}", e.response.status_code)
         except Exception as e:
             self.logger.error(f"Request failed: {str(e)}")
             raise Exception(f"Request failed: {str(e)}")
 
-    async def list_repos(self) -> List[Dict]:
+    async def list_repos(self, raw: bool = False) -> Union[List[Dict], bytes]:
         """Liste tous les dépôts de l'utilisateur"""
-        return await self._make_request("GET", "/projects?membership=true&simple=true")
+        return await self._make_request("GET", "/projects?membership=true&simple=true", raw=raw)
+
+    async def list_all_repos(self) -> List[Dict]:
+        """Liste tous les dépôts dont l'utilisateur est membre (toutes les pages)"""
+        repos = []
+        page = 1
+        while True:
+            batch = await self._make_request(
+                "GET", "/projects", params={"membership": "true", "simple": "true", "per_page": 100, "page": page}
+            )
+            repos.extend(batch)
+            if len(batch) < 100:
+                return repos
+            page += 1
+
+    async def download_archive(self, project_id: int, output, archive_format: str = "tar.gz") -> int:
+        """
+        Télécharge l'archive du dépôt en flux dans `output` (objet fichier).
+        Retourne le nombre d'octets écrits ; l'archive n'est jamais entièrement en mémoire.
+        """
+        url = f"{self.base_url}/projects/{project_id}/repository/archive.{archive_format}"
+        headers = {key: value for key, value in self.headers.items() if key != "Content-Type"}
+        size = 0
+        async with scheduler.slot(self.user_key, HEAVY_COST), \
+                httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=300.0)) as client:
+            async with client.stream("GET", url, auth=self.auth, headers=headers) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise ForgeAPIError(f"Forge API error: archive indisponible ({response.status_code})", response.status_code)
+                async for chunk in response.aiter_bytes():
+                    output.write(chunk)
+                    size += len(chunk)
+        return size
 
     async def create_repo(self, name: str, description: Optional[str], visibility: str) -> Dict:
         """Crée un nouveau dépôt sur la forge"""
@@ -49,7 +110,9 @@ class ForgeClient:
             "description": description,
             "visibility": visibility
         }
-        return await self._make_request("POST", "/projects", json=data)
+        repo = await self._make_request("POST", "/projects", json=data)
+        await self._auto_register_webhook(repo["id"])
+        return repo
 
     async def commit_file(self, project_id: int, file_path: str, content: str, commit_message: str) -> Dict:
         """Commit un fichier dans un dépôt"""
@@ -81,11 +144,34 @@ class ForgeClient:
         if new_name:
             data["name"] = new_name
         
-        return await self._make_request(
+        repo = await self._make_request(
             "POST",
             f"/projects/{source_project_id}/fork",
             json=data
         )
+        await self._auto_register_webhook(repo["id"])
+        return repo
+
+    async def wait_for_import(self, project_id: int, timeout: float = IMPORT_TIMEOUT) -> str:
+        """
+        Attend que la forge ait fini d'importer le contenu d'un dépôt (fork).
+        Retourne l'import_status final ; lève asyncio.TimeoutError après `timeout`
+        secondes et ImportFailedError si l'import a échoué.
+        """
+        return await watcher.wait(self, project_id, timeout)
+
+    async def register_webhook(self, project_id: int) -> Dict:
+        """Enregistre le webhook de L'Établi (événements pipeline et push) sur un dépôt"""
+        return await self._make_request("POST", f"/projects/{project_id}/hooks", json=hook_settings())
+
+    async def _auto_register_webhook(self, project_id: int):
+        """Enregistre le webhook si la configuration le permet, sans faire échouer l'opération"""
+        if not webhooks_enabled():
+            return
+        try:
+            await self.register_webhook(project_id)
+        except Exception as e:
+            self.logger.warning(f"Impossible d'enregistrer le webhook du projet {project_id}: {e}")
 
     async def trigger_pipeline(self, project_id: int) -> Dict:
         """Déclenche un nouveau pipeline pour le projet"""
@@ -107,40 +193,92 @@ class ForgeClient:
         )
         
     async def upload_repo_avatar(self, project_id: int, avatar_data: bytes) -> Dict:
-        """Télécharge un avatar pour un dépôt"""
-        import base64
-        # Convertir les données binaires en base64
-        avatar_base64 = base64.b64encode(avatar_data).decode('utf-8')
-        
-        data = {
-            "avatar": avatar_base64
-        }
-        
+        """Télécharge un avatar pour un dépôt (redimensionné, envoyé en multipart)"""
+        # Décodage et redimensionnement hors de la boucle d'événements
+        content, filename, mimetype = await asyncio.to_thread(prepare_avatar, avatar_data)
         return await self._make_request(
             "PUT",
             f"/projects/{project_id}",
+            files={"avatar": (filename, content, mimetype)}
+        )
+
+    async def get_file(self, project_id: int, file_path: str, ref: str = "main") -> Optional[Dict]:
+        """Récupère un fichier du dépôt, ou None s'il n'existe pas"""
+        try:
+            return await self._make_request(
+                "GET",
+                f"/projects/{project_id}/repository/files/{quote(file_path, safe='')}",
+                params={"ref": ref}
+            )
+        except ForgeAPIError as e:
+            if e.status_code == 404:
+                return None
+            raise
+
+    async def get_project(self, project: Union[int, str]) -> Dict:
+        """Projet désigné par son identifiant ou son chemin (groupe/nom)"""
+        return await self._make_request("GET", f"/projects/{quote(str(project), safe='')}")
+
+    async def list_tree(self, project_id: int, ref: str = "main") -> List[Dict]:
+        """Arborescence complète d'un dépôt (toutes les pages) ; vide si le dépôt n'a aucun commit"""
+        items = []
+        page = 1
+        while True:
+            try:
+                batch = await self._make_request(
+                    "GET",
+                    f"/projects/{project_id}/repository/tree",
+                    params={"ref": ref, "recursive": "true", "per_page": 100, "page": page}
+                )
+            except ForgeAPIError as e:
+                if e.status_code == 404:
+                    return items
+                raise
+            items.extend(batch)
+            if len(batch) < 100:
+                return items
+            page += 1
+
+    async def commit_actions(self, project_id: int, actions: List[Dict], commit_message: str, branch: str = "main") -> Dict:
+        """Crée un commit regroupant plusieurs actions (create, update, delete...)"""
+        data = {
+            "branch": branch,
+            "commit_message": commit_message,
+            "actions": actions
+        }
+        return await self._make_request(
+            "POST",
+            f"/projects/{project_id}/repository/commits",
             json=data
         )
 
-    async def enable_pages(self, project_id: int) -> Dict:
-        """Active Forge Pages en créant un .gitlab-ci.yml"""
-        ci_content = """pages:
-  stage: deploy
-  script:
-    - mkdir .public
-    - cp -r * .public
-    - mv .public public
-  artifacts:
-    paths:
-      - public
-  only:
-    - main
-"""
-        return await self.commit_file(
+    async def enable_pages(
+        self,
+        project_id: int,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        precompress: bool = True,
+        branch: str = "main"
+    ) -> Dict:
+        """
+        Active Forge Pages en écrivant le .gitlab-ci.yml généré par build_pages_ci.
+        Un fichier existant est mis à jour sur place ; aucun commit s'il est déjà à jour.
+        """
+        ci_content = build_pages_ci(branch, include, exclude, precompress)
+        existing = await self.get_file(project_id, CI_FILE_PATH, branch)
+        if existing is not None:
+            current = base64.b64decode(existing.get("content", "")).decode("utf-8", "replace")
+            if current == ci_content:
+                return {"unchanged": True, "file_path": CI_FILE_PATH}
+        return await self.commit_actions(
             project_id,
-            ".gitlab-ci.yml",
-            ci_content,
-            "Enable Forge Pages"
+            [{
+                "action": "update" if existing is not None else "create",
+                "file_path": CI_FILE_PATH,
+                "content": ci_content
+            }],
+            "Enable Forge Pages" if existing is None else "Update Forge Pages configuration",
+            branch
         )
         
     async def get_pipeline_status(self, project_id: int, pipeline_id: int) -> Dict:
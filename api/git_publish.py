@@ -0,0 +1,111 @@
+import os
+import posixpath
+import shutil
+import subprocess
+import tempfile
+import time
+import zipfile
+from typing import BinaryIO, Dict
+
+from .git_tools import GitError, git_env, run_git
+
+# Backend de publication par défaut : "commits" (API REST) ou "git" (push d'un packfile)
+PUBLISH_BACKEND = os.getenv("PUBLISH_BACKEND", "commits")
+PUBLISH_BACKENDS = ("commits", "git")
+# Identité des commits créés par L'Établi
+GIT_AUTHOR_NAME = os.getenv("GIT_AUTHOR_NAME", "L'Établi")
+GIT_AUTHOR_EMAIL = os.getenv("GIT_AUTHOR_EMAIL", "etabli@forge.apps.education.fr")
+COPY_CHUNK_SIZE = 1024 * 1024
+# Au-delà de cette taille, les blobs sont stockés sans delta
+BIG_FILE_THRESHOLD = "1m"
+
+
+def _member_path(filename: str) -> str:
+    """Chemin normalisé d'un membre du ZIP, ou chaîne vide s'il doit être ignoré"""
+    path = posixpath.normpath(filename.replace("\\", "/")).lstrip("/")
+    if path in ("", ".") or path == ".." or path.startswith("../") or "/.git/" in f"/{path}/":
+        return ""
+    return path
+
+
+def _quote_path(path: str) -> bytes:
+    """Chemin au format fast-import (guillemets C si nécessaire)"""
+    if not any(char in path for char in ('"', "\\", "\n")) and not path.startswith('"'):
+        return path.encode("utf-8")
+    escaped = path.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'.encode("utf-8")
+
+
+def _write_fast_import(stream: BinaryIO, archive: zipfile.ZipFile, branch: str, message: str) -> int:
+    """Écrit le flux fast-import : un blob par fichier du ZIP puis un commit unique"""
+    files = []
+    mark = 0
+    for info in archive.infolist():
+        path = _member_path(info.filename)
+        if info.is_dir() or not path:
+            continue
+        mark += 1
+        stream.write(b"blob\nmark :%d\ndata %d\n" % (mark, info.file_size))
+        # Copie en flux : le contenu n'est jamais chargé en entier ni réencodé
+        with archive.open(info) as member:
+            shutil.copyfileobj(member, stream, COPY_CHUNK_SIZE)
+        stream.write(b"\n")
+        files.append((mark, path))
+
+    encoded_message = message.encode("utf-8")
+    identity = f"{GIT_AUTHOR_NAME} <{GIT_AUTHOR_EMAIL}> {int(time.time())} +0000".encode("utf-8")
+    stream.write(b"commit refs/heads/%s\n" % branch.encode("utf-8"))
+    stream.write(b"author %s\ncommitter %s\n" % (identity, identity))
+    stream.write(b"data %d\n%s\n" % (len(encoded_message), encoded_message))
+    for file_mark, path in files:
+        stream.write(b"M 100644 :%d %s\n" % (file_mark, _quote_path(path)))
+    stream.write(b"\ndone\n")
+    return len(files)
+
+
+def push_zip(archive_file: BinaryIO, remote_url: str, token: str, branch: str = "main",
+             message: str = "Publication du site") -> Dict:
+    """
+    Construit localement un commit contenant tous les fichiers d'une archive ZIP
+    et le pousse en un seul packfile sur le dépôt distant (HTTP avec le token).
+    Bloquant : à appeler dans un thread depuis le code asynchrone.
+    """
+    work_dir = tempfile.mkdtemp(prefix="etabli-publish-")
+    try:
+        run_git(["init", "--bare", "--quiet", work_dir])
+        process = subprocess.Popen(
+            # unpackLimit=1 : les objets restent dans un packfile unique, celui qui sera poussé ;
+            # pas de recherche de delta sur les gros médias (déjà compressés, sans gain)
+            ["git", "-c", "fastimport.unpackLimit=1", "--git-dir", work_dir, "fast-import", "--quiet", "--done",
+             f"--big-file-threshold={BIG_FILE_THRESHOLD}"],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=git_env()
+        )
+        try:
+            with zipfile.ZipFile(archive_file) as archive:
+                count = _write_fast_import(process.stdin, archive, branch, message)
+            process.stdin.close()
+        except BrokenPipeError:
+            # fast-import s'est arrêté : son message d'erreur est lu ci-dessous
+            pass
+        except Exception:
+            process.kill()
+            process.wait()
+            raise
+        stderr = process.stderr.read().decode("utf-8", "replace").strip()
+        if process.wait() != 0:
+            raise GitError(f"git fast-import a échoué: {stderr}")
+
+        pack_bytes = sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(os.path.join(work_dir, "objects", "pack"))
+            for name in names if name.endswith(".pack")
+        )
+        run_git(
+            ["-c", f"core.bigFileThreshold={BIG_FILE_THRESHOLD}", "push", "--quiet", remote_url,
+             f"refs/heads/{branch}:refs/heads/{branch}"],
+            work_dir, token
+        )
+        commit = run_git(["rev-parse", f"refs/heads/{branch}"], work_dir).decode("ascii").strip()
+        return {"commit": commit, "files": count, "pack_bytes": pack_bytes}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
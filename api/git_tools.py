@@ -0,0 +1,40 @@
+import base64
+import os
+import subprocess
+
+# Délai maximal (secondes) d'une commande git réseau
+GIT_TIMEOUT = float(os.getenv("GIT_TIMEOUT", "300"))
+
+
+class GitError(Exception):
+    pass
+
+
+def git_env(token: str = None) -> dict:
+    """
+    Environnement des commandes git : jamais d'invite interactive, et le token
+    est transmis via GIT_CONFIG_* (en-tête HTTP) plutôt que sur la ligne de
+    commande ou dans l'URL, où il serait visible dans la liste des processus.
+    """
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    if token:
+        credentials = base64.b64encode(f"oauth2:{token}".encode("utf-8")).decode("ascii")
+        env.update({
+            "GIT_CONFIG_COUNT": "1",
+            "GIT_CONFIG_KEY_0": "http.extraHeader",
+            "GIT_CONFIG_VALUE_0": f"Authorization: Basic {credentials}",
+        })
+    return env
+
+
+def run_git(args, git_dir: str = None, token: str = None, timeout: float = GIT_TIMEOUT) -> bytes:
+    """Exécute une commande git et retourne sa sortie standard"""
+    command = ["git"] + (["--git-dir", git_dir] if git_dir else []) + list(args)
+    result = subprocess.run(
+        command, env=git_env(token), stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout
+    )
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", "replace").strip()
+        command_name = next(arg for arg in args if not arg.startswith("-") and "=" not in arg)
+        raise GitError(f"git {command_name} a échoué: {message}")
+    return result.stdout
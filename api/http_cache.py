@@ -0,0 +1,324 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+# Taille maximale (octets) des réponses conservées en mémoire
+HTTP_CACHE_BYTES = int(os.getenv("HTTP_CACHE_BYTES", str(32 * 1024 * 1024)))
+# Répertoire où déborder les réponses évincées de la mémoire (désactivé si vide)
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "")
+# Taille maximale (octets) des réponses conservées sur disque
+HTTP_CACHE_DIR_BYTES = int(os.getenv("HTTP_CACHE_DIR_BYTES", str(256 * 1024 * 1024)))
+# Les réponses plus grosses ne sont pas conservées
+HTTP_CACHE_MAX_ENTRY = 8 * 1024 * 1024
+CACHE_FILE_SUFFIX = ".http"
+# En-têtes d'une réponse 304 qui remplacent ceux de la réponse conservée
+UPDATED_HEADERS = (b"etag", b"last-modified", b"cache-control", b"expires", b"date")
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(request: httpx.Request, methods=("GET", "HEAD")) -> Optional[str]:
+    """
+    Clé d'une requête : même méthode, même URL et mêmes en-têtes (donc même
+    Authorization : une réponse n'est jamais partagée entre identifiants).
+    None pour les méthodes non concernées.
+    """
+    if request.method not in methods:
+        return None
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.url}".encode("utf-8"))
+    for name, value in sorted(request.headers.raw):
+        digest.update(b"\0" + name.lower() + b"\0" + value)
+    return digest.hexdigest()
+
+
+class ReplayStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Corps mémorisé, relu à l'identique par chaque réponse"""
+
+    def __init__(self, content: bytes):
+        self._content = content
+
+    def __iter__(self):
+        yield self._content
+
+    async def __aiter__(self):
+        yield self._content
+
+
+def read_raw(response: httpx.Response) -> Optional[bytes]:
+    """Corps brut (non décodé) d'une réponse de transport, None s'il a déjà été lu"""
+    return None if response.is_stream_consumed else b"".join(response.iter_raw())
+
+
+async def aread_raw(response: httpx.Response) -> Optional[bytes]:
+    return None if response.is_stream_consumed else b"".join([chunk async for chunk in response.aiter_raw()])
+
+
+class StoredResponse:
+    """Réponse conservée (statut, en-têtes, corps brut) et rejouable"""
+    __slots__ = ("status_code", "headers", "content", "extensions")
+
+    def __init__(self, status_code: int, headers: List[Tuple[bytes, bytes]], content: bytes, extensions: Optional[Dict] = None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.extensions = extensions or {}
+
+    @classmethod
+    def from_response(cls, response: httpx.Response, content: Optional[bytes]) -> "StoredResponse":
+        headers = response.headers.raw
+        if content is None:
+            # Réponse déjà lue par le transport : seul le corps décodé est disponible
+            content = response.content
+            headers = [(name, value) for name, value in headers
+                       if name.lower() not in (b"content-encoding", b"content-length")]
+        extensions = {key: value for key, value in response.extensions.items()
+                      if key in ("http_version", "reason_phrase")}
+        return cls(response.status_code, headers, content, extensions)
+
+    def header(self, name: bytes) -> Optional[bytes]:
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return None
+
+    @property
+    def size(self) -> int:
+        return len(self.content) + sum(len(key) + len(value) for key, value in self.headers)
+
+    def response(self) -> httpx.Response:
+        return httpx.Response(
+            self.status_code,
+            headers=self.headers,
+            stream=ReplayStream(self.content),
+            extensions=dict(self.extensions),
+        )
+
+    def dump(self) -> bytes:
+        meta = {
+            "status_code": self.status_code,
+            "headers": [[key.decode("latin-1"), value.decode("latin-1")] for key, value in self.headers],
+        }
+        return json.dumps(meta).encode("utf-8") + b"\n" + self.content
+
+    @classmethod
+    def load(cls, data: bytes) -> "StoredResponse":
+        meta, content = data.split(b"\n", 1)
+        meta = json.loads(meta)
+        headers = [(key.encode("latin-1"), value.encode("latin-1")) for key, value in meta["headers"]]
+        return cls(meta["status_code"], headers, content)
+
+
+class ValidationCache:
+    """
+    Réponses de la forge conservées avec leur ETag / Last-Modified, pour les
+    revalider par requête conditionnelle. Mémoire bornée en octets (LRU) ; les
+    réponses évincées débordent sur disque si un répertoire est configuré.
+    """
+
+    def __init__(self, max_bytes: int = HTTP_CACHE_BYTES, directory: str = HTTP_CACHE_DIR,
+                 directory_bytes: int = HTTP_CACHE_DIR_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.directory_bytes = directory_bytes
+        self._memory: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"revalidated": 0, "stored": 0, "misses": 0, "bytes_saved": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            # Les fichiers d'une exécution précédente ne sont pas indexés : suppression
+            for entry in os.scandir(directory):
+                if entry.name.endswith(CACHE_FILE_SUFFIX):
+                    os.remove(entry.path)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_FILE_SUFFIX)
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            stored = self._memory.get(key)
+            if stored is not None:
+                self._memory.move_to_end(key)
+                return stored
+            if key not in self._disk:
+                return None
+            self._disk_bytes -= self._disk.pop(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                stored = StoredResponse.load(f.read())
+            os.remove(self._path(key))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Lecture du cache HTTP impossible: {e}")
+            return None
+        # Réponse de nouveau utilisée : retour en mémoire
+        self.put(key, stored, count=False)
+        return stored
+
+    def put(self, key: str, stored: StoredResponse, count: bool = True):
+        if stored.size > HTTP_CACHE_MAX_ENTRY:
+            return
+        spilled = []
+        with self._lock:
+            if count:
+                self.counters["stored"] += 1
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= previous.size
+            if key in self._disk:
+                self._disk_bytes -= self._disk.pop(key)
+                spilled.append((key, None))
+            self._memory[key] = stored
+            self._memory_bytes += stored.size
+            while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+                old_key, old = self._memory.popitem(last=False)
+                self._memory_bytes -= old.size
+                if self.directory:
+                    spilled.append((old_key, old))
+        for old_key, old in spilled:
+            self._spill(old_key, old)
+
+    def _spill(self, key: str, stored: Optional[StoredResponse]):
+        if stored is None:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            return
+        try:
+            data = stored.dump()
+            with open(self._path(key), "wb") as f:
+                f.write(data)
+        except OSError as e:
+            logger.warning(f"Écriture du cache HTTP impossible: {e}")
+            return
+        removed = []
+        with self._lock:
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            while self._disk_bytes > self.directory_bytes and len(self._disk) > 1:
+                old_key, old_size = self._disk.popitem(last=False)
+                self._disk_bytes -= old_size
+                removed.append(old_key)
+        for old_key in removed:
+            self._spill(old_key, None)
+
+    def prepare(self, request: httpx.Request) -> Tuple[Optional[str], Optional[StoredResponse]]:
+        """Ajoute à la requête les en-têtes conditionnels de la réponse conservée"""
+        key = request_key(request, methods=("GET",))
+        if key is None or "if-none-match" in request.headers or "if-modified-since" in request.headers:
+            return None, None
+        stored = self.get(key)
+        if stored is not None:
+            etag = stored.header(b"etag")
+            last_modified = stored.header(b"last-modified")
+            if etag:
+                request.headers["If-None-Match"] = etag.decode("latin-1")
+            if last_modified:
+                request.headers["If-Modified-Since"] = last_modified.decode("latin-1")
+        return key, stored
+
+    def revalidated(self, stored: StoredResponse, response: httpx.Response) -> StoredResponse:
+        """Réponse conservée confirmée par un 304 : en-têtes de validation mis à jour"""
+        updates = {key.lower(): value for key, value in response.headers.raw if key.lower() in UPDATED_HEADERS}
+        headers = [(key, value) for key, value in stored.headers if key.lower() not in updates]
+        headers += [(key, value) for key, value in response.headers.raw if key.lower() in updates]
+        with self._lock:
+            self.counters["revalidated"] += 1
+            self.counters["bytes_saved"] += len(stored.content)
+        return StoredResponse(stored.status_code, headers, stored.content, stored.extensions)
+
+    def cacheable(self, response: httpx.Response) -> bool:
+        if response.status_code != 200:
+            return False
+        if "no-store" in response.headers.get("cache-control", ""):
+            return False
+        return "etag" in response.headers or "last-modified" in response.headers
+
+    def miss(self):
+        with self._lock:
+            self.counters["misses"] += 1
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+class ValidationCacheTransport(httpx.BaseTransport):
+    """Transport httpx (synchrone) qui revalide les GET par If-None-Match / If-Modified-Since"""
+
+    def __init__(self, transport: Optional[httpx.BaseTransport] = None, cache: Optional[ValidationCache] = None):
+        self._transport = transport or httpx.HTTPTransport()
+        self.cache = cache or ValidationCache()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key, stored = self.cache.prepare(request)
+        response = self._transport.handle_request(request)
+        if key is None:
+            return response
+        if stored is not None and response.status_code == 304:
+            response.close()
+            stored = self.cache.revalidated(stored, response)
+            self.cache.put(key, stored, count=False)
+            return stored.response()
+        self.cache.miss()
+        if not self.cache.cacheable(response):
+            return response
+        try:
+            stored = StoredResponse.from_response(response, read_raw(response))
+        finally:
+            response.close()
+        self.cache.put(key, stored)
+        return stored.response()
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncValidationCacheTransport(httpx.AsyncBaseTransport):
+    """Équivalent asynchrone de ValidationCacheTransport, pour ForgeClient"""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None, cache: Optional[ValidationCache] = None):
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self.cache = cache or ValidationCache()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key, stored = self.cache.prepare(request)
+        response = await self._transport.handle_async_request(request)
+        if key is None:
+            return response
+        if stored is not None and response.status_code == 304:
+            await response.aclose()
+            stored = self.cache.revalidated(stored, response)
+            self.cache.put(key, stored, count=False)
+            return stored.response()
+        self.cache.miss()
+        if not self.cache.cacheable(response):
+            return response
+        try:
+            stored = StoredResponse.from_response(response, await aread_raw(response))
+        finally:
+            await response.aclose()
+        self.cache.put(key, stored)
+        return stored.response()
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+# Cache partagé par les transports de l'API et de l'interface d'un même processus
+cache = ValidationCache()
@@ -0,0 +1,89 @@
+import io
+import os
+
+from PIL import Image, ImageOps
+
+# Taille maximale (pixels) des avatars : la forge les affiche au plus en 96px, 192px couvre les écrans haute densité
+AVATAR_SIZE = int(os.getenv("AVATAR_SIZE", "192"))
+# Taille maximale acceptée en entrée (octets) avant tout traitement
+AVATAR_MAX_INPUT_BYTES = int(os.getenv("AVATAR_MAX_INPUT_BYTES", str(10 * 1024 * 1024)))
+# Taille maximale de l'avatar envoyé à la forge (limite GitLab : 200 Ko)
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", str(200 * 1024)))
+# Protection contre les images de dimensions démesurées (décompression)
+MAX_IMAGE_PIXELS = 40_000_000
+
+# Signatures des formats acceptés
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+def detect_image_type(data: bytes):
+    """Détermine le format réel d'une image d'après sa signature (et non son extension)"""
+    for signature, image_type in _SIGNATURES:
+        if data.startswith(signature):
+            return image_type
+    if len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def prepare_avatar(data: bytes, size: int = AVATAR_SIZE, max_bytes: int = AVATAR_MAX_BYTES):
+    """
+    Valide, redimensionne et recompresse une image d'avatar.
+    Retourne un tuple (données, nom de fichier, type MIME) prêt pour un envoi multipart.
+    Lève ValueError si l'image est invalide ou trop volumineuse.
+    """
+    if len(data) > AVATAR_MAX_INPUT_BYTES:
+        raise ValueError(f"Image trop volumineuse (maximum {AVATAR_MAX_INPUT_BYTES // (1024 * 1024)} Mo)")
+    image_type = detect_image_type(data)
+    if image_type is None:
+        raise ValueError("Format de fichier non supporté. Utilisez PNG, JPG, JPEG, GIF ou WebP.")
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > MAX_IMAGE_PIXELS:
+            raise ValueError("Dimensions de l'image trop importantes")
+        image.load()
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Image illisible: {e}")
+
+    original_size = image.size
+    # Appliquer l'orientation EXIF des photos de téléphone puis réduire
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((size, size), Image.LANCZOS)
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if has_alpha:
+        output = _encode(image.convert("RGBA"), "PNG", optimize=True)
+        filename, mimetype = "avatar.png", "image/png"
+    else:
+        rgb = image.convert("RGB")
+        output = None
+        # Réduire la qualité jusqu'à respecter la limite de taille
+        for quality in (85, 75, 60, 45):
+            output = _encode(rgb, "JPEG", quality=quality, optimize=True, progressive=True)
+            if len(output) <= max_bytes:
+                break
+        filename, mimetype = "avatar.jpg", "image/jpeg"
+
+    # Une petite image d'origine déjà conforme peut être plus légère que la version recompressée
+    original_fits = image_type in ("png", "jpeg") and max(original_size) <= size
+    if original_fits and len(data) <= min(len(output), max_bytes):
+        extension = "png" if image_type == "png" else "jpg"
+        return data, f"avatar.{extension}", f"image/{image_type}"
+
+    if len(output) > max_bytes:
+        raise ValueError(f"Avatar trop volumineux après compression (maximum {max_bytes // 1024} Ko)")
+    return output, filename, mimetype
+
+
+def _encode(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Délais (secondes) entre deux vérifications d'un même import : croissance progressive
+IMPORT_POLL_INITIAL = float(os.getenv("IMPORT_POLL_INITIAL", "0.5"))
+IMPORT_POLL_MAX = float(os.getenv("IMPORT_POLL_MAX", "8"))
+IMPORT_POLL_FACTOR = 1.5
+# Délai d'attente maximal par défaut d'un import
+IMPORT_TIMEOUT = float(os.getenv("IMPORT_TIMEOUT", "600"))
+
+READY_STATUSES = ("finished", "none")
+FAILED_STATUSES = ("failed",)
+
+logger = logging.getLogger(__name__)
+
+
+class ImportFailedError(Exception):
+    """L'import d'un dépôt forké a échoué côté forge"""
+
+
+# --- Logique commune au suivi asynchrone (API) et au suivi par thread (interface) ---
+
+class PollSchedule:
+    """Échéance de la prochaine vérification d'un import ; l'intervalle croît à chaque essai"""
+    __slots__ = ("next_at", "delay")
+
+    def __init__(self):
+        self.next_at = time.monotonic()
+        self.delay = IMPORT_POLL_INITIAL
+
+    def reschedule(self, now: float):
+        self.next_at = now + self.delay
+        self.delay = min(self.delay * IMPORT_POLL_FACTOR, IMPORT_POLL_MAX)
+
+
+def import_state(import_status: Optional[str]) -> str:
+    """ready, failed ou importing selon l'import_status renvoyé par la forge"""
+    if import_status in READY_STATUSES:
+        return "ready"
+    if import_status in FAILED_STATUSES:
+        return "failed"
+    return "importing"
+
+
+def group_by_user(items, user_of) -> Dict[str, list]:
+    """Imports regroupés par utilisateur : un appel à la forge par utilisateur"""
+    groups: Dict[str, list] = {}
+    for item in items:
+        groups.setdefault(user_of(item), []).append(item)
+    return groups
+
+
+def batch_query(project_ids: List[int]) -> Dict:
+    """Paramètres de GET /projects couvrant plusieurs imports d'un même utilisateur"""
+    # Les forks récents ont les identifiants les plus élevés : une seule page suffit
+    return {
+        "membership": "true",
+        "id_after": min(project_ids) - 1,
+        "order_by": "id",
+        "sort": "asc",
+        "per_page": 100,
+    }
+
+
+def import_statuses(projects: List[Dict]) -> Dict[int, str]:
+    return {project["id"]: project.get("import_status", "none") for project in projects}
+
+
+class _PendingImport(PollSchedule):
+    __slots__ = ("project_id", "client", "waiters")
+
+    def __init__(self, project_id: int, client):
+        super().__init__()
+        self.project_id = project_id
+        self.client = client
+        self.waiters: List[asyncio.Future] = []
+
+
+class ImportWatcher:
+    """
+    Attente partagée de la fin des imports de dépôts (forks).
+    Une seule tâche interroge la forge pour tous les imports en cours : ceux d'un
+    même utilisateur sont vérifiés en une requête, et l'intervalle entre deux
+    vérifications d'un import croît progressivement.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, int], _PendingImport] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def wait(self, client, project_id: int, timeout: float) -> str:
+        """Attend la fin de l'import du projet ; retourne son import_status final"""
+        # Suivi par utilisateur : chacun interroge la forge avec ses propres droits
+        key = (client.user_key, project_id)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = _PendingImport(project_id, client)
+        future = asyncio.get_running_loop().create_future()
+        pending.waiters.append(future)
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        finally:
+            if not future.done():
+                future.cancel()
+            if future in pending.waiters:
+                pending.waiters.remove(future)
+            if not pending.waiters and self._pending.get(key) is pending:
+                del self._pending[key]
+
+    def _resolve(self, pending: _PendingImport, import_status: Optional[str] = None, error: Optional[Exception] = None):
+        for future in pending.waiters:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(import_status)
+        key = (pending.client.user_key, pending.project_id)
+        if self._pending.get(key) is pending:
+            del self._pending[key]
+
+    async def _run(self):
+        while self._pending:
+            now = time.monotonic()
+            due = [pending for pending in self._pending.values() if pending.next_at <= now]
+            if not due:
+                self._wakeup.clear()
+                next_at = min(pending.next_at for pending in self._pending.values())
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), max(0.05, next_at - now))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            by_user = group_by_user(due, lambda pending: pending.client.user_key)
+            results = await asyncio.gather(*(self._poll_group(group) for group in by_user.values()),
+                                           return_exceptions=True)
+
+            now = time.monotonic()
+            for group, statuses in zip(by_user.values(), results):
+                if isinstance(statuses, Exception):
+                    logger.warning(f"Vérification des imports impossible: {statuses}")
+                    statuses = {}
+                for pending in group:
+                    import_status = statuses.get(pending.project_id)
+                    state = import_state(import_status)
+                    if state == "ready":
+                        self._resolve(pending, import_status)
+                    elif state == "failed":
+                        self._resolve(pending, error=ImportFailedError(f"L'import du projet {pending.project_id} a échoué"))
+                    else:
+                        pending.reschedule(now)
+
+    @staticmethod
+    async def _poll_group(group: List[_PendingImport]) -> Dict[int, str]:
+        client = group[0].client
+        statuses: Dict[int, str] = {}
+        if len(group) > 1:
+            params = batch_query([pending.project_id for pending in group])
+            statuses = import_statuses(await client._make_request("GET", "/projects", params=params))
+        for pending in group:
+            if pending.project_id not in statuses:
+                project = await client._make_request("GET", f"/projects/{pending.project_id}")
+                statuses.update(import_statuses([project]))
+        return statuses
+
+
+# Instance partagée par tous les clients de la forge du processus
+watcher = ImportWatcher()
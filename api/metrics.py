@@ -0,0 +1,27 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+# Jeton des endpoints de métriques internes (en-tête X-Metrics-Token) ; sans jeton, ils restent fermés
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_HEADER = "X-Metrics-Token"
+
+
+def check_token(value: Optional[str]) -> Optional[int]:
+    """Code d'erreur HTTP si l'accès aux métriques est refusé, None s'il est autorisé"""
+    if not METRICS_TOKEN:
+        return status.HTTP_503_SERVICE_UNAVAILABLE
+    if not value or not hmac.compare_digest(value.encode("utf-8"), METRICS_TOKEN.encode("utf-8")):
+        return status.HTTP_401_UNAUTHORIZED
+    return None
+
+
+async def require_token(x_metrics_token: Optional[str] = Header(None)):
+    """Dépendance FastAPI : réserve un endpoint aux outils de supervision"""
+    error = check_token(x_metrics_token)
+    if error == status.HTTP_503_SERVICE_UNAVAILABLE:
+        raise HTTPException(status_code=error, detail="Métriques non configurées")
+    if error is not None:
+        raise HTTPException(status_code=error, detail="Jeton de métriques invalide")
@@ -0,0 +1,298 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from PIL import Image, features
+
+# Optimisation des assets appliquée par défaut aux publications Spynorama
+OPTIMIZE_ASSETS = os.getenv("OPTIMIZE_ASSETS", "false").lower() in ("true", "1", "t")
+# Processus de travail (par défaut : un par cœur)
+OPTIMIZE_WORKERS = int(os.getenv("OPTIMIZE_WORKERS", "0")) or os.cpu_count() or 1
+# Variantes générées à côté des images (webp, avif), séparées par des virgules
+OPTIMIZE_SIBLINGS = [name.strip() for name in os.getenv("OPTIMIZE_SIBLINGS", "webp").split(",") if name.strip()]
+# Qualité des variantes des photos (JPEG) ; les PNG sont convertis sans perte
+OPTIMIZE_SIBLING_QUALITY = int(os.getenv("OPTIMIZE_SIBLING_QUALITY", "85"))
+# Les images plus grandes (pixels) sont publiées telles quelles ; les panoramas dépassent largement les 40 Mpx des avatars
+OPTIMIZE_MAX_PIXELS = int(os.getenv("OPTIMIZE_MAX_PIXELS", str(200_000_000)))
+# Au-delà de cette taille, une archive optimisée est écrite sur disque plutôt qu'en mémoire
+OPTIMIZE_SPOOL_BYTES = 8 * 1024 * 1024
+# Dimension maximale d'une image WebP
+WEBP_MAX_DIMENSION = 16383
+
+IMAGE_EXTENSIONS = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png"}
+TEXT_EXTENSIONS = (".html", ".htm", ".css", ".js")
+# Extensions déjà compressées : stockées sans deflate dans l'archive optimisée
+STORED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif", ".mp3", ".mp4", ".ogg", ".webm", ".zip")
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Pas de fork du serveur (threads, connexions ouvertes) : processus lancés par un serveur dédié
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(max_workers=OPTIMIZE_WORKERS, mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def _discard_executor(pool: ProcessPoolExecutor):
+    """Remplace un pool dont un processus est mort (mémoire épuisée...) ; recréé à la demande"""
+    global _pool
+    if _pool is pool:
+        _pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Minification prudente (aucune dépendance, résultat conservé seulement s'il est plus court) ---
+
+_HTML_RAW = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.IGNORECASE | re.DOTALL)
+_HTML_COMMENT = re.compile(r"<!--(?!\[if|<!|>).*?-->", re.DOTALL)
+_HTML_TAG = re.compile(r"(<[^>]*>)")
+_WHITESPACE = re.compile(r"\s+")
+_CSS_TOKENS = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|/\*.*?\*/", re.DOTALL)
+_CSS_PUNCTUATION = re.compile(r"\s*([{};,])\s*")
+
+
+def _collapse(match):
+    # Un blanc contenant un saut de ligne reste un saut de ligne (lisibilité, messages d'erreur)
+    return "\n" if "\n" in match.group(0) else " "
+
+
+def _minify_html_text(text: str) -> str:
+    # Balises (et valeurs de leurs attributs) intactes, blancs du texte regroupés
+    parts = _HTML_TAG.split(_HTML_COMMENT.sub("", text))
+    return "".join(part if index % 2 else _WHITESPACE.sub(_collapse, part) for index, part in enumerate(parts))
+
+
+def minify_html(text: str) -> str:
+    """Commentaires retirés et blancs regroupés, hors <pre>, <textarea>, <script> et <style>"""
+    parts = _HTML_RAW.split(text)
+    output = []
+    # split avec deux groupes : [texte, bloc, nom de balise, texte, ...]
+    for index in range(0, len(parts), 3):
+        output.append(_minify_html_text(parts[index]))
+        if index + 1 < len(parts):
+            output.append(parts[index + 1])
+    return "".join(output).strip() + "\n"
+
+
+def minify_css(text: str) -> str:
+    """Commentaires retirés, blancs regroupés et supprimés autour de { } ; , (chaînes intactes)"""
+    output = []
+    position = 0
+    for match in _CSS_TOKENS.finditer(text):
+        output.append(_CSS_PUNCTUATION.sub(r"\1", _WHITESPACE.sub(" ", text[position:match.start()])))
+        # Chaîne conservée, commentaire remplacé par rien
+        output.append(match.group(1) or "")
+        position = match.end()
+    output.append(_CSS_PUNCTUATION.sub(r"\1", _WHITESPACE.sub(" ", text[position:])))
+    return "".join(output).strip() + "\n"
+
+
+def minify_js(text: str) -> Optional[str]:
+    """
+    Indentation et lignes vides retirées. Sans analyseur JavaScript, rien d'autre
+    n'est sûr (expressions régulières, insertion automatique des points-virgules) ;
+    les scripts à gabarits multilignes ou à lignes continuées sont laissés tels quels.
+    """
+    if "`" in text or re.search(r"\\\r?\n", text):
+        return None
+    lines = [line.strip() for line in text.splitlines()]
+    return "\n".join(line for line in lines if line) + "\n"
+
+
+# --- Images ---
+
+def _has_xmp(image) -> bool:
+    """Métadonnées XMP (dont GPano, utilisées par les visionneuses de panoramas)"""
+    if "xmp" in image.info or "XML:com.adobe.xmp" in image.info:
+        return True
+    return any(marker == "APP1" and data.startswith(b"http://ns.adobe.com/xap/")
+               for marker, data in getattr(image, "applist", []))
+
+
+def _save(image, fmt: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def _optimize_image(name: str, data: bytes, image_type: str, siblings: List[str]) -> List[Tuple[str, bytes]]:
+    Image.MAX_IMAGE_PIXELS = OPTIMIZE_MAX_PIXELS
+    image = Image.open(io.BytesIO(data))
+    if image.format.lower() != image_type or getattr(image, "n_frames", 1) > 1:
+        return [(name, data)]
+    image.load()
+    keep = {key: image.info[key] for key in ("icc_profile", "exif", "dpi") if key in image.info}
+
+    best = data
+    if not _has_xmp(image):
+        if image_type == "jpeg":
+            # Tables de quantification d'origine : pas de perte de qualité supplémentaire visible
+            candidate = _save(image, "JPEG", quality="keep", optimize=True, progressive=True, **keep)
+        else:
+            if "transparency" in image.info:
+                keep["transparency"] = image.info["transparency"]
+            candidate = _save(image, "PNG", optimize=True, **keep)
+        if len(candidate) < len(best):
+            best = candidate
+    results = [(name, best)]
+
+    for sibling in siblings:
+        if sibling == "webp" and max(image.size) > WEBP_MAX_DIMENSION:
+            continue
+        if not features.check(sibling):
+            continue
+        mode = "RGBA" if image.mode in ("RGBA", "LA", "P") and image_type == "png" else "RGB"
+        options = {"lossless": True} if image_type == "png" and sibling == "webp" else {"quality": OPTIMIZE_SIBLING_QUALITY}
+        variant = _save(image.convert(mode), sibling.upper(), **options)
+        # Variante inutile si elle n'est pas plus légère que l'original optimisé
+        if len(variant) < len(best):
+            results.append((f"{name}.{sibling}", variant))
+    return results
+
+
+def optimize_member(name: str, data: bytes, siblings: List[str]) -> List[Tuple[str, bytes]]:
+    """
+    Optimise un fichier de l'archive (exécuté dans un processus de travail).
+    Retourne le fichier (éventuellement allégé) suivi de ses variantes.
+    """
+    lower = name.lower()
+    extension = os.path.splitext(lower)[1]
+    try:
+        if extension in IMAGE_EXTENSIONS:
+            return _optimize_image(name, data, IMAGE_EXTENSIONS[extension], siblings)
+        if extension in TEXT_EXTENSIONS and not lower.endswith((".min.js", ".min.css")):
+            text = data.decode("utf-8")
+            if extension == ".css":
+                minified = minify_css(text)
+            elif extension == ".js":
+                minified = minify_js(text)
+            else:
+                minified = minify_html(text)
+            if minified is not None:
+                encoded = minified.encode("utf-8")
+                if len(encoded) < len(data):
+                    return [(name, encoded)]
+    except Exception as e:
+        # Fichier illisible ou format inattendu : publié tel quel
+        logger.warning(f"Optimisation de {name} impossible: {e}")
+    return [(name, data)]
+
+
+def _write_members(target: zipfile.ZipFile, members: List[Tuple[str, bytes]]):
+    for name, content in members:
+        compression = zipfile.ZIP_STORED if name.lower().endswith(STORED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+        target.writestr(name, content, compression)
+
+
+class OptimizationReport:
+    """Octets gagnés par l'optimisation d'une archive"""
+
+    def __init__(self):
+        self.files = 0
+        self.optimized = 0
+        self.siblings = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.sibling_bytes = 0
+
+    def add(self, original: bytes, results: List[Tuple[str, bytes]]):
+        self.files += 1
+        self.bytes_in += len(original)
+        self.bytes_out += len(results[0][1])
+        if len(results[0][1]) < len(original):
+            self.optimized += 1
+        for _, variant in results[1:]:
+            self.siblings += 1
+            self.sibling_bytes += len(variant)
+
+    def as_dict(self) -> Dict:
+        return {
+            "files": self.files,
+            "optimized": self.optimized,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+            "siblings": self.siblings,
+            "sibling_bytes": self.sibling_bytes,
+        }
+
+
+async def optimize_zip(archive_file: BinaryIO, siblings: Optional[List[str]] = None) -> Tuple[BinaryIO, Dict]:
+    """
+    Étape d'optimisation entre l'extraction de l'archive et le commit : chaque
+    fichier est traité dans un processus de travail (tous les cœurs, sans
+    bloquer la boucle d'événements) et une nouvelle archive est produite.
+    Retourne (archive optimisée positionnée au début, rapport).
+    """
+    siblings = OPTIMIZE_SIBLINGS if siblings is None else siblings
+    report = OptimizationReport()
+    output = tempfile.SpooledTemporaryFile(max_size=OPTIMIZE_SPOOL_BYTES)
+    try:
+        await _optimize_members(archive_file, output, siblings, report)
+    except BaseException:
+        output.close()
+        raise
+
+    output.seek(0)
+    logger.info(f"Optimisation des assets: {report.as_dict()}")
+    return output, report.as_dict()
+
+
+async def _optimize_members(archive_file: BinaryIO, output: BinaryIO, siblings: List[str], report: OptimizationReport):
+    """Traite les fichiers de l'archive en parallèle et écrit le résultat dans `output`"""
+    loop = asyncio.get_running_loop()
+    # Fichiers en cours de traitement bornés : la mémoire reste proportionnelle au nombre de processus
+    pending = asyncio.Semaphore(OPTIMIZE_WORKERS * 2)
+    writing = asyncio.Lock()
+    # Lectures et écritures des archives en cours dans des threads : attendues avant leur fermeture
+    blocking = set()
+
+    async def run_blocking(function, *args):
+        future = loop.run_in_executor(None, function, *args)
+        blocking.add(future)
+        future.add_done_callback(blocking.discard)
+        return await asyncio.shield(future)
+
+    with zipfile.ZipFile(archive_file) as source, zipfile.ZipFile(output, "w") as target:
+        names = {info.filename for info in source.infolist()}
+
+        async def process(info):
+            async with pending:
+                data = await run_blocking(source.read, info)
+                pool = _executor()
+                try:
+                    results = await loop.run_in_executor(pool, optimize_member, info.filename, data, siblings)
+                except BrokenProcessPool:
+                    # Processus perdu : fichier publié tel quel, nouveau pool pour les suivants
+                    logger.warning(f"Optimisation de {info.filename} interrompue (processus arrêté), fichier conservé")
+                    _discard_executor(pool)
+                    results = [(info.filename, data)]
+                report.add(data, results)
+                # Une variante portant le nom d'un fichier de l'archive n'est pas ajoutée
+                results = [(name, content) for name, content in results if name == info.filename or name not in names]
+                async with writing:
+                    await run_blocking(_write_members, target, results)
+
+        tasks = [asyncio.ensure_future(process(info)) for info in source.infolist() if not info.is_dir()]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Échec ou annulation : plus aucune écriture dans les archives une fois fermées
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.gather(*blocking, return_exceptions=True)
+            raise
@@ -0,0 +1,111 @@
+import json
+import shlex
+from typing import Iterable, List, Optional
+
+CI_FILE_PATH = ".gitlab-ci.yml"
+PAGES_IMAGE = "alpine:3.19"
+
+# Fichiers jamais publiés (sources, fichiers de travail, configuration du dépôt)
+DEFAULT_EXCLUDE = [".git", ".gitlab-ci.yml", ".gitkeep", "node_modules", "*.psd", "*.xcf", "*.kra", "*.blend"]
+# Extensions dont la modification justifie un redéploiement quand aucune règle d'inclusion n'est fournie
+SITE_EXTENSIONS = [
+    "html", "htm", "css", "js", "mjs", "json", "xml", "txt", "webmanifest",
+    "svg", "png", "jpg", "jpeg", "gif", "webp", "avif", "ico",
+    "woff", "woff2", "ttf", "otf", "mp3", "mp4", "webm", "ogg", "wav", "pdf",
+]
+# Formats texte servis précompressés par Pages (.gz et .br à côté de l'original)
+COMPRESSIBLE_EXTENSIONS = ["html", "htm", "css", "js", "mjs", "json", "xml", "txt", "svg", "webmanifest"]
+
+
+def _yaml_string(value: str) -> str:
+    # Une chaîne JSON est une chaîne YAML entre guillemets valide
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _clean_patterns(patterns: Optional[Iterable[str]]) -> List[str]:
+    return [pattern.strip() for pattern in patterns or [] if pattern and pattern.strip()]
+
+
+def _include_filter(pattern: str) -> str:
+    # Répertoire désigné par « dir/ » : tout son contenu est publié (équivalent rsync de « dir/*** »)
+    return f"{pattern}***" if pattern.endswith("/") else pattern
+
+
+def _changes_glob(pattern: str) -> str:
+    """
+    Motif rsync traduit en motif `rules: changes` (glob de chemin complet) :
+    un motif non ancré s'applique à toute profondeur, un répertoire à tout son contenu.
+    """
+    anchored = pattern.startswith("/")
+    glob = pattern.lstrip("/")
+    if glob.endswith("/***"):
+        glob = glob[:-len("***")] + "**/*"
+    elif glob.endswith("/"):
+        glob += "**/*"
+    if not anchored and not glob.startswith("**/"):
+        glob = f"**/{glob}"
+    return glob
+
+
+def build_pages_ci(branch: str = "main", include: Optional[Iterable[str]] = None,
+                   exclude: Optional[Iterable[str]] = None, precompress: bool = True) -> str:
+    """
+    Génère le .gitlab-ci.yml du job Pages :
+    - copie dans public/ les seuls fichiers retenus par les règles include/exclude
+      (motifs rsync ; sans include, tout le dépôt hors exclusions) ;
+    - précompresse les fichiers texte en .gz et .br, servis tels quels par Pages ;
+    - ne se déclenche, sur la branche par défaut, que si un fichier du site a changé
+      (les pipelines lancés via l'API ou manuellement déploient toujours).
+    """
+    include = _clean_patterns(include)
+    exclude = DEFAULT_EXCLUDE + [pattern for pattern in _clean_patterns(exclude) if pattern not in DEFAULT_EXCLUDE]
+
+    filters = ["--exclude=/.public", "--exclude=/public"]
+    filters += [f"--exclude={shlex.quote(pattern)}" for pattern in exclude]
+    if include:
+        # Les répertoires sont parcourus, seuls les fichiers inclus sont copiés
+        filters += ["--include='*/'"] + [f"--include={shlex.quote(_include_filter(pattern))}" for pattern in include]
+        filters += ["--exclude='*'", "--prune-empty-dirs"]
+
+    packages = "rsync gzip brotli" if precompress else "rsync"
+    script = [
+        f"apk add --no-cache {packages}",
+        "rm -rf .public",
+        f"rsync -a {' '.join(filters)} ./ .public/",
+        "rm -rf public",
+        "mv .public public",
+    ]
+    if precompress:
+        names = " -o ".join(f"-name '*.{extension}'" for extension in COMPRESSIBLE_EXTENSIONS)
+        script += [
+            f"find public -type f \\( {names} \\) -size +1k -exec gzip -k -9 {{}} \\; -exec brotli -k -q 11 {{}} \\;",
+        ]
+
+    if include:
+        changes = [_changes_glob(pattern) for pattern in include]
+    else:
+        changes = [f"**/*.{{{','.join(SITE_EXTENSIONS)}}}"]
+    changes = changes + [CI_FILE_PATH]
+
+    lines = [
+        "# Généré par L'Établi : publication du site sur Forge Pages",
+        "pages:",
+        "  stage: deploy",
+        f"  image: {PAGES_IMAGE}",
+        "  variables:",
+        "    GIT_DEPTH: \"1\"",
+        "  script:",
+    ]
+    lines += [f"    - {_yaml_string(command)}" for command in script]
+    lines += [
+        "  artifacts:",
+        "    paths:",
+        "      - public",
+        "  rules:",
+        # `changes` est toujours vrai pour les pipelines qui ne viennent pas d'un push
+        f"    - if: '$CI_COMMIT_BRANCH == {_yaml_string(branch)}'",
+        "      changes:",
+    ]
+    lines += [f"        - {_yaml_string(pattern)}" for pattern in changes]
+    lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,327 @@
+import contextvars
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import APIRouter, Header, HTTPException, status
+
+from .responses import FastJSONResponse
+
+# Jeton d'administration du profilage ; vide : profilage désactivé (aucun code ajouté aux requêtes)
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+# Répertoire des profils (piles repliées pour flamegraph.pl / speedscope, et résumés JSON)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Intervalle (secondes) entre deux échantillons des piles d'appels
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+# Durée maximale (secondes) d'une fenêtre de profilage
+PROFILE_MAX_SECONDS = 300
+# En-tête portant le jeton : sur une requête, profile cette requête
+PROFILE_HEADER = "X-Profile-Token"
+# Routes d'administration du profilage, jamais profilées elles-mêmes
+PROFILE_ROUTES = ("/api/profiling", "/admin/profile")
+
+# Pile dans le code réseau : attente de la forge (ou d'un autre service)
+NETWORK_MODULES = ("socket", "ssl", "httpcore", "h11", "h2")
+# Feuille de pile d'un thread inactif (attente de travail ou d'événements)
+IDLE_LEAVES = ("threading:wait", "threading:_wait_for_tstate_lock", "selectors:select", "queue:get",
+               "concurrent.futures.thread:_worker", "socketserver:serve_forever")
+
+enabled = bool(PROFILE_ADMIN_TOKEN)
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# Temps d'attente de la forge de la requête profilée en cours (contexte de la requête)
+_forge_wait: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("forge_wait", default=None)
+
+
+def check_token(value: Optional[str]) -> bool:
+    return enabled and bool(value) and hmac.compare_digest(value, PROFILE_ADMIN_TOKEN)
+
+
+class Sampler(threading.Thread):
+    """
+    Échantillonneur de piles d'appels : toutes les `interval` secondes, relève
+    la pile des threads observés (tous, ou `thread_ids`). Chaque pile est
+    classée [cpu], [network] (code réseau : attente de la forge) ou [idle].
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, thread_ids=None):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.stacks: Counter = Counter()
+        self.categories: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = []
+                network = False
+                while frame is not None:
+                    module = frame.f_globals.get("__name__", "?")
+                    network = network or module.split(".")[0] in NETWORK_MODULES
+                    stack.append(f"{module}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                category = "[network]" if network else "[idle]" if stack and stack[0] in IDLE_LEAVES else "[cpu]"
+                stack.reverse()
+                self.categories[category] += 1
+                self.stacks[";".join([category, names.get(ident, str(ident))] + stack)] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def folded(self) -> str:
+        """Piles au format replié (une ligne « pile;appels nombre »)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_name(label: str) -> str:
+    """Nom de base des fichiers d'un profil : date puis libellé"""
+    now = time.time()
+    return f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}-{re.sub(r'[^A-Za-z0-9_-]+', '_', label).strip('_-')[:80]}"
+
+
+def _write(name: str, sampler: Sampler, summary: Dict) -> str:
+    """Écrit le profil (.folded) et son résumé (.json) ; retourne le nom de base"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    summary.update(
+        samples=sum(sampler.categories.values()),
+        sample_interval=sampler.interval,
+        categories=dict(sampler.categories),
+    )
+    with open(os.path.join(PROFILE_DIR, f"{name}.folded"), "w", encoding="utf-8") as f:
+        f.write(sampler.folded())
+    with open(os.path.join(PROFILE_DIR, f"{name}.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return name
+
+
+class RequestProfile:
+    """Profil d'une requête : échantillons du thread, temps total, CPU et attente de la forge"""
+
+    def __init__(self, label: str, thread_ids=None):
+        self.label = label
+        self.name = profile_name(label)
+        self.sampler = Sampler(thread_ids=thread_ids)
+        self.forge_wait = [0.0, 0]
+        self.token = _forge_wait.set(self.forge_wait)
+        self.started = time.perf_counter()
+        self.thread_cpu = time.thread_time()
+        self.process_cpu = time.process_time()
+        self.sampler.start()
+
+    def finish(self, status_code: int, thread_cpu: bool = True) -> str:
+        """Arrête l'échantillonnage et écrit le profil ; `thread_cpu` : CPU du thread (requêtes synchrones)"""
+        self.sampler.stop()
+        _forge_wait.reset(self.token)
+        summary = {
+            "kind": "request",
+            "label": self.label,
+            "status_code": status_code,
+            "wall_seconds": round(time.perf_counter() - self.started, 6),
+            "forge_wait_seconds": round(self.forge_wait[0], 6),
+            "forge_requests": self.forge_wait[1],
+        }
+        if thread_cpu:
+            summary["cpu_seconds"] = round(time.thread_time() - self.thread_cpu, 6)
+        else:
+            # Requête asynchrone : le CPU d'une tâche n'est pas mesurable seul
+            summary["process_cpu_seconds"] = round(time.process_time() - self.process_cpu, 6)
+        return _write(self.name, self.sampler, summary)
+
+
+class WindowProfiler:
+    """Profilage de tout le processus pendant une fenêtre de temps (une à la fois)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current: Optional[Dict] = None
+        self.last: Optional[str] = None
+        # Attente de la forge cumulée de toutes les requêtes pendant la fenêtre
+        self.forge_wait: Optional[List[float]] = None
+
+    def start(self, seconds: float, label: str = "window") -> Dict:
+        seconds = max(0.1, min(seconds, PROFILE_MAX_SECONDS))
+        with self._lock:
+            if self.current is not None:
+                raise RuntimeError("Un profilage est déjà en cours")
+            sampler = Sampler()
+            self.forge_wait = [0.0, 0]
+            self.current = {"label": label, "seconds": seconds, "started_at": time.time()}
+            sampler.start()
+        timer = threading.Timer(seconds, self._finish, (sampler, label, seconds, time.process_time()))
+        # Une fenêtre en cours ne retarde pas l'arrêt du processus
+        timer.daemon = True
+        timer.start()
+        return dict(self.current)
+
+    def _finish(self, sampler: Sampler, label: str, seconds: float, process_cpu: float):
+        sampler.stop()
+        try:
+            name = _write(profile_name(label), sampler, {
+                "kind": "window",
+                "label": label,
+                "wall_seconds": seconds,
+                "process_cpu_seconds": round(time.process_time() - process_cpu, 6),
+                # Somme sur les requêtes simultanées : peut dépasser la durée de la fenêtre
+                "forge_wait_seconds": round(self.forge_wait[0], 6),
+                "forge_requests": self.forge_wait[1],
+            })
+        except OSError as e:
+            logger.error(f"Écriture du profil impossible: {e}")
+            name = None
+        with self._lock:
+            self.current = None
+            self.forge_wait = None
+            self.last = name
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {"running": self.current, "last": self.last}
+
+
+window = WindowProfiler()
+
+
+def list_profiles() -> List[Dict]:
+    """Résumés des profils écrits, du plus récent au plus ancien"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in sorted(os.scandir(PROFILE_DIR), key=lambda entry: entry.name, reverse=True):
+        if entry.name.endswith(".json"):
+            try:
+                with open(entry.path, encoding="utf-8") as f:
+                    profiles.append({"name": entry.name[:-5], **json.load(f)})
+            except (OSError, ValueError):
+                continue
+    return profiles
+
+
+# --- Temps d'attente de la forge ---
+
+class _ForgeTimer:
+    def __enter__(self):
+        self.accumulator = _forge_wait.get()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        for accumulator in (self.accumulator, window.forge_wait):
+            if accumulator is not None:
+                accumulator[0] += elapsed
+                accumulator[1] += 1
+        return False
+
+
+class TimedTransport(httpx.BaseTransport):
+    """Transport httpx qui compte le temps passé à attendre la forge pendant une requête profilée"""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with _ForgeTimer():
+            return self._transport.handle_request(request)
+
+    def metrics(self) -> Dict:
+        return self._transport.metrics()
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncTimedTransport(httpx.AsyncBaseTransport):
+    """Équivalent asynchrone de TimedTransport"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with _ForgeTimer():
+            return await self._transport.handle_async_request(request)
+
+    def metrics(self) -> Dict:
+        return self._transport.metrics()
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+# --- API ---
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI : une requête portant l'en-tête X-Profile-Token valide est
+    profilée. Installé seulement si PROFILE_ADMIN_TOKEN est défini.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(PROFILE_ROUTES):
+            await self.app(scope, receive, send)
+            return
+        token = dict(scope["headers"]).get(PROFILE_HEADER.lower().encode("latin-1"))
+        if token is None or not check_token(token.decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        # Boucle d'événements : les piles des autres tâches servies en même temps y figurent aussi
+        profile = RequestProfile(f"api-{scope['method']}-{scope['path']}", thread_ids={threading.get_ident()})
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", []).append((b"x-profile-name", profile.name.encode("latin-1")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Profil écrit après l'envoi complet (corps en flux compris), sous le nom de X-Profile-Name
+            name = profile.finish(status_code, thread_cpu=False)
+            logger.info(f"Profil de {scope['path']} écrit: {name}")
+
+
+def _require_token(token: Optional[str]):
+    if not check_token(token):
+        # Profilage désactivé ou jeton invalide : la route n'existe pas
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+
+@router.post("/profiling/start", response_class=FastJSONResponse)
+async def start_profiling(seconds: float = 30, x_profile_token: Optional[str] = Header(None)):
+    """Profile tout le processus de l'API pendant `seconds` secondes (au plus 300)"""
+    _require_token(x_profile_token)
+    try:
+        return FastJSONResponse(window.start(seconds, "api-window"))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get("/profiling", response_class=FastJSONResponse)
+async def profiling_status(x_profile_token: Optional[str] = Header(None)):
+    """Fenêtre en cours et profils écrits dans PROFILE_DIR"""
+    _require_token(x_profile_token)
+    return FastJSONResponse({**window.status(), "profiles": list_profiles()})
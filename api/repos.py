@@ -1,8 +1,20 @@
+import asyncio
+import base64
+import io
+import logging
+import zipfile
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from pydantic import BaseModel
 from typing import List, Optional
 from .forge_client import ForgeClient
+from .responses import FastJSONResponse
+from .images import AVATAR_MAX_INPUT_BYTES
+from .event_store import store, wait_for_pipeline
+from .webhooks import webhooks_enabled
+from .git_publish import PUBLISH_BACKEND, PUBLISH_BACKENDS, push_zip
+from .optimize import OPTIMIZE_ASSETS, optimize_zip
+from .scheduler import HEAVY_COST, scheduler
 
 class PipelineTrigger(BaseModel):
     project_id: int
@@ -17,6 +29,7 @@ class AvatarUpload(BaseModel):
 
 router = APIRouter()
 security = HTTPBasic()
+logger = logging.getLogger(__name__)
 
 # Modèles Pydantic
 class RepoCreate(BaseModel):
@@ -33,35 +46,49 @@ class ForkRequest(BaseModel):
     source_project_id: int
     target_namespace: Optional[str] = None
     new_name: Optional[str] = None
+    wait: bool = False  # Ne répondre qu'une fois le contenu du fork importé
+    wait_timeout: float = 60
+
+class PagesConfig(BaseModel):
+    include: Optional[List[str]] = None  # Motifs des fichiers publiés (tous par défaut)
+    exclude: Optional[List[str]] = None  # Motifs exclus en plus des exclusions par défaut
+    precompress: bool = True
+    branch: str = "main"
 
 class SpynoramaPublish(BaseModel):
     name: str
     token: str
 
 # Routes API
-@router.get("/repos", response_model=List[dict])
+# Les routes qui relaient la réponse de la forge renvoient directement une
+# FastJSONResponse : pas de re-validation pydantic ni de jsonable_encoder.
+@router.get("/repos", response_class=FastJSONResponse)
 async def list_repos(credentials: HTTPBasicCredentials = Depends(security)):
     try:
         client = ForgeClient(credentials.username, credentials.password)
-        return client.list_repos()
+        # Corps transmis tel quel, sans décodage/ré-encodage
+        return FastJSONResponse(await client.list_repos(raw=True))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
-@router.post("/repos", status_code=status.HTTP_201_CREATED)
+@router.post("/repos", status_code=status.HTTP_201_CREATED, response_class=FastJSONResponse)
 async def create_repo(repo: RepoCreate, credentials: HTTPBasicCredentials = Depends(security)):
     try:
         client = ForgeClient(credentials.username, credentials.password)
-        return client.create_repo(repo.name, repo.description, repo.visibility)
+        return FastJSONResponse(
+            await client.create_repo(repo.name, repo.description, repo.visibility),
+            status_code=status.HTTP_201_CREATED
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
-@router.post("/repos/{project_id}/commit")
+@router.post("/repos/{project_id}/commit", response_class=FastJSONResponse)
 async def commit_file(
     project_id: int,
     commit: FileCommit,
@@ -69,40 +96,47 @@ async def commit_file(
 ):
     try:
         client = ForgeClient(credentials.username, credentials.password)
-        return client.commit_file(project_id, commit.file_path, commit.content, commit.commit_message)
+        return FastJSONResponse(await client.commit_file(project_id, commit.file_path, commit.content, commit.commit_message))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
-@router.post("/repos/fork-template")
+@router.post("/repos/fork-template", response_class=FastJSONResponse)
 async def fork_template(fork: ForkRequest, credentials: HTTPBasicCredentials = Depends(security)):
     try:
         client = ForgeClient(credentials.username, credentials.password)
-        return client.fork_repo(
+        repo = await client.fork_repo(
             fork.source_project_id,
             fork.target_namespace,
             fork.new_name
         )
+        if fork.wait:
+            try:
+                repo["import_status"] = await client.wait_for_import(repo["id"], fork.wait_timeout)
+            except asyncio.TimeoutError:
+                # Import toujours en cours : le client peut réessayer plus tard
+                return FastJSONResponse(repo, status_code=status.HTTP_202_ACCEPTED)
+        return FastJSONResponse(repo)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
-@router.post("/repos/trigger-pipeline")
+@router.post("/repos/trigger-pipeline", response_class=FastJSONResponse)
 async def trigger_pipeline(trigger: PipelineTrigger, credentials: HTTPBasicCredentials = Depends(security)):
     try:
         client = ForgeClient(credentials.username, credentials.password)
-        return client.trigger_pipeline(trigger.project_id)
+        return FastJSONResponse(await client.trigger_pipeline(trigger.project_id))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
         
-@router.put("/repos/{project_id}/visibility")
+@router.put("/repos/{project_id}/visibility", response_class=FastJSONResponse)
 async def update_repo_visibility(
     project_id: int,
     update: VisibilityUpdate,
@@ -110,14 +144,31 @@ async def update_repo_visibility(
 ):
     try:
         client = ForgeClient(credentials.username, credentials.password)
-        return client.update_repo_visibility(project_id, update.visibility)
+        return FastJSONResponse(await client.update_repo_visibility(project_id, update.visibility))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+        
+@router.put("/repos/{project_id}/pages", response_class=FastJSONResponse)
+async def configure_pages(
+    project_id: int,
+    config: PagesConfig,
+    credentials: HTTPBasicCredentials = Depends(security)
+):
+    try:
+        client = ForgeClient(credentials.username, credentials.password)
+        return FastJSONResponse(await client.enable_pages(
+            project_id, config.include, config.exclude, config.precompress, config.branch
+        ))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
         
-@router.put("/repos/{project_id}/avatar")
+@router.put("/repos/{project_id}/avatar", response_class=FastJSONResponse)
 async def upload_repo_avatar(
     project_id: int,
     avatar: AvatarUpload,
@@ -127,84 +178,111 @@ async def upload_repo_avatar(
         client = ForgeClient(credentials.username, credentials.password)
         # Décoder les données base64 en binaire
         import base64
+        if len(avatar.avatar) > AVATAR_MAX_INPUT_BYTES * 4 // 3 + 4:
+            raise ValueError("Image trop volumineuse")
         avatar_data = base64.b64decode(avatar.avatar)
-        return client.upload_repo_avatar(project_id, avatar_data)
+        return FastJSONResponse(await client.upload_repo_avatar(project_id, avatar_data))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
 
+async def _commit_zip_files(client: ForgeClient, project_id: int, content: bytes):
+    """Publie les fichiers d'une archive ZIP via l'API des commits de la forge"""
+    with zipfile.ZipFile(io.BytesIO(content)) as zip_ref:
+        # Parcourir tous les fichiers du ZIP
+        for file_info in zip_ref.infolist():
+            if file_info.is_dir():
+                continue
+                
+            # Lire le contenu du fichier
+            file_content = zip_ref.read(file_info.filename)
+            
+            # Déterminer si c'est un fichier texte ou binaire
+            try:
+                # Essayer de décoder en UTF-8 pour les fichiers texte
+                text_content = file_content.decode('utf-8')
+                encoding = 'text'
+            except UnicodeDecodeError:
+                # Si échec, c'est un fichier binaire
+                text_content = base64.b64encode(file_content).decode('utf-8')
+                encoding = 'base64'
+            
+            # Commit le fichier dans le dépôt
+            await client.commit_file_with_encoding(
+                project_id,
+                file_info.filename,
+                text_content,
+                f"Ajout de {file_info.filename}",
+                encoding
+            )
+
 @router.post("/publish-spynorama", status_code=status.HTTP_201_CREATED)
 async def publish_spynorama(
     file: UploadFile = File(...),
     name: str = Form(...),
-    token: str = Form(...)
+    token: str = Form(...),
+    backend: str = Form(PUBLISH_BACKEND),
+    pages_include: Optional[str] = Form(None),
+    pages_exclude: Optional[str] = Form(None),
+    optimize: bool = Form(OPTIMIZE_ASSETS)
 ):
+    if backend not in PUBLISH_BACKENDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Backend de publication inconnu: {backend} (attendu: {', '.join(PUBLISH_BACKENDS)})"
+        )
     try:
-        # Lire le contenu du fichier ZIP
-        content = await file.read()
-        
         # Créer un client Forge avec le token fourni
         client = ForgeClient(token, "")
         
+        # Optimisation des images et minification, avant la création du dépôt (archive invalide : aucun dépôt créé)
+        archive = file.file
+        optimization = None
+        if optimize:
+            archive, optimization = await optimize_zip(file.file)
+        
         # Créer un nouveau dépôt pour le spynorama
         repo = await client.create_repo(name, f"Spynorama: {name}", "public")
         
-        # Extraire le ZIP et publier les fichiers
-        import zipfile
-        import io
-        import os
+        pushed = False
+        if backend == "git":
+            # Un seul commit construit localement et poussé en un packfile ;
+            # en cas d'échec, repli sur l'API des commits
+            try:
+                async with scheduler.slot(client.user_key, HEAVY_COST):
+                    await asyncio.to_thread(
+                        push_zip, archive, repo["http_url_to_repo"], token, "main", f"Publication de {name}"
+                    )
+                pushed = True
+            except Exception as e:
+                logger.warning(f"Push git impossible pour le projet {repo['id']}, repli sur l'API des commits: {e}")
         
-        # Créer un répertoire temporaire pour extraire les fichiers
-        with zipfile.ZipFile(io.BytesIO(content)) as zip_ref:
-            # Parcourir tous les fichiers du ZIP
-            for file_info in zip_ref.infolist():
-                if file_info.is_dir():
-                    continue
-                    
-                # Lire le contenu du fichier
-                file_content = zip_ref.read(file_info.filename)
-                
-                # Déterminer si c'est un fichier texte ou binaire
-                try:
-                    # Essayer de décoder en UTF-8 pour les fichiers texte
-                    text_content = file_content.decode('utf-8')
-                    encoding = 'text'
-                except UnicodeDecodeError:
-                    # Si échec, c'est un fichier binaire
-                    import base64
-                    text_content = base64.b64encode(file_content).decode('utf-8')
-                    encoding = 'base64'
-                
-                # Commit le fichier dans le dépôt
-                await client.commit_file_with_encoding(
-                    repo['id'],
-                    file_info.filename,
-                    text_content,
-                    f"Ajout de {file_info.filename}",
-                    encoding
-                )
+        if not pushed:
+            archive.seek(0)
+            await _commit_zip_files(client, repo['id'], await asyncio.to_thread(archive.read))
         
         # Activer GitLab Pages en ajoutant un fichier .gitlab-ci.yml
-        await client.enable_pages(repo['id'])
+        await client.enable_pages(
+            repo['id'],
+            include=pages_include.split(",") if pages_include else None,
+            exclude=pages_exclude.split(",") if pages_exclude else None
+        )
         
         # Déclencher un pipeline pour déployer les pages
         pipeline = await client.trigger_pipeline(repo['id'])
         
-        # Attendre que le pipeline soit terminé et récupérer l'URL des pages
-        import asyncio
-        
-        # Attendre un peu pour que le pipeline démarre
-        await asyncio.sleep(5)
-        
-        # Vérifier le statut du pipeline toutes les 5 secondes pendant 1 minute max
-        max_attempts = 12
-        for _ in range(max_attempts):
-            pipeline_status = await client.get_pipeline_status(repo['id'], pipeline['id'])
-            if pipeline_status['status'] in ['success', 'failed', 'canceled']:
-                break
-            await asyncio.sleep(5)
+        # Attendre la fin du pipeline : les webhooks réveillent l'attente dès que
+        # la forge notifie le résultat, l'interrogation ne sert que de secours
+        store.record_pipeline(repo['id'], pipeline)
+        await wait_for_pipeline(
+            client,
+            repo['id'],
+            pipeline['id'],
+            timeout=60,
+            poll_interval=15 if webhooks_enabled() else 5
+        )
         
         # Récupérer l'URL des pages
         pages_url = ""
@@ -219,7 +297,8 @@ async def publish_spynorama(
             "success": True,
             "repo_id": repo['id'],
             "repo_name": repo['name'],
-            "pages_url": pages_url
+            "pages_url": pages_url,
+            "optimization": optimization
         }
         
     except Exception as e:
@@ -0,0 +1,29 @@
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Repli sur le module json standard
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    """Sérialise en JSON compact (orjson si disponible)"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Réponse JSON pour les données transmises telles quelles depuis la forge.
+    Retourner directement cette réponse évite la validation pydantic et le
+    passage par jsonable_encoder ; un corps déjà sérialisé (bytes) est
+    renvoyé sans être décodé puis ré-encodé.
+    """
+
+    def render(self, content) -> bytes:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps(content)
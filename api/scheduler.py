@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Tuple
+
+from fastapi import APIRouter, Depends
+
+from . import metrics
+from .responses import FastJSONResponse
+
+# Nombre maximal de requêtes simultanées vers la forge, tous utilisateurs confondus
+FORGE_MAX_INFLIGHT = int(os.getenv("FORGE_MAX_INFLIGHT", "32"))
+# Nombre maximal de requêtes simultanées vers la forge pour un même utilisateur
+FORGE_MAX_INFLIGHT_PER_USER = int(os.getenv("FORGE_MAX_INFLIGHT_PER_USER", "4"))
+# Coût d'une opération lourde (téléchargement d'archive, push git) en nombre de requêtes simples
+HEAVY_COST = 4
+WAIT_SAMPLES = 1000
+
+router = APIRouter()
+
+
+def user_key(credential: str) -> str:
+    """Identifiant d'un utilisateur dérivé de son token ou de son nom (jamais conservé en clair)"""
+    return hashlib.sha256(credential.encode("utf-8")).hexdigest()[:16]
+
+
+class _UserState:
+    __slots__ = ("waiters", "inflight", "deficit", "granted", "wait_total")
+
+    def __init__(self):
+        self.waiters: Deque[Tuple[asyncio.Future, float, int]] = deque()
+        self.inflight = 0
+        self.deficit = 0
+        self.granted = 0
+        self.wait_total = 0.0
+
+
+class FairShareScheduler:
+    """
+    Répartition équitable des connexions sortantes vers la forge.
+    Chaque utilisateur a sa file d'attente ; lorsqu'une place se libère, les
+    files sont servies à tour de rôle (deficit round robin : une opération lourde
+    coûte plusieurs tours). Un utilisateur qui publie une grosse archive ne peut
+    donc pas occuper toutes les connexions : les requêtes des autres passent
+    entre les siennes.
+    """
+
+    def __init__(self, global_limit: int = FORGE_MAX_INFLIGHT, per_user_limit: int = FORGE_MAX_INFLIGHT_PER_USER,
+                 quantum: int = 1):
+        self.global_limit = global_limit
+        self.per_user_limit = per_user_limit
+        self.quantum = quantum
+        self._users: Dict[str, _UserState] = {}
+        self._active: Deque[str] = deque()
+        self._inflight = 0
+        self._granted = 0
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    def _grant(self, state: _UserState, queued_at: float):
+        wait = time.monotonic() - queued_at
+        state.inflight += 1
+        state.granted += 1
+        state.wait_total += wait
+        self._inflight += 1
+        self._granted += 1
+        self._waits.append(wait)
+
+    def _dispatch(self):
+        blocked = 0
+        while self._inflight < self.global_limit and self._active and blocked < len(self._active):
+            key = self._active[0]
+            state = self._users[key]
+            if not state.waiters:
+                self._active.popleft()
+                state.deficit = 0
+                continue
+            if state.inflight >= self.per_user_limit:
+                self._active.rotate(-1)
+                blocked += 1
+                continue
+            future, queued_at, cost = state.waiters[0]
+            if future.done():
+                # Attente annulée, pas encore retirée par la tâche concernée
+                state.waiters.popleft()
+                continue
+            if state.deficit < cost:
+                # Fin du tour de cet utilisateur : il cumule son quantum pour le suivant
+                state.deficit += self.quantum
+                self._active.rotate(-1)
+                continue
+            state.waiters.popleft()
+            state.deficit -= cost
+            self._grant(state, queued_at)
+            future.set_result(None)
+            blocked = 0
+
+    async def acquire(self, key: str, cost: int = 1):
+        state = self._users.get(key)
+        if state is None:
+            state = self._users[key] = _UserState()
+        now = time.monotonic()
+        # Voie rapide : personne n'attend et les deux limites sont respectées
+        if not self._active and self._inflight < self.global_limit and state.inflight < self.per_user_limit:
+            self._grant(state, now)
+            return
+        entry = (asyncio.get_running_loop().create_future(), now, cost)
+        state.waiters.append(entry)
+        if key not in self._active:
+            self._active.append(key)
+        self._dispatch()
+        try:
+            await entry[0]
+        except asyncio.CancelledError:
+            if entry[0].done() and not entry[0].cancelled():
+                # La place avait été attribuée juste avant l'annulation
+                self.release(key)
+            else:
+                if entry in state.waiters:
+                    state.waiters.remove(entry)
+                if state.inflight == 0 and not state.waiters and self._users.get(key) is state:
+                    if key in self._active:
+                        self._active.remove(key)
+                    del self._users[key]
+            raise
+
+    def release(self, key: str):
+        state = self._users[key]
+        state.inflight -= 1
+        self._inflight -= 1
+        if state.inflight == 0 and not state.waiters:
+            if key in self._active:
+                self._active.remove(key)
+            del self._users[key]
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, key: str, cost: int = 1):
+        """Occupe une connexion vers la forge pour le compte de l'utilisateur `key`"""
+        await self.acquire(key, cost)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def metrics(self) -> Dict:
+        waits: List[float] = sorted(self._waits)
+
+        def percentile(ratio):
+            return round(waits[min(len(waits) - 1, int(ratio * len(waits)))] * 1000, 2) if waits else 0.0
+
+        return {
+            "global_limit": self.global_limit,
+            "per_user_limit": self.per_user_limit,
+            "inflight": self._inflight,
+            "queued": sum(len(state.waiters) for state in self._users.values()),
+            "granted": self._granted,
+            "queue_wait_ms": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(waits[-1] * 1000, 2) if waits else 0.0,
+            },
+            "users": {
+                key: {
+                    "inflight": state.inflight,
+                    "queued": len(state.waiters),
+                    "granted": state.granted,
+                    "mean_wait_ms": round(state.wait_total / state.granted * 1000, 2) if state.granted else 0.0,
+                }
+                for key, state in self._users.items()
+            },
+        }
+
+
+# Instance partagée par tous les clients de la forge du processus
+scheduler = FairShareScheduler()
+
+
+@router.get("/scheduler/metrics", response_class=FastJSONResponse, dependencies=[Depends(metrics.require_token)])
+async def scheduler_metrics():
+    """Occupation des connexions vers la forge et temps d'attente dans les files"""
+    return FastJSONResponse(scheduler.metrics())
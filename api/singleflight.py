@@ -0,0 +1,151 @@
+import asyncio
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from fastapi import APIRouter, Depends
+
+from . import metrics, profiling
+from .http_cache import (AsyncValidationCacheTransport, StoredResponse, ValidationCacheTransport, aread_raw, cache,
+                         read_raw, request_key)
+from .responses import FastJSONResponse
+
+router = APIRouter()
+
+
+class _Counters:
+    def __init__(self):
+        self.requests = 0
+        self.upstream = 0
+        self.coalesced = 0
+
+    def as_dict(self, inflight: int) -> Dict:
+        return {
+            "requests": self.requests,
+            "upstream": self.upstream,
+            "coalesced": self.coalesced,
+            "inflight": inflight,
+        }
+
+
+class SingleFlightTransport(httpx.BaseTransport):
+    """
+    Transport httpx (synchrone) qui regroupe les requêtes identiques simultanées :
+    la première part vers la forge, les suivantes attendent sa réponse et en
+    reçoivent une copie. Le transport sous-jacent est partagé et n'est pas fermé
+    avec les clients qui l'utilisent.
+    """
+
+    def __init__(self, transport: Optional[httpx.BaseTransport] = None):
+        self._transport = transport or httpx.HTTPTransport()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Tuple[threading.Event, list]] = {}
+        self.counters = _Counters()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        if key is None:
+            return self._transport.handle_request(request)
+
+        with self._lock:
+            self.counters.requests += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = (threading.Event(), [])
+                self.counters.upstream += 1
+            else:
+                self.counters.coalesced += 1
+        done, outcome = flight
+
+        if not leader:
+            done.wait()
+            if isinstance(outcome[0], BaseException):
+                raise outcome[0]
+            return outcome[0].response()
+
+        try:
+            response = self._transport.handle_request(request)
+            try:
+                shared = StoredResponse.from_response(response, read_raw(response))
+            finally:
+                response.close()
+            outcome.append(shared)
+            return shared.response()
+        except BaseException as e:
+            outcome.append(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            done.set()
+
+    def metrics(self) -> Dict:
+        return self.counters.as_dict(len(self._inflight))
+
+    def close(self):
+        # Transport partagé par tous les clients du processus
+        pass
+
+
+class AsyncSingleFlightTransport(httpx.AsyncBaseTransport):
+    """Équivalent asynchrone de SingleFlightTransport, pour ForgeClient"""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.counters = _Counters()
+
+    async def _fetch(self, request: httpx.Request) -> StoredResponse:
+        response = await self._transport.handle_async_request(request)
+        try:
+            return StoredResponse.from_response(response, await aread_raw(response))
+        finally:
+            await response.aclose()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        if key is None:
+            return await self._transport.handle_async_request(request)
+
+        self.counters.requests += 1
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.counters.upstream += 1
+            # Tâche indépendante : l'annulation d'un demandeur n'interrompt pas les autres
+            flight = self._inflight[key] = asyncio.ensure_future(self._fetch(request))
+            flight.add_done_callback(lambda done: self._landed(key, done))
+        else:
+            self.counters.coalesced += 1
+        shared = await asyncio.shield(flight)
+        return shared.response()
+
+    def _landed(self, key: str, flight: asyncio.Future):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if not flight.cancelled():
+            # Erreur déjà transmise aux demandeurs (ou sans demandeur restant)
+            flight.exception()
+
+    def metrics(self) -> Dict:
+        return self.counters.as_dict(len(self._inflight))
+
+    async def aclose(self):
+        # Transport partagé par tous les clients du processus
+        pass
+
+
+# Instances partagées par tous les clients de la forge du processus (API et interface) :
+# regroupement des requêtes simultanées, puis revalidation des réponses conservées
+transport = AsyncSingleFlightTransport(AsyncValidationCacheTransport(cache=cache))
+sync_transport = SingleFlightTransport(ValidationCacheTransport(cache=cache))
+if profiling.enabled:
+    # Mesure de l'attente de la forge des requêtes profilées ; absent si le profilage est désactivé
+    transport = profiling.AsyncTimedTransport(transport)
+    sync_transport = profiling.TimedTransport(sync_transport)
+
+
+@router.get("/singleflight/metrics", response_class=FastJSONResponse, dependencies=[Depends(metrics.require_token)])
+async def singleflight_metrics():
+    """Requêtes vers la forge regroupées (`coalesced` : appels amont évités) et cache de revalidation"""
+    return FastJSONResponse({**transport.metrics(), "http_cache": cache.metrics()})
@@ -0,0 +1,235 @@
+import asyncio
+import base64
+import fnmatch
+import hashlib
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .forge_client import ForgeAPIError, ForgeClient
+from .pages_ci import CI_FILE_PATH
+
+# Taille maximale (octets) du corps d'un commit de synchronisation ; au-delà, plusieurs commits
+SYNC_COMMIT_BYTES = int(os.getenv("SYNC_COMMIT_BYTES", str(64 * 1024 * 1024)))
+# Fichiers et répertoires locaux jamais synchronisés
+DEFAULT_EXCLUDES = (".git", "__pycache__", ".DS_Store", "Thumbs.db", "*.swp", "*~", ".#*")
+# Fichiers distants conservés même s'ils n'existent pas localement (configuration des Pages)
+DEFAULT_KEEP = (CI_FILE_PATH, ".gitkeep", "*/.gitkeep")
+HASH_CHUNK = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def is_excluded(path: str, excludes) -> bool:
+    """Chemin relatif exclu : lui-même ou l'un de ses répertoires correspond à un motif (« build/ » : répertoire)"""
+    patterns = [pattern.rstrip("/") for pattern in excludes]
+    parts = path.split("/")
+    candidates = parts + ["/".join(parts[:index]) for index in range(2, len(parts) + 1)]
+    return any(fnmatch.fnmatch(candidate, pattern) for candidate in candidates for pattern in patterns)
+
+
+def git_blob_sha(path: str) -> str:
+    """SHA-1 de l'objet blob git d'un fichier (celui renvoyé par l'arborescence de la forge)"""
+    digest = hashlib.sha1(f"blob {os.path.getsize(path)}\0".encode("ascii"))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LocalTree:
+    """
+    Fichiers d'un répertoire local et leur SHA de blob git. Le SHA n'est
+    recalculé que pour les fichiers dont la taille ou la date ont changé.
+    """
+
+    def __init__(self, root: str, excludes=DEFAULT_EXCLUDES):
+        self.root = os.path.abspath(root)
+        self.excludes = tuple(excludes)
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+
+    def _excluded(self, name: str) -> bool:
+        return is_excluded(name, self.excludes)
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        """Chemins relatifs (séparateur /) → (taille, date de modification en ns)"""
+        found = {}
+        for directory, dirs, files in os.walk(self.root):
+            dirs[:] = [name for name in dirs if not self._excluded(name)]
+            for name in files:
+                if self._excluded(name):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if not self._excluded(rel):
+                    found[rel] = (stat.st_size, stat.st_mtime_ns)
+        return found
+
+    def hashes(self, stats: Optional[Dict[str, Tuple[int, int]]] = None) -> Dict[str, str]:
+        """Chemins relatifs → SHA de blob git"""
+        stats = self.scan() if stats is None else stats
+        hashes = {}
+        for rel, (size, mtime) in stats.items():
+            known = self._hashes.get(rel)
+            if known is None or known[:2] != (size, mtime):
+                try:
+                    known = (size, mtime, git_blob_sha(os.path.join(self.root, rel)))
+                except OSError:
+                    # Fichier supprimé entre le parcours et la lecture
+                    continue
+                self._hashes[rel] = known
+            hashes[rel] = known[2]
+        for rel in set(self._hashes) - set(stats):
+            del self._hashes[rel]
+        return hashes
+
+    def size(self, rel: str) -> int:
+        return self._hashes[rel][0] if rel in self._hashes else os.path.getsize(os.path.join(self.root, rel))
+
+    def read(self, rel: str) -> bytes:
+        with open(os.path.join(self.root, rel), "rb") as f:
+            return f.read()
+
+
+def plan_sync(local: Dict[str, str], remote: Dict[str, str], delete: bool = True, keep=DEFAULT_KEEP,
+              excludes=()) -> List[Tuple[str, str]]:
+    """
+    Actions (create, update, delete) qui rendent l'arborescence distante identique
+    à la locale. Les fichiers distants exclus ne sont jamais supprimés : absents
+    localement parce qu'ignorés, pas parce qu'effacés (comme rsync sans --delete-excluded).
+    """
+    plan = []
+    for path, sha in sorted(local.items()):
+        if path not in remote:
+            plan.append(("create", path))
+        elif remote[path] != sha:
+            plan.append(("update", path))
+    if delete:
+        for path in sorted(set(remote) - set(local)):
+            if not any(fnmatch.fnmatch(path, pattern) for pattern in keep) and not is_excluded(path, excludes):
+                plan.append(("delete", path))
+    return plan
+
+
+def chunk_plan(tree: LocalTree, plan: List[Tuple[str, str]], limit: int = SYNC_COMMIT_BYTES) -> List[List[Tuple[str, str]]]:
+    """Découpe le plan en lots dont le corps de commit (contenu en base64) reste sous `limit` octets"""
+    chunks, current, current_size = [], [], 0
+    for action, path in plan:
+        size = len(path) + 96
+        if action != "delete":
+            size += 4 * ((tree.size(path) + 2) // 3)
+        if current and current_size + size > limit:
+            chunks.append(current)
+            current, current_size = [], 0
+        current.append((action, path))
+        current_size += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _commit_action(tree: LocalTree, action: str, path: str) -> Dict:
+    if action == "delete":
+        return {"action": "delete", "file_path": path}
+    return {
+        "action": action,
+        "file_path": path,
+        "content": base64.b64encode(tree.read(path)).decode("ascii"),
+        "encoding": "base64",
+    }
+
+
+async def remote_tree(client: ForgeClient, project_id: int, branch: str) -> Dict[str, str]:
+    """Chemins → SHA de blob des fichiers de la branche distante"""
+    return {item["path"]: item["id"] for item in await client.list_tree(project_id, branch) if item["type"] == "blob"}
+
+
+async def push_plan(client: ForgeClient, project_id: int, tree: LocalTree, plan: List[Tuple[str, str]],
+                    commit_message: str, branch: str, limit: int = SYNC_COMMIT_BYTES) -> List[Dict]:
+    """Publie le plan en un commit (plusieurs seulement si le corps dépasse `limit`)"""
+    chunks = chunk_plan(tree, plan, limit)
+    commits = []
+    for index, chunk in enumerate(chunks, start=1):
+        message = commit_message if len(chunks) == 1 else f"{commit_message} ({index}/{len(chunks)})"
+        # Seuls les fichiers du lot en cours sont lus en mémoire
+        actions = await asyncio.to_thread(lambda: [_commit_action(tree, action, path) for action, path in chunk])
+        commits.append(await client.commit_actions(project_id, actions, message, branch))
+    return commits
+
+
+class FolderSync:
+    """
+    Synchronisation d'un répertoire local vers la branche d'un projet : seuls
+    les fichiers ajoutés, modifiés (SHA de blob différent) et supprimés sont
+    envoyés, regroupés en un commit. L'arborescence distante n'est relue qu'au
+    premier passage ou après un refus de la forge (modification concurrente).
+    """
+
+    def __init__(self, client: ForgeClient, project_id: int, root: str, branch: str, delete: bool = True,
+                 excludes=DEFAULT_EXCLUDES, commit_message: Optional[str] = None):
+        self.client = client
+        self.project_id = project_id
+        self.tree = LocalTree(root, excludes)
+        self.branch = branch
+        self.delete = delete
+        self.commit_message = commit_message
+        self.remote: Optional[Dict[str, str]] = None
+
+    async def run_once(self, dry_run: bool = False, stats=None) -> List[Tuple[str, str]]:
+        """Compare et publie les différences ; retourne le plan appliqué"""
+        if self.remote is None:
+            self.remote = await remote_tree(self.client, self.project_id, self.branch)
+        local = await asyncio.to_thread(self.tree.hashes, stats)
+        plan = plan_sync(local, self.remote, self.delete, excludes=self.tree.excludes)
+        if not plan or dry_run:
+            return plan
+        message = self.commit_message or f"Synchronisation de {len(plan)} fichier(s)"
+        try:
+            await push_plan(self.client, self.project_id, self.tree, plan, message, self.branch)
+        except ForgeAPIError as e:
+            if e.status_code == 400:
+                # Arborescence distante modifiée entre-temps : relue au prochain passage
+                self.remote = None
+            raise
+        for action, path in plan:
+            if action == "delete":
+                self.remote.pop(path, None)
+            else:
+                self.remote[path] = local[path]
+        return plan
+
+    async def watch(self, interval: float = 1.0, debounce: float = 2.0,
+                    on_sync: Optional[Callable[[List[Tuple[str, str]]], None]] = None):
+        """
+        Surveille le répertoire (parcours toutes les `interval` secondes) et publie
+        les changements une fois le répertoire stable depuis `debounce` secondes :
+        une rafale d'enregistrements donne un seul commit.
+        """
+        stats = await asyncio.to_thread(self.tree.scan)
+        plan = await self.run_once(stats=stats)
+        if on_sync:
+            on_sync(plan)
+        dirty, changed_at = False, 0.0
+        while True:
+            await asyncio.sleep(interval)
+            current = await asyncio.to_thread(self.tree.scan)
+            if current != stats:
+                stats, dirty, changed_at = current, True, time.monotonic()
+                continue
+            if not dirty or time.monotonic() - changed_at < debounce:
+                continue
+            try:
+                plan = await self.run_once(stats=stats)
+                dirty = False
+            except Exception as e:
+                # Nouvel essai au prochain intervalle
+                logger.warning(f"Synchronisation impossible: {e}")
+                changed_at = time.monotonic()
+                continue
+            if on_sync:
+                on_sync(plan)
@@ -0,0 +1,121 @@
+import hmac
+import logging
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request, status
+
+from .event_store import store
+
+# Secret partagé avec la forge (champ "Secret token" du webhook)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# URL publique de l'endpoint, utilisée pour enregistrer automatiquement les webhooks
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def webhooks_enabled() -> bool:
+    """Les webhooks ne sont enregistrés que si l'URL publique et le secret sont configurés"""
+    return bool(WEBHOOK_URL and WEBHOOK_SECRET)
+
+
+def hook_settings() -> dict:
+    """Paramètres du webhook de L'Établi (événements pipeline et push), pour l'API et l'interface"""
+    return {
+        "url": WEBHOOK_URL,
+        "token": WEBHOOK_SECRET,
+        "push_events": True,
+        "pipeline_events": True,
+        "enable_ssl_verification": True
+    }
+
+
+def _check_token(token: Optional[str]):
+    if not WEBHOOK_SECRET:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Webhooks non configurés")
+    if not token or not hmac.compare_digest(token, WEBHOOK_SECRET):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton de webhook invalide")
+
+
+def _project_id(value) -> int:
+    # Événement incomplet : 400 plutôt qu'une erreur 500 (la forge désactive les webhooks qui échouent)
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).isdigit():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Identifiant de projet manquant ou invalide")
+    return int(value)
+
+
+def _pipeline_from_event(payload: dict) -> dict:
+    attributes = payload.get("object_attributes", {})
+    builds = payload.get("builds") or []
+    return {
+        "id": attributes.get("id"),
+        "status": attributes.get("status"),
+        "ref": attributes.get("ref"),
+        "sha": attributes.get("sha"),
+        # Le job "pages" réussi signifie que le site a été redéployé
+        "pages_deployed": any(build.get("name") == "pages" and build.get("status") == "success" for build in builds),
+    }
+
+
+def _repo_from_project(project: dict) -> dict:
+    return {
+        "name": project.get("name"),
+        "path_with_namespace": project.get("path_with_namespace"),
+        "web_url": project.get("web_url"),
+        "visibility": project.get("visibility") or {0: "private", 10: "internal", 20: "public"}.get(project.get("visibility_level")),
+        "default_branch": project.get("default_branch"),
+    }
+
+
+@router.post("/webhooks/forge", status_code=status.HTTP_202_ACCEPTED)
+async def receive_forge_event(request: Request, x_gitlab_token: Optional[str] = Header(None)):
+    """Reçoit les événements pipeline, push et projet envoyés par la forge"""
+    _check_token(x_gitlab_token)
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Corps JSON invalide")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Événement invalide")
+    kind = payload.get("object_kind") or payload.get("event_name")
+    project = payload.get("project")
+    if not isinstance(project, dict):
+        project = {}
+
+    if kind == "pipeline":
+        project_id = _project_id(project.get("id"))
+        store.record_pipeline(project_id, _pipeline_from_event(payload))
+        store.record_repo(project_id, _repo_from_project(project))
+    elif kind in ("push", "tag_push"):
+        store.record_push(
+            _project_id(payload.get("project_id")),
+            payload.get("ref"),
+            payload.get("checkout_sha") or payload.get("after"),
+            _repo_from_project(project)
+        )
+    elif kind == "project_destroy":
+        store.forget(_project_id(payload.get("project_id")))
+    elif kind in ("project_create", "project_update", "project_rename", "project_transfer"):
+        store.record_repo(_project_id(payload.get("project_id")), {
+            "name": payload.get("name"),
+            "path_with_namespace": payload.get("path_with_namespace"),
+            "visibility": payload.get("project_visibility"),
+        })
+    else:
+        logger.debug(f"Événement de forge ignoré: {kind}")
+        return {"accepted": False}
+
+    return {"accepted": True}
+
+
+@router.get("/webhooks/status")
+async def projects_status(ids: str, x_gitlab_token: Optional[str] = Header(None)):
+    """
+    État connu (dernier pipeline, commit de tête, métadonnées) des projets demandés.
+    Réservé aux services internes : protégé par le même secret que les webhooks.
+    """
+    _check_token(x_gitlab_token)
+    project_ids = [int(value) for value in ids.split(",") if value.strip().isdigit()]
+    return {str(project_id): entry for project_id, entry in store.snapshot(project_ids).items()}
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the Spynorama publishing backends on a media-heavy site.
+Compares wall time, request count and bytes on the wire for:
+- the commits API path (one JSON request per file, base64 for binaries),
+  sent to an in-process mock forge so only client-side cost is timed
+- the git backend (fast-import + one packfile pushed to a local bare repo)
+
+Network time is not simulated: with a real forge, the commits API pays one
+round trip per file on top of the bytes shown here.
+
+Usage: python benchmarks/bench_publish.py [--size-mb 50] [--media-ratio 0.9]
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from api import forge_client
+from api.forge_client import ForgeClient
+from api.git_publish import push_zip
+from api.repos import _commit_zip_files
+
+
+def build_site(size_mb, media_ratio, seed=42):
+    """ZIP of a site: incompressible media (like JPEG/MP3) plus HTML/CSS/JS pages"""
+    rng = random.Random(seed)
+    total = int(size_mb * 1024 * 1024)
+    media_bytes = int(total * media_ratio)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        index = 0
+        while media_bytes > 0:
+            size = min(media_bytes, rng.randint(200 * 1024, 2 * 1024 * 1024))
+            archive.writestr(f"medias/photo{index:03d}.jpg", rng.randbytes(size))
+            media_bytes -= size
+            index += 1
+        text_bytes = total - int(total * media_ratio)
+        words = ["panorama", "spynorama", "classe", "élève", "<div>", "</div>", "image", "lien", "{", "}"]
+        index = 0
+        while text_bytes > 0:
+            size = min(text_bytes, rng.randint(4 * 1024, 64 * 1024))
+            text = " ".join(rng.choice(words) for _ in range(size // 6))[:size]
+            archive.writestr(f"pages/page{index:03d}.html", text)
+            text_bytes -= size
+            index += 1
+    return buffer.getvalue()
+
+
+def bench_commits_api(site):
+    """Current path: one commit request per file through ForgeClient"""
+    stats = {"requests": 0, "bytes": 0}
+
+    def handler(request):
+        stats["requests"] += 1
+        stats["bytes"] += len(request.content)
+        return httpx.Response(201, json={"id": "0" * 40})
+
+    original = forge_client.httpx.AsyncClient
+
+    class MockForgeClient(original):
+        def __init__(self, *args, **kwargs):
+            kwargs["transport"] = httpx.MockTransport(handler)
+            super().__init__(*args, **kwargs)
+
+    forge_client.httpx.AsyncClient = MockForgeClient
+    try:
+        client = ForgeClient("token", "")
+        start = time.perf_counter()
+        asyncio.run(_commit_zip_files(client, 1, site))
+        elapsed = time.perf_counter() - start
+    finally:
+        forge_client.httpx.AsyncClient = original
+    return elapsed, stats["requests"], stats["bytes"]
+
+
+def bench_git_push(site):
+    """Git backend: single commit built with fast-import, pushed as one packfile"""
+    work_dir = tempfile.mkdtemp(prefix="bench-publish-")
+    try:
+        remote = os.path.join(work_dir, "remote.git")
+        subprocess.run(["git", "init", "--bare", "--quiet", remote], check=True)
+        start = time.perf_counter()
+        result = push_zip(io.BytesIO(site), remote, "token")
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return elapsed, 1, result["pack_bytes"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=50)
+    parser.add_argument("--media-ratio", type=float, default=0.9)
+    args = parser.parse_args()
+
+    site = build_site(args.size_mb, args.media_ratio)
+    with zipfile.ZipFile(io.BytesIO(site)) as archive:
+        members = [info for info in archive.infolist() if not info.is_dir()]
+    raw = sum(info.file_size for info in members)
+    print(f"# site: {len(members)} files, {raw / 1e6:.1f} MB uncompressed, ZIP {len(site) / 1e6:.1f} MB")
+    print(f"{'backend':<14}{'wall s':>10}{'requests':>10}{'MB on wire':>12}")
+    for label, bench in (("commits API", bench_commits_api), ("git push", bench_git_push)):
+        elapsed, requests, sent = bench(site)
+        print(f"{label:<14}{elapsed:>10.2f}{requests:>10}{sent / 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark of response serialisation and compression.
+Measures bytes on the wire and CPU time per response for:
+- the /api/repos payload (pydantic validation + default encoder vs. fast path)
+- the rendered editor page, identity vs. gzip vs. brotli
+
+Usage: python benchmarks/bench_responses.py [--projects 100] [--iterations 200]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_obj_as
+
+from api.compression import compress, supported_encodings
+from api.responses import FastJSONResponse, orjson
+
+
+def fake_projects(count):
+    """Payload shaped like GET /projects?membership=true&simple=true"""
+    return [{
+        "id": 1000 + i,
+        "description": f"Site web de l'élève {i} - projet de fin d'année",
+        "name": f"site-eleve-{i}",
+        "name_with_namespace": f"Élève {i} / site-eleve-{i}",
+        "path": f"site-eleve-{i}",
+        "path_with_namespace": f"eleve{i}/site-eleve-{i}",
+        "created_at": "2025-01-10T09:12:44.123Z",
+        "default_branch": "main",
+        "tag_list": [],
+        "topics": [],
+        "ssh_url_to_repo": f"git@forge.apps.education.fr:eleve{i}/site-eleve-{i}.git",
+        "http_url_to_repo": f"https://forge.apps.education.fr/eleve{i}/site-eleve-{i}.git",
+        "web_url": f"https://forge.apps.education.fr/eleve{i}/site-eleve-{i}",
+        "readme_url": None,
+        "forks_count": 0,
+        "avatar_url": None,
+        "star_count": 0,
+        "last_activity_at": "2025-03-02T17:40:01.000Z",
+        "namespace": {
+            "id": 5000 + i, "name": f"Élève {i}", "path": f"eleve{i}", "kind": "user",
+            "full_path": f"eleve{i}", "parent_id": None, "avatar_url": None,
+            "web_url": f"https://forge.apps.education.fr/eleve{i}",
+        },
+    } for i in range(count)]
+
+
+def cpu_per_call(func, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        result = func()
+    return (time.process_time() - start) / iterations * 1e6, result
+
+
+def render_editor_page(file_count):
+    from ui_app import app
+    from flask import render_template
+    files = [{"path": f"dossier{i % 10}/page{i}.html", "type": "blob"} for i in range(file_count)]
+    with app.test_request_context("/edit/1"):
+        return render_template("editor.html", project_id=1, files=files).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    projects = fake_projects(args.projects)
+    upstream_body = json.dumps(projects).encode("utf-8")
+
+    print(f"# /api/repos with {args.projects} projects (orjson: {'yes' if orjson else 'no'})")
+    print(f"{'path':<44}{'bytes':>10}{'µs CPU/resp':>14}")
+
+    def default_path():
+        # Previous path: decode, validate List[dict], jsonable_encoder, json.dumps
+        data = json.loads(upstream_body)
+        validated = parse_obj_as(List[dict], data)
+        return json.dumps(jsonable_encoder(validated), ensure_ascii=False, allow_nan=False,
+                          indent=None, separators=(",", ":")).encode("utf-8")
+
+    def fast_path():
+        return FastJSONResponse(json.loads(upstream_body)).body
+
+    def passthrough_path():
+        return FastJSONResponse(upstream_body).body
+
+    for label, func in (
+        ("response_model=List[dict] + default encoder", default_path),
+        ("FastJSONResponse (decoded payload)", fast_path),
+        ("FastJSONResponse (raw pass-through)", passthrough_path),
+    ):
+        cpu, body = cpu_per_call(func, args.iterations)
+        print(f"{label:<44}{len(body):>10}{cpu:>14.1f}")
+
+    print()
+    pages = (("/api/repos JSON", upstream_body), (f"editor.html ({args.files} files)", render_editor_page(args.files)))
+    print(f"{'compression':<44}{'bytes':>10}{'µs CPU/resp':>14}")
+    for name, body in pages:
+        print(f"{name + ' identity':<44}{len(body):>10}{0.0:>14.1f}")
+        for encoding in supported_encodings():
+            cpu, compressed = cpu_per_call(lambda: compress(body, encoding), args.iterations)
+            print(f"{name + ' ' + encoding:<44}{len(compressed):>10}{cpu:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
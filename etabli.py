@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Command-line tools for L'Établi.
+
+  python etabli.py sync <local_dir> <project> [--watch]
+
+Synchronises a local folder with a forge project: files are compared by git
+blob SHA with the remote tree and only added, modified and deleted files are
+pushed, in a single commit. With --watch, the folder is rescanned every
+--interval seconds and changes are committed once it has been quiet for
+--debounce seconds.
+
+The token is read from --token or the FORGE_TOKEN environment variable
+(.env is loaded), the forge URL from FORGE_API_URL.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("etabli")
+
+# Load environment variables from .env file
+load_dotenv()
+
+from api.forge_client import ForgeClient
+from api.sync import DEFAULT_EXCLUDES, FolderSync
+
+
+def report(plan):
+    """Log the actions of one sync pass."""
+    if not plan:
+        logger.info("Already up to date")
+        return
+    for action, path in plan:
+        logger.info(f"{action:>6} {path}")
+    logger.info(f"{len(plan)} change(s) pushed")
+
+
+async def sync(args):
+    """Run one sync pass, or keep watching the folder with --watch."""
+    client = ForgeClient(args.token, "")
+    project = await client.get_project(args.project)
+    branch = args.branch or project.get("default_branch") or "main"
+    logger.info(f"Syncing {os.path.abspath(args.local_dir)} -> {project['path_with_namespace']} ({branch})")
+    folder = FolderSync(
+        client,
+        project["id"],
+        args.local_dir,
+        branch,
+        delete=not args.no_delete,
+        excludes=DEFAULT_EXCLUDES + tuple(args.exclude),
+        commit_message=args.message,
+    )
+    if args.watch:
+        logger.info("Watching for changes (Ctrl+C to stop)")
+        await folder.watch(args.interval, args.debounce, on_sync=report)
+    elif args.dry_run:
+        plan = await folder.run_once(dry_run=True)
+        for action, path in plan:
+            logger.info(f"{action:>6} {path} (dry run)")
+        logger.info(f"{len(plan)} change(s) to push")
+    else:
+        report(await folder.run_once())
+
+
+def main():
+    """Main entry point for the command-line tools."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = commands.add_parser("sync", help="Push a local folder to a forge project")
+    sync_parser.add_argument("local_dir", help="Local folder to synchronise")
+    sync_parser.add_argument("project", help="Project id or path (group/name)")
+    sync_parser.add_argument("--token", default=os.getenv("FORGE_TOKEN"), help="Forge access token (default: $FORGE_TOKEN)")
+    sync_parser.add_argument("--branch", help="Target branch (default: the project's default branch)")
+    sync_parser.add_argument("--message", help="Commit message")
+    sync_parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                             help="Glob of files or folders to skip; remote copies are left untouched (repeatable)")
+    sync_parser.add_argument("--no-delete", action="store_true", help="Keep remote files that no longer exist locally")
+    sync_parser.add_argument("--dry-run", action="store_true", help="Show the changes without pushing them")
+    sync_parser.add_argument("--watch", action="store_true", help="Keep running and push changes as they happen")
+    sync_parser.add_argument("--interval", type=float, default=1.0, help="Seconds between folder scans in watch mode (default: 1)")
+    sync_parser.add_argument("--debounce", type=float, default=2.0,
+                             help="Seconds without changes before committing in watch mode (default: 2)")
+
+    args = parser.parse_args()
+
+    if not args.token:
+        parser.error("a token is required (--token or FORGE_TOKEN)")
+    if not os.path.isdir(args.local_dir):
+        parser.error(f"not a directory: {args.local_dir}")
+
+    try:
+        asyncio.run(sync(args))
+    except KeyboardInterrupt:
+        logger.info("Stopped")
+    except Exception as e:
+        logger.error(f"Sync failed: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
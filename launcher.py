@@ -13,6 +13,7 @@ import time
 from dotenv import load_dotenv
 import threading
 import logging
+from readiness import local_url, wait_all_ready, start_healthz_server
 
 # Configure logging
 logging.basicConfig(
@@ -30,6 +31,9 @@ API_PORT = int(os.getenv("API_PORT", "8000"))
 FLASK_HOST = os.getenv("FLASK_HOST", "0.0.0.0")
 FLASK_PORT = int(os.getenv("FLASK_PORT", "5000"))
 FLASK_DEBUG = os.getenv("FLASK_DEBUG", "True").lower() in ("true", "1", "t")
+HEALTH_HOST = os.getenv("HEALTH_HOST", "0.0.0.0")
+HEALTH_PORT = int(os.getenv("HEALTH_PORT", "8090"))
+STARTUP_TIMEOUT = float(os.getenv("STARTUP_TIMEOUT", "60"))
 
 # Global variables to store process objects
 api_process = None
@@ -80,9 +84,6 @@ def start_api():
     # Start a thread to read and log output
     threading.Thread(target=log_output, args=(api_process, "API"), daemon=True).start()
     
-    # Wait a bit to ensure the API is up before starting UI
-    time.sleep(2)
-    
     return api_process.poll() is None
 
 def start_ui():
@@ -93,6 +94,8 @@ def start_ui():
     env = os.environ.copy()
     env["FLASK_APP"] = "ui_app.py"
     env["FLASK_DEBUG"] = str(FLASK_DEBUG).lower()
+    env["FLASK_HOST"] = FLASK_HOST
+    env["FLASK_PORT"] = str(FLASK_PORT)
     
     ui_cmd = [
         sys.executable, "ui_app.py"
@@ -120,7 +123,7 @@ def log_output(process, prefix):
 def main():
     """Main entry point for the launcher."""
     # Declare globals at the beginning of the function
-    global API_HOST, API_PORT, FLASK_HOST, FLASK_PORT, FLASK_DEBUG
+    global API_HOST, API_PORT, FLASK_HOST, FLASK_PORT, FLASK_DEBUG, HEALTH_PORT
     
     parser = argparse.ArgumentParser(description="Launch L'Établi API and/or UI services.")
     parser.add_argument("--api-only", action="store_true", help="Start only the API service")
@@ -130,6 +133,7 @@ def main():
     parser.add_argument("--ui-host", help=f"UI host (default: {FLASK_HOST})")
     parser.add_argument("--ui-port", type=int, help=f"UI port (default: {FLASK_PORT})")
     parser.add_argument("--no-debug", action="store_true", help="Disable Flask debug mode")
+    parser.add_argument("--health-port", type=int, help=f"Aggregated /healthz port, 0 to disable (default: {HEALTH_PORT})")
     
     args = parser.parse_args()
     
@@ -144,6 +148,8 @@ def main():
         FLASK_PORT = args.ui_port
     if args.no_debug:
         FLASK_DEBUG = False
+    if args.health_port is not None:
+        HEALTH_PORT = args.health_port
     
     # Register signal handlers for graceful shutdown
     signal.signal(signal.SIGINT, signal_handler)
@@ -154,19 +160,37 @@ def main():
         start_api_service = not args.ui_only
         start_ui_service = not args.api_only
         
-        # Start services
-        if start_api_service and not start_api():
-            logger.error("Failed to start API service")
-            stop_services()
-            return 1
+        # Start services in parallel, then gate on their health endpoints
+        targets = {}
+        if start_api_service:
+            if not start_api():
+                logger.error("Failed to start API service")
+                stop_services()
+                return 1
+            targets["api"] = (local_url(API_HOST, API_PORT), api_process)
+        
+        # The UI reads webhook-driven project state from the API
+        os.environ.setdefault("API_INTERNAL_URL", local_url(API_HOST, API_PORT, ""))
+        
+        if start_ui_service:
+            if not start_ui():
+                logger.error("Failed to start UI service")
+                stop_services()
+                return 1
+            targets["ui"] = (local_url(FLASK_HOST, FLASK_PORT), ui_process)
+        
+        readiness = wait_all_ready(targets, timeout=STARTUP_TIMEOUT)
+        for name, ready in readiness.items():
+            if not ready:
+                logger.error(f"{name.upper()} service did not become ready")
+                stop_services()
+                return 1
         
-        if start_ui_service and not start_ui():
-            logger.error("Failed to start UI service")
-            stop_services()
-            return 1
+        if HEALTH_PORT:
+            start_healthz_server(HEALTH_HOST, HEALTH_PORT, {name: url for name, (url, _) in targets.items()})
         
         # Keep the main thread alive
-        logger.info("All services started successfully. Press Ctrl+C to stop.")
+        logger.info("All services are ready. Press Ctrl+C to stop.")
         while True:
             # Check if processes are still running
             if start_api_service and api_process and api_process.poll() is not None:
@@ -13,6 +13,7 @@ import argparse
 from dotenv import load_dotenv
 import threading
 import logging
+from readiness import local_url, wait_all_ready, start_healthz_server
 
 # Configure logging
 logging.basicConfig(
@@ -30,6 +31,9 @@ API_PORT = 8099  # Production API port
 FLASK_HOST = os.getenv("FLASK_HOST", "0.0.0.0")
 FLASK_PORT = 5099  # Production UI port
 FLASK_DEBUG = False  # Disable debug mode in production
+HEALTH_HOST = os.getenv("HEALTH_HOST", "0.0.0.0")
+HEALTH_PORT = int(os.getenv("HEALTH_PORT", "8098"))  # Aggregated /healthz port
+STARTUP_TIMEOUT = float(os.getenv("STARTUP_TIMEOUT", "60"))
 
 # Global variables to store process objects
 api_process = None
@@ -79,9 +83,6 @@ def start_api(host=API_HOST, port=API_PORT):
     # Start a thread to read and log output
     threading.Thread(target=log_output, args=(api_process, "API"), daemon=True).start()
     
-    # Wait a bit to ensure the API is up before starting UI
-    time.sleep(2)
-    
     return api_process.poll() is None
 
 def start_ui(host=FLASK_HOST, port=FLASK_PORT, debug=FLASK_DEBUG):
@@ -90,28 +91,17 @@ def start_ui(host=FLASK_HOST, port=FLASK_PORT, debug=FLASK_DEBUG):
     
     logger.info(f"Starting UI service on {host}:{port}...")
     
-    # Create a temporary script to run Flask with the correct port
-    temp_script_path = "run_flask_prod.py"
-    with open(temp_script_path, "w") as f:
-        f.write(f"""
-import os
-os.environ['FLASK_APP'] = 'ui_app.py'
-os.environ['FLASK_DEBUG'] = '{"true" if debug else "false"}'
-os.environ['FLASK_HOST'] = '{host}'
-os.environ['FLASK_PORT'] = '{port}'
-
-from ui_app import app
-
-if __name__ == '__main__':
-    app.run(host='{host}', port={port}, debug={debug})
-""")
+    # run_flask_prod.py reads its configuration from the environment
+    env = os.environ.copy()
+    env["FLASK_APP"] = "ui_app.py"
+    env["FLASK_DEBUG"] = "true" if debug else "false"
+    env["FLASK_HOST"] = host
+    env["FLASK_PORT"] = str(port)
     
     ui_cmd = [
-        sys.executable, temp_script_path
+        sys.executable, "run_flask_prod.py"
     ]
     
-    env = os.environ.copy()
-    
     ui_process = subprocess.Popen(
         ui_cmd,
         stdout=subprocess.PIPE,
@@ -141,6 +131,7 @@ def parse_arguments():
     parser.add_argument("--ui-host", help=f"UI host (default: {FLASK_HOST})")
     parser.add_argument("--ui-port", type=int, help=f"UI port (default: {FLASK_PORT})")
     parser.add_argument("--no-debug", action="store_true", help="Disable Flask debug mode")
+    parser.add_argument("--health-port", type=int, help=f"Aggregated /healthz port, 0 to disable (default: {HEALTH_PORT})")
     
     return parser.parse_args()
 
@@ -154,6 +145,7 @@ def main():
     ui_host = args.ui_host if args.ui_host else FLASK_HOST
     ui_port = args.ui_port if args.ui_port else FLASK_PORT
     flask_debug = not args.no_debug and FLASK_DEBUG
+    health_port = args.health_port if args.health_port is not None else HEALTH_PORT
     
     logger.info("Starting L'Établi in PRODUCTION mode")
     logger.info(f"API will run on {api_host}:{api_port}")
@@ -164,21 +156,37 @@ def main():
     signal.signal(signal.SIGTERM, signal_handler)
     
     try:
-        # Start services based on command line arguments
+        # Start services in parallel, then gate on their health endpoints
+        targets = {}
         if not args.ui_only:
             if not start_api(host=api_host, port=api_port):
                 logger.error("Failed to start API service")
                 stop_services()
                 return 1
+            targets["api"] = (local_url(api_host, api_port), api_process)
+        
+        # The UI reads webhook-driven project state from the API
+        os.environ.setdefault("API_INTERNAL_URL", local_url(api_host, api_port, ""))
         
         if not args.api_only:
             if not start_ui(host=ui_host, port=ui_port, debug=flask_debug):
                 logger.error("Failed to start UI service")
                 stop_services()
                 return 1
+            targets["ui"] = (local_url(ui_host, ui_port), ui_process)
+        
+        readiness = wait_all_ready(targets, timeout=STARTUP_TIMEOUT)
+        for name, ready in readiness.items():
+            if not ready:
+                logger.error(f"{name.upper()} service did not become ready")
+                stop_services()
+                return 1
+        
+        if health_port:
+            start_healthz_server(HEALTH_HOST, health_port, {name: url for name, (url, _) in targets.items()})
         
         # Keep the main thread alive
-        logger.info("All services started successfully in PRODUCTION mode. Press Ctrl+C to stop.")
+        logger.info("All services are ready in PRODUCTION mode. Press Ctrl+C to stop.")
         while True:
             # Check if processes are still running
             if api_process and api_process.poll() is not None:
@@ -197,12 +205,6 @@ def main():
         logger.info("Received keyboard interrupt")
     finally:
         stop_services()
-        # Clean up temporary script
-        if os.path.exists("run_flask_prod.py"):
-            try:
-                os.remove("run_flask_prod.py")
-            except:
-                pass
     
     return 0
 
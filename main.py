@@ -1,8 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from api import repos
+from api import export, profiling, repos, scheduler, singleflight, webhooks
 from fastapi.staticfiles import StaticFiles
+from api.compression import CompressionMiddleware
+from api.profiling import ProfilingMiddleware
 
 app = FastAPI(
     title="L'Établi API",
@@ -18,11 +20,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compression négociée (brotli/gzip) des réponses au-delà d'un seuil de taille
+app.add_middleware(CompressionMiddleware)
+
+# Profilage à la demande (en-tête X-Profile-Token), seulement si PROFILE_ADMIN_TOKEN est défini
+if profiling.enabled:
+    app.add_middleware(ProfilingMiddleware)
+
 # Les fichiers statiques de Spynorama ne sont plus montés ici
 # car les projets sont maintenant séparés
 
 # Routes API
 app.include_router(repos.router, prefix="/api")
+app.include_router(webhooks.router, prefix="/api")
+app.include_router(export.router, prefix="/api")
+app.include_router(scheduler.router, prefix="/api")
+app.include_router(singleflight.router, prefix="/api")
+app.include_router(profiling.router, prefix="/api")
+
+@app.get("/health")
+async def health():
+    """Sonde de disponibilité utilisée par les lanceurs et l'orchestrateur"""
+    return {"status": "ok"}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
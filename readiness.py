@@ -0,0 +1,114 @@
+"""
+Readiness helpers shared by the launchers.
+Polls the HTTP health endpoints of the API and UI services with exponential
+backoff and exposes an aggregated /healthz endpoint for orchestrators.
+"""
+
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("readiness")
+
+# Backoff configuration for readiness polling (seconds)
+INITIAL_DELAY = 0.05
+MAX_DELAY = 1.0
+PROBE_TIMEOUT = 1.0
+
+
+def local_url(host, port, path="/health"):
+    """Build the URL used to probe a service bound on host:port."""
+    # A service listening on all interfaces is reachable through the loopback
+    if host in ("0.0.0.0", "", "::"):
+        host = "127.0.0.1"
+    return f"http://{host}:{port}{path}"
+
+
+def probe(url, timeout=PROBE_TIMEOUT):
+    """Return True if the health endpoint answers with a 2xx status."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return 200 <= response.status < 300
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return False
+
+
+def wait_until_ready(url, process=None, timeout=60.0):
+    """
+    Poll a health endpoint with exponential backoff until it answers.
+    Gives up early if the watched process exits before becoming ready.
+    """
+    deadline = time.monotonic() + timeout
+    delay = INITIAL_DELAY
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            logger.error(f"Process exited before {url} became ready")
+            return False
+        if probe(url):
+            return True
+        time.sleep(delay)
+        delay = min(delay * 2, MAX_DELAY)
+    logger.error(f"Timed out after {timeout:.0f}s waiting for {url}")
+    return False
+
+
+def wait_all_ready(targets, timeout=60.0):
+    """
+    Wait for several services in parallel.
+    `targets` maps a service name to a (url, process) tuple.
+    Returns a dict mapping each service name to its readiness.
+    """
+    results = {}
+
+    def _wait(name, url, process):
+        results[name] = wait_until_ready(url, process, timeout)
+
+    threads = [
+        threading.Thread(target=_wait, args=(name, url, process), daemon=True)
+        for name, (url, process) in targets.items()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def start_healthz_server(host, port, targets):
+    """
+    Start a background HTTP server exposing an aggregated /healthz endpoint.
+    `targets` maps a service name to the URL of its health endpoint.
+    Answers 200 when every service is healthy, 503 otherwise.
+    """
+
+    class HealthzHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/healthz":
+                self.send_error(404)
+                return
+            services = {name: probe(url) for name, url in targets.items()}
+            healthy = all(services.values())
+            body = json.dumps({
+                "status": "ok" if healthy else "unavailable",
+                "services": {name: "ok" if up else "down" for name, up in services.items()}
+            }).encode("utf-8")
+            self.send_response(200 if healthy else 503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Probes are frequent: keep them out of the launcher logs
+            pass
+
+    server = ThreadingHTTPServer((host, port), HealthzHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Aggregated health endpoint listening on {host}:{port}/healthz")
+    return server
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def git(*args, cwd=None):
+    """Run a git command with a fixed identity and return its stdout."""
+    env = dict(
+        os.environ,
+        GIT_AUTHOR_NAME="Test",
+        GIT_AUTHOR_EMAIL="test@example.org",
+        GIT_COMMITTER_NAME="Test",
+        GIT_COMMITTER_EMAIL="test@example.org",
+    )
+    return subprocess.run(["git", *args], cwd=cwd, env=env, check=True, stdout=subprocess.PIPE).stdout.decode()
+
+
+def commit_files(work, files, message, branch="master"):
+    """Write `files` (path -> bytes, None deletes) in the work tree, commit and push them."""
+    for path, content in files.items():
+        full = os.path.join(work, path)
+        if content is None:
+            os.remove(full)
+            continue
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "wb") as f:
+            f.write(content)
+    git("add", "-A", cwd=work)
+    git("commit", "-q", "-m", message, cwd=work)
+    git("push", "-q", "origin", f"HEAD:refs/heads/{branch}", cwd=work)
+    return git("rev-parse", "HEAD", cwd=work).strip()
+
+
+@pytest.fixture
+def bare_remote(tmp_path):
+    """An empty bare repository standing in for the forge, with a work clone to push from."""
+    remote = tmp_path / "remote.git"
+    git("init", "-q", "--bare", "-b", "master", str(remote))
+    work = tmp_path / "work"
+    git("clone", "-q", str(remote), str(work))
+    git("checkout", "-q", "-b", "master", cwd=work)
+    return str(remote), str(work)
@@ -0,0 +1,97 @@
+import io
+import subprocess
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from api import repos
+from api.git_publish import push_zip
+from tests.conftest import git
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+def test_push_zip_creates_single_commit_in_bare_repo(bare_remote):
+    remote, _ = bare_remote
+    archive = make_zip({
+        "index.html": b"<h1>Spynorama</h1>\n",
+        "img/pano.jpg": bytes(range(256)) * 64,
+        "docs/my notes.txt": b"with a space\n",
+        "../escape.txt": b"ignored",
+        "site/.git/config": b"ignored",
+    })
+
+    result = push_zip(archive, remote, "token", "main", "Publication de test")
+
+    assert result["files"] == 3
+    assert result["pack_bytes"] > 0
+    assert git("--git-dir", remote, "rev-parse", "refs/heads/main").strip() == result["commit"]
+    assert git("--git-dir", remote, "log", "--format=%s", "main").splitlines() == ["Publication de test"]
+    tree = git("--git-dir", remote, "ls-tree", "-r", "--name-only", "main").splitlines()
+    assert sorted(tree) == ["docs/my notes.txt", "img/pano.jpg", "index.html"]
+    blob = subprocess.run(["git", "--git-dir", remote, "cat-file", "blob", "main:img/pano.jpg"],
+                          check=True, stdout=subprocess.PIPE).stdout
+    assert blob == bytes(range(256)) * 64
+
+
+class FakeForgeClient:
+    """Records the calls the publish endpoint makes to the forge."""
+
+    instances = []
+
+    def __init__(self, token, username):
+        self.user_key = "test"
+        self.commits = []
+        FakeForgeClient.instances.append(self)
+
+    async def create_repo(self, name, description, visibility):
+        return {
+            "id": 7,
+            "name": name,
+            "path": name,
+            "namespace": {"path": "eleve"},
+            # Unreachable remote: the git push fails and the commits API takes over
+            "http_url_to_repo": "/nonexistent/remote.git",
+        }
+
+    async def commit_file_with_encoding(self, project_id, file_path, content, commit_message, encoding):
+        self.commits.append((file_path, encoding))
+
+    async def enable_pages(self, project_id, include=None, exclude=None):
+        pass
+
+    async def trigger_pipeline(self, project_id):
+        return {"id": 1, "status": "pending"}
+
+    async def get_pages_info(self, project_id):
+        return {"url": "https://eleve.example.org/site/"}
+
+
+def test_publish_falls_back_to_commits_api_when_push_fails(monkeypatch):
+    import main
+
+    async def no_wait(*args, **kwargs):
+        return "success"
+
+    FakeForgeClient.instances.clear()
+    monkeypatch.setattr(repos, "ForgeClient", FakeForgeClient)
+    monkeypatch.setattr(repos, "wait_for_pipeline", no_wait)
+
+    archive = make_zip({"index.html": b"<h1>Spynorama</h1>\n", "img/logo.png": b"\x89PNG\r\n\x1a\n\xff"})
+    response = TestClient(main.app).post(
+        "/api/publish-spynorama",
+        data={"name": "site", "token": "token", "backend": "git", "optimize": "false"},
+        files={"file": ("site.zip", archive.getvalue(), "application/zip")},
+    )
+
+    assert response.status_code == 201, response.text
+    assert response.json()["pages_url"] == "https://eleve.example.org/site/"
+    commits = FakeForgeClient.instances[0].commits
+    assert sorted(commits) == [("img/logo.png", "base64"), ("index.html", "text")]
@@ -0,0 +1,124 @@
+import subprocess
+
+import httpx
+import pytest
+
+from tests.conftest import commit_files
+from ui.mirror import MirrorManager, _CatFile
+
+PROJECT_ID = 42
+
+
+@pytest.fixture
+def remote(bare_remote):
+    url, work = bare_remote
+    commit_files(work, {
+        "index.html": b"<h1>Hello</h1>\n",
+        "css/style.css": b"body { color: red; }\n",
+        "docs/my notes.txt": b"with a space\n",
+    }, "Initial commit")
+    return url, work
+
+
+@pytest.fixture
+def manager(tmp_path, remote):
+    url, _ = remote
+    manager = MirrorManager(
+        "http://forge.invalid/api/v4",
+        root=str(tmp_path / "mirrors"),
+        verify_interval=3600,
+        remote_url_for=lambda project_id, token: url,
+    )
+    yield manager
+    for mirror in list(manager._mirrors.values()):
+        mirror.close()
+
+
+def test_list_files_matches_remote_tree(manager):
+    files = manager.list_files(PROJECT_ID, "token")
+    assert sorted(item["path"] for item in files) == ["css/style.css", "docs/my notes.txt", "index.html"]
+    assert all(item["type"] == "blob" and len(item["id"]) == 40 for item in files)
+
+
+def test_read_file_returns_blob_and_content(manager):
+    blob_id, data = manager.read_file(PROJECT_ID, "token", "css/style.css")
+    assert data == b"body { color: red; }\n"
+    assert manager.read_blob(PROJECT_ID, "token", blob_id) == data
+    assert manager.read_file(PROJECT_ID, "token", "docs/my notes.txt")[1] == b"with a space\n"
+
+
+def test_read_range_returns_part_of_file(manager):
+    blob_id, size, data = manager.read_range(PROJECT_ID, "token", "css/style.css", 5, 7)
+    assert (size, data) == (21, b"{ color")
+    assert blob_id == manager.read_file(PROJECT_ID, "token", "css/style.css")[0]
+    # Range past the end, then a full read: the cat-file stream stays aligned
+    assert manager.read_range(PROJECT_ID, "token", "css/style.css", 100, 10)[1:] == (21, b"")
+    assert manager.read_file(PROJECT_ID, "token", "index.html")[1] == b"<h1>Hello</h1>\n"
+
+
+def test_read_missing_file_returns_none(manager):
+    assert manager.read_file(PROJECT_ID, "token", "absent.txt") is None
+    # cat-file answers "<spec> missing": the spec itself contains spaces here
+    assert manager.read_file(PROJECT_ID, "token", "docs/other notes.txt") is None
+    # The persistent cat-file process is still usable afterwards
+    assert manager.read_file(PROJECT_ID, "token", "index.html")[1] == b"<h1>Hello</h1>\n"
+
+
+def test_invalidate_fetches_new_commits(manager, remote):
+    _, work = remote
+    assert manager.read_file(PROJECT_ID, "token", "index.html")[1] == b"<h1>Hello</h1>\n"
+    commit_files(work, {"index.html": b"<h1>Updated</h1>\n", "css/style.css": None}, "Update")
+
+    # Access was verified recently: without invalidation the mirror is not refreshed
+    assert manager.read_file(PROJECT_ID, "token", "index.html")[1] == b"<h1>Hello</h1>\n"
+
+    manager.invalidate(PROJECT_ID)
+    assert manager.read_file(PROJECT_ID, "token", "index.html")[1] == b"<h1>Updated</h1>\n"
+    assert "css/style.css" not in [item["path"] for item in manager.list_files(PROJECT_ID, "token")]
+
+
+def test_get_file_falls_back_to_forge_when_mirror_fails(tmp_path, monkeypatch):
+    import ui_app
+
+    broken = MirrorManager(
+        "http://forge.invalid/api/v4",
+        root=str(tmp_path / "mirrors"),
+        remote_url_for=lambda project_id, token: str(tmp_path / "does-not-exist.git"),
+    )
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"X-Gitlab-Size": "14", "X-Gitlab-Blob-Id": "abc"})
+        return httpx.Response(200, json={"file_path": "index.html", "content": "PGgxPkZvcmdlPC9oMT4=", "encoding": "base64"})
+
+    monkeypatch.setattr(ui_app, "mirrors", broken)
+    monkeypatch.setattr(ui_app, "forge", lambda: httpx.Client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(ui_app.file_windows, "_client", httpx.Client(transport=httpx.MockTransport(handler)))
+
+    client = ui_app.app.test_client()
+    with client.session_transaction() as session:
+        session["forge_token"] = "token"
+    response = client.get(f"/get-file/{PROJECT_ID}?path=index.html")
+
+    assert response.status_code == 200
+    assert response.get_json()["content"] == "PGgxPkZvcmdlPC9oMT4="
+    assert [request.method for request in requests] == ["HEAD", "GET"]
+    assert all(request.url.path.endswith(f"/projects/{PROJECT_ID}/repository/files/index.html") for request in requests)
+
+
+def test_cat_file_restarts_after_truncated_output(remote):
+    url, _ = remote
+    cat_file = _CatFile(url)
+    # Process announcing 100 bytes, then closing its output after 3 of them
+    cat_file.process = subprocess.Popen(
+        ["sh", "-c", "read spec; printf '%040d blob 100\\nabc' 0; exec >&-; sleep 30"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+    )
+    with pytest.raises(EOFError):
+        cat_file.read_range("HEAD:index.html", 50, 10)
+    # The desynchronised process is dropped and a fresh one serves the next read
+    assert cat_file.process is None
+    assert cat_file.read("HEAD:index.html")[2] == b"<h1>Hello</h1>\n"
+    cat_file.close()
@@ -0,0 +1,25 @@
+import ui_app
+
+PROJECT_ID = 42
+
+
+def test_preview_errors_are_plain_text_with_sandbox_headers(monkeypatch):
+    monkeypatch.setattr(ui_app.previews, "resolve", lambda project_id, token, path: None)
+    key = ui_app.previews.grant(PROJECT_ID, "token")
+
+    client = ui_app.app.test_client()
+    response = client.get(f"/preview/{PROJECT_ID}/~{key}/%3Cscript%3Ealert(document.cookie)%3C/script%3E")
+
+    assert response.status_code == 404
+    assert response.mimetype == "text/plain"
+    assert response.headers["Content-Security-Policy"] == ui_app.PREVIEW_CSP
+    assert response.headers["X-Content-Type-Options"] == "nosniff"
+    assert response.headers["Referrer-Policy"] == "no-referrer"
+
+
+def test_expired_preview_key_is_plain_text():
+    response = ui_app.app.test_client().get(f"/preview/{PROJECT_ID}/~unknown/index.html")
+
+    assert response.status_code == 403
+    assert response.mimetype == "text/plain"
+    assert response.headers["Content-Security-Policy"] == ui_app.PREVIEW_CSP
@@ -0,0 +1,24 @@
+from ui.search_index import POSTING_KEY_BYTES, ProjectSearchIndex
+
+
+def test_budget_counts_inverted_index():
+    index = ProjectSearchIndex(1, max_bytes=10 ** 9)
+    text = "\n".join(f"const value{i} = compute({i});" for i in range(2000))
+    index._add("app.js", "sha", text)
+
+    keys = len(index.token_postings) + len(index.trigram_postings)
+    assert index.size > 2 * len(text) + keys * POSTING_KEY_BYTES
+
+    index._remove("app.js")
+    assert index.size == 0
+    assert not index.token_postings and not index.trigram_postings
+
+
+def test_file_over_budget_is_skipped_and_still_searchable_files_remain():
+    index = ProjectSearchIndex(1, max_bytes=200 * 1024)
+    index._add("small.txt", "a", "hello world\n")
+    index._add("big.txt", "b", "\n".join(f"line {i} with unique{i}" for i in range(20000)))
+
+    assert "big.txt" in index.skipped and "big.txt" not in index.files
+    assert index.size <= index.max_bytes
+    assert [result["path"] for result in index.search("hello")] == ["small.txt"]
@@ -0,0 +1 @@
+# Modules utilitaires de l'interface Flask
@@ -0,0 +1,209 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+
+from PIL import Image
+
+from api.compression import negotiate_encoding
+
+try:
+    import brotli
+except ImportError:  # La compression brotli est optionnelle
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Répertoires d'assets servis par l'UI
+ASSET_DIRS = ("medias", "tuto")
+# Répertoire où sont écrites les variantes (WebP, redimensionnées, précompressées)
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", ".asset_cache")
+# Largeurs générées pour les images d'accueil (affichées à 300px maximum)
+INTRO_WIDTHS = (320, 640, 960)
+# Types de contenu qui gagnent à être précompressés
+COMPRESSIBLE_TYPES = {
+    "text/css", "text/html", "text/plain", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+}
+HASH_LENGTH = 12
+
+
+class Asset:
+    """Un fichier statique et ses variantes précalculées"""
+
+    def __init__(self, logical_path, path, digest, mimetype):
+        self.logical_path = logical_path  # ex. "medias/intro1.jpg"
+        self.path = path
+        self.digest = digest
+        self.mimetype = mimetype
+        # Variantes d'image : {(format, largeur): chemin}
+        self.variants = {}
+        # Versions précompressées : {"br"|"gzip": chemin}
+        self.encodings = {}
+
+    @property
+    def fingerprinted_name(self):
+        """Nom de fichier contenant l'empreinte du contenu"""
+        base, ext = os.path.splitext(os.path.basename(self.logical_path))
+        return f"{base}.{self.digest}{ext}"
+
+    def variant_name(self, fmt, width):
+        base, _ = os.path.splitext(os.path.basename(self.logical_path))
+        return f"{base}.{self.digest}.w{width}.{fmt}"
+
+
+class AssetManifest:
+    """
+    Manifeste des assets construit une seule fois au démarrage.
+    Associe chaque fichier à une empreinte de contenu pour produire des URLs
+    versionnées pouvant être mises en cache indéfiniment par le navigateur.
+    """
+
+    def __init__(self, root, directories=ASSET_DIRS, cache_dir=ASSET_CACHE_DIR):
+        self.root = root
+        self.directories = directories
+        self.cache_dir = cache_dir if os.path.isabs(cache_dir) else os.path.join(root, cache_dir)
+        self.assets = {}
+        # Index nom versionné -> (asset, chemin sur disque)
+        self._by_name = {}
+        self._lock = threading.Lock()
+
+    def build(self):
+        """Parcourt les répertoires d'assets et calcule les empreintes"""
+        for directory in self.directories:
+            base_dir = os.path.join(self.root, directory)
+            if not os.path.isdir(base_dir):
+                continue
+            for dirpath, _, filenames in os.walk(base_dir):
+                for filename in sorted(filenames):
+                    path = os.path.join(dirpath, filename)
+                    logical_path = os.path.relpath(path, self.root).replace("\\", "/")
+                    with open(path, "rb") as f:
+                        digest = hashlib.sha256(f.read()).hexdigest()[:HASH_LENGTH]
+                    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                    asset = Asset(logical_path, path, digest, mimetype)
+                    self.assets[logical_path] = asset
+                    self._register(directory, asset.fingerprinted_name, asset, path)
+        logger.info(f"Manifeste des assets construit: {len(self.assets)} fichiers")
+        return self
+
+    def build_variants_async(self):
+        """Génère les variantes en arrière-plan pour ne pas retarder le démarrage"""
+        thread = threading.Thread(target=self.build_variants, daemon=True)
+        thread.start()
+        return thread
+
+    def build_variants(self):
+        """Génère les variantes WebP/redimensionnées et les versions précompressées"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for asset in list(self.assets.values()):
+            directory = asset.logical_path.split("/", 1)[0]
+            try:
+                if directory == "medias" and asset.mimetype == "image/jpeg":
+                    self._build_image_variants(directory, asset)
+                if asset.mimetype in COMPRESSIBLE_TYPES:
+                    self._build_precompressed(asset)
+            except Exception as e:
+                logger.warning(f"Impossible de générer les variantes de {asset.logical_path}: {e}")
+
+    def _build_image_variants(self, directory, asset):
+        image = None
+        for width in INTRO_WIDTHS:
+            for fmt in ("webp", "jpg"):
+                name = asset.variant_name(fmt, width)
+                target = os.path.join(self.cache_dir, name)
+                # Le nom contient l'empreinte : une variante existante est toujours valide
+                if not os.path.exists(target):
+                    if image is None:
+                        image = Image.open(asset.path)
+                        image.load()
+                    resized = image.copy()
+                    resized.thumbnail((width, width * 4))
+                    tmp = f"{target}.tmp"
+                    if fmt == "webp":
+                        resized.save(tmp, "WEBP", quality=80, method=4)
+                    else:
+                        resized.convert("RGB").save(tmp, "JPEG", quality=82, optimize=True, progressive=True)
+                    os.replace(tmp, target)
+                with self._lock:
+                    asset.variants[(fmt, width)] = target
+                    self._register(directory, name, asset, target)
+
+    def _build_precompressed(self, asset):
+        with open(asset.path, "rb") as f:
+            data = f.read()
+        candidates = [("gzip", ".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            candidates.append(("br", ".br", lambda d: brotli.compress(d, quality=11)))
+        for encoding, suffix, compress in candidates:
+            target = os.path.join(self.cache_dir, asset.fingerprinted_name + suffix)
+            if not os.path.exists(target):
+                compressed = compress(data)
+                # Inutile de servir une version compressée qui n'est pas plus petite
+                if len(compressed) >= len(data):
+                    continue
+                with open(f"{target}.tmp", "wb") as f:
+                    f.write(compressed)
+                os.replace(f"{target}.tmp", target)
+            with self._lock:
+                asset.encodings[encoding] = target
+
+    def _register(self, directory, name, asset, path):
+        self._by_name[(directory, name)] = (asset, path)
+
+    def lookup(self, directory, filename):
+        """
+        Résout un nom demandé dans un répertoire d'assets.
+        Retourne (asset, chemin, versionné) ou (None, None, False) si inconnu.
+        """
+        with self._lock:
+            found = self._by_name.get((directory, filename))
+        if found:
+            asset, path = found
+            return asset, path, True
+        asset = self.assets.get(f"{directory}/{filename}")
+        if asset:
+            return asset, asset.path, False
+        return None, None, False
+
+    def url(self, logical_path):
+        """URL versionnée d'un asset (ou URL brute s'il est inconnu)"""
+        asset = self.assets.get(logical_path)
+        if asset is None:
+            return f"/{logical_path}"
+        directory = asset.logical_path.rsplit("/", 1)[0]
+        return f"/{directory}/{asset.fingerprinted_name}"
+
+    def variant_url(self, logical_path, fmt, width):
+        """URL d'une variante si elle a déjà été générée"""
+        asset = self.assets.get(logical_path)
+        if asset is None or (fmt, width) not in asset.variants:
+            return None
+        directory = asset.logical_path.rsplit("/", 1)[0]
+        return f"/{directory}/{asset.variant_name(fmt, width)}"
+
+    def srcset(self, logical_path, fmt):
+        """Attribut srcset des variantes disponibles pour un format donné"""
+        entries = []
+        for width in INTRO_WIDTHS:
+            url = self.variant_url(logical_path, fmt, width)
+            if url:
+                entries.append(f"{url} {width}w")
+        return ", ".join(entries)
+
+    def images_in(self, directory, mimetype="image/jpeg"):
+        """Liste des assets d'un répertoire, calculée sans accès disque"""
+        return [
+            logical_path for logical_path, asset in self.assets.items()
+            if logical_path.startswith(f"{directory}/") and asset.mimetype == mimetype
+        ]
+
+    def preferred_encoding(self, asset, accept_encoding):
+        """Choisit une version précompressée acceptée par le client"""
+        available = [encoding for encoding in ("br", "gzip") if encoding in asset.encodings]
+        encoding = negotiate_encoding(accept_encoding, available)
+        if encoding is None:
+            return None, None
+        return encoding, asset.encodings[encoding]
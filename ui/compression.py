@@ -0,0 +1,43 @@
+from flask import request
+
+from api.compression import COMPRESSION_MIN_SIZE, compress, is_compressible, negotiate_encoding
+
+
+def init_compression(app, minimum_size=COMPRESSION_MIN_SIZE):
+    """
+    Compresse les réponses Flask (HTML, JSON...) selon l'en-tête Accept-Encoding.
+    Les fichiers envoyés par send_file et les réponses en flux ne sont pas
+    concernés : ils sont déjà précompressés ou transmis par morceaux.
+    """
+
+    @app.after_request
+    def compress_response(response):
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or "no-transform" in response.headers.get("Cache-Control", "")
+            or not is_compressible(response.content_type)
+        ):
+            return response
+
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < minimum_size:
+            return response
+
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        # Le corps encodé diffère : un ETag fort ne peut plus être réutilisé tel quel
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    return app
@@ -0,0 +1,79 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import httpx
+
+from api.webhooks import WEBHOOK_SECRET, hook_settings, webhooks_enabled
+
+# Adresse interne de l'API (qui reçoit les webhooks de la forge)
+API_INTERNAL_URL = os.getenv("API_INTERNAL_URL", "http://127.0.0.1:8000")
+# L'état des webhooks n'est qu'une optimisation : ne jamais bloquer une page pour lui
+STATUS_TIMEOUT = float(os.getenv("EVENT_STATUS_TIMEOUT", "0.5"))
+# Nombre maximal d'URL de pages mémorisées (les moins récemment utilisées sont oubliées)
+PAGES_CACHE_MAX = int(os.getenv("PAGES_CACHE_MAX", "10000"))
+
+logger = logging.getLogger(__name__)
+
+# URL des pages par projet, valable tant que le dernier pipeline connu n'a pas changé
+_pages_cache = OrderedDict()
+_pages_lock = threading.Lock()
+
+
+def known_project_states(project_ids):
+    """
+    Récupère auprès de l'API l'état des projets connu grâce aux webhooks.
+    Retourne un dictionnaire {project_id: état}, vide si l'API est injoignable.
+    """
+    if not WEBHOOK_SECRET or not project_ids:
+        return {}
+    try:
+        response = httpx.get(
+            f"{API_INTERNAL_URL}/api/webhooks/status",
+            params={"ids": ",".join(str(project_id) for project_id in project_ids)},
+            headers={"X-Gitlab-Token": WEBHOOK_SECRET},
+            timeout=STATUS_TIMEOUT
+        )
+        response.raise_for_status()
+        return {int(project_id): state for project_id, state in response.json().items()}
+    except Exception as e:
+        logger.debug(f"État des webhooks indisponible: {e}")
+        return {}
+
+
+def cached_pages_url(project_id, pipeline_id):
+    """URL des pages mémorisée pour ce pipeline, ou None s'il faut la redemander"""
+    with _pages_lock:
+        cached = _pages_cache.get(project_id)
+        if cached:
+            _pages_cache.move_to_end(project_id)
+    if cached and pipeline_id is not None and cached[0] == pipeline_id:
+        return cached[1]
+    return None
+
+
+def remember_pages_url(project_id, pipeline_id, url):
+    if pipeline_id is None:
+        return
+    with _pages_lock:
+        _pages_cache[project_id] = (pipeline_id, url)
+        _pages_cache.move_to_end(project_id)
+        while len(_pages_cache) > PAGES_CACHE_MAX:
+            _pages_cache.popitem(last=False)
+
+
+def register_webhook(project_id, token):
+    """Enregistre le webhook de L'Établi sur un dépôt nouvellement créé ou forké"""
+    if not webhooks_enabled():
+        return
+    forge_api_url = os.getenv("FORGE_API_URL", "https://forge.apps.education.fr/api/v4")
+    try:
+        response = httpx.post(
+            f"{forge_api_url}/projects/{project_id}/hooks",
+            headers={"Authorization": f"Bearer {token}"},
+            json=hook_settings()
+        )
+        response.raise_for_status()
+    except Exception as e:
+        logger.warning(f"Impossible d'enregistrer le webhook du projet {project_id}: {e}")
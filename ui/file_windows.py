@@ -0,0 +1,204 @@
+import base64
+import logging
+import os
+from urllib.parse import quote
+
+import httpx
+
+# Au-delà de cette taille, un fichier est affiché en lecture seule, par fenêtres
+EDITOR_MAX_FILE_BYTES = int(os.getenv("EDITOR_MAX_FILE_BYTES", str(1024 * 1024)))
+# Taille par défaut et maximale (octets) d'une fenêtre de lecture
+FILE_WINDOW_BYTES = 64 * 1024
+FILE_WINDOW_MAX_BYTES = 1024 * 1024
+# Octets lus au-delà de la fenêtre pour terminer la dernière ligne
+LINE_LOOKAHEAD_BYTES = 16 * 1024
+# Octets examinés pour distinguer un fichier texte d'un fichier binaire
+SNIFF_BYTES = 8 * 1024
+BRANCH = "master"
+
+logger = logging.getLogger(__name__)
+
+
+def is_binary(sample):
+    """Un fichier est binaire s'il contient un octet nul ou n'est pas de l'UTF-8"""
+    if b"\0" in sample:
+        return True
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Caractère coupé en fin d'échantillon : encore du texte
+        return e.start < len(sample) - 3
+    return False
+
+
+def _content_total(response):
+    """Taille totale du fichier annoncée par une réponse (Content-Range ou Content-Length)"""
+    content_range = response.headers.get("Content-Range", "")
+    if "/" in content_range and content_range.rsplit("/", 1)[1].isdigit():
+        return int(content_range.rsplit("/", 1)[1])
+    if response.status_code == 200 and response.headers.get("Content-Length", "").isdigit():
+        return int(response.headers["Content-Length"])
+    return None
+
+
+def cut_after_line(data, length):
+    """Garde `length` octets, prolongés jusqu'à la fin de la ligne en cours si elle est proche"""
+    if len(data) <= length:
+        return data
+    newline = data.find(b"\n", length - 1)
+    if newline == -1:
+        # Ligne trop longue (fichier minifié) : coupée à la limite de la fenêtre,
+        # sans séparer les octets d'un caractère UTF-8
+        cut = length
+        while cut > length - 3 and 0x80 <= data[cut] <= 0xBF:
+            cut -= 1
+        return data[:cut]
+    return data[:newline + 1]
+
+
+def cut_before_line(data):
+    """Retire le début de ligne incomplet ; conservé si la ligne est trop longue pour être complétée"""
+    newline = data.find(b"\n", 0, LINE_LOOKAHEAD_BYTES)
+    if newline == -1 or newline == len(data) - 1:
+        return 0, data
+    return newline + 1, data[newline + 1:]
+
+
+def describe(path, size, blob_id, sample):
+    """Taille, blob et nature d'un fichier, d'après ses premiers octets"""
+    binary = is_binary(sample[:SNIFF_BYTES])
+    return {
+        "file_path": path,
+        "size": size,
+        "blob_id": blob_id,
+        "binary": binary,
+        # Fichiers modifiables dans l'éditeur ; les autres sont lus par fenêtres
+        "editable": not binary and size <= EDITOR_MAX_FILE_BYTES,
+        "window_bytes": FILE_WINDOW_BYTES,
+    }
+
+
+class FileWindowReader:
+    """
+    Lecture partielle des fichiers d'un projet pour l'éditeur : taille et nature
+    (texte ou binaire) d'un fichier, puis fenêtres d'octets lues à la demande.
+    Les lectures passent par le miroir local s'il existe, sinon par le contenu
+    brut de la forge, lu en flux et interrompu dès la fenêtre obtenue.
+    """
+
+    def __init__(self, forge_api_url, mirrors=None):
+        self.forge_api_url = forge_api_url
+        self.mirrors = mirrors
+        # Connexions vers la forge réutilisées par toutes les sessions (token passé à chaque requête) ;
+        # pas de transport partagé avec cache : les contenus sont lus en flux
+        self._client = httpx.Client()
+
+    def _file_url(self, project_id, path):
+        return f"{self.forge_api_url}/projects/{project_id}/repository/files/{quote(path, safe='')}"
+
+    def _read_mirror(self, project_id, token, path, start, length):
+        """(blob, taille, octets) depuis le miroir local, (None, None, None) si absent, None sans miroir"""
+        if self.mirrors is None or not self.mirrors.enabled:
+            return None
+        try:
+            return self.mirrors.read_range(project_id, token, path, start, length) or (None, None, None)
+        except Exception as e:
+            logger.warning(f"Miroir indisponible pour le projet {project_id}, lecture via la forge: {e}")
+            return None
+
+    def _read_range(self, project_id, token, path, offset, length):
+        """
+        Octets [offset, offset + length) du fichier, lus en flux depuis la forge.
+        Retourne (octets, taille totale du fichier si la forge l'indique).
+        """
+        headers = {"Authorization": f"Bearer {token}", "Range": f"bytes={offset}-{offset + length - 1}"}
+        data = bytearray()
+        url = f"{self._file_url(project_id, path)}/raw"
+        with self._client.stream("GET", url, params={"ref": BRANCH}, headers=headers) as response:
+            if response.status_code == 416:
+                return b"", _content_total(response)
+            response.raise_for_status()
+            total = _content_total(response)
+            # 206 : la forge a appliqué la plage ; sinon lecture jusqu'à la fenêtre seulement
+            skip = 0 if response.status_code == 206 else offset
+            for chunk in response.iter_bytes():
+                if skip:
+                    if len(chunk) <= skip:
+                        skip -= len(chunk)
+                        continue
+                    chunk = chunk[skip:]
+                    skip = 0
+                data += chunk
+                if len(data) >= length:
+                    break
+        return bytes(data[:length]), total
+
+    def stat(self, project_id, token, path):
+        """(taille, blob) d'un fichier via les en-têtes de la forge, None s'il n'existe pas"""
+        # HEAD : métadonnées du fichier dans les en-têtes, sans son contenu
+        response = self._client.head(
+            self._file_url(project_id, path), params={"ref": BRANCH}, headers={"Authorization": f"Bearer {token}"}
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return int(response.headers.get("X-Gitlab-Size", "0")), response.headers.get("X-Gitlab-Blob-Id")
+
+    def info(self, project_id, token, path):
+        """Taille, blob et nature du fichier ; None s'il n'existe pas"""
+        found = self._read_mirror(project_id, token, path, 0, SNIFF_BYTES)
+        if found is not None:
+            blob_id, size, sample = found
+            if blob_id is None:
+                return None
+        else:
+            stat = self.stat(project_id, token, path)
+            if stat is None:
+                return None
+            size, blob_id = stat
+            sample = self._read_range(project_id, token, path, 0, min(size, SNIFF_BYTES))[0] if size else b""
+        return describe(path, size, blob_id, sample)
+
+    def window(self, project_id, token, path, length, offset=None, before=None, binary=False):
+        """
+        Fenêtre du fichier commençant à `offset` (lecture vers l'avant) ou se
+        terminant à `before` (lecture vers l'arrière). En mode texte, la fenêtre
+        est alignée sur les lignes du côté opposé ; les bornes renvoyées servent
+        de point de départ aux fenêtres voisines. En mode binaire, les octets
+        exacts sont renvoyés en base64.
+        """
+        length = max(1, min(length, FILE_WINDOW_MAX_BYTES))
+        if before is not None:
+            start = max(0, before - length)
+            length = before - start
+        else:
+            start = max(0, offset or 0)
+        extra = 0 if binary or before is not None else LINE_LOOKAHEAD_BYTES
+
+        found = self._read_mirror(project_id, token, path, start, length + extra)
+        if found is not None:
+            if found[0] is None:
+                return None
+            _, size, data = found
+        else:
+            data, size = self._read_range(project_id, token, path, start, length + extra) if length else (b"", None)
+            if size is None:
+                stat = self.stat(project_id, token, path)
+                if stat is None:
+                    return None
+                size = stat[0]
+
+        if binary:
+            data = data[:length]
+        elif before is not None:
+            if start > 0:
+                skipped, data = cut_before_line(data)
+                start += skipped
+        else:
+            data = cut_after_line(data, length)
+        window = {"offset": start, "end": start + len(data), "size": size}
+        if binary:
+            window.update(encoding="base64", content=base64.b64encode(data).decode("ascii"))
+        else:
+            window.update(encoding="text", content=data.decode("utf-8", errors="replace"))
+        return window
@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+
+import httpx
+
+from api.imports import (IMPORT_TIMEOUT, PollSchedule, batch_query, group_by_user, import_state,
+                         import_statuses)
+from ui.project_index import token_key
+
+# Durée de conservation de l'état final (pour les pages ouvertes en retard)
+IMPORT_KEEP_FINISHED = 300
+
+logger = logging.getLogger(__name__)
+
+
+class _TrackedImport(PollSchedule):
+    def __init__(self, project_id, token):
+        super().__init__()
+        self.project_id = project_id
+        self.token = token
+        self.user = token_key(token)
+        self.import_status = "scheduled"
+        self.error = None
+        self.started_at = self.next_at
+        self.finished_at = None
+        self.done = threading.Event()
+
+    @property
+    def state(self):
+        return "failed" if self.error else import_state(self.import_status)
+
+    def as_dict(self):
+        return {"project_id": self.project_id, "state": self.state, "import_status": self.import_status, "error": self.error}
+
+
+class ImportPoller:
+    """
+    Suivi partagé des imports de dépôts (forks) en cours.
+    Un seul thread interroge la forge pour tous les forks suivis : ceux d'un même
+    utilisateur sont vérifiés en une requête (liste de ses projets récents), et
+    l'intervalle entre deux vérifications d'un import croît progressivement.
+    """
+
+    def __init__(self, forge_api_url):
+        self.forge_api_url = forge_api_url
+        self._imports = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def track(self, project_id, token):
+        with self._condition:
+            if project_id not in self._imports:
+                self._imports[project_id] = _TrackedImport(project_id, token)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="import-poller", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def status(self, project_id, token):
+        """État de l'import pour cet utilisateur, ou None si le projet n'est pas suivi"""
+        with self._condition:
+            tracked = self._imports.get(project_id)
+        if tracked is None or tracked.user != token_key(token):
+            return None
+        return tracked.as_dict()
+
+    def wait(self, project_id, token, timeout):
+        """Attend la fin de l'import (ou l'expiration du délai) et retourne son état"""
+        with self._condition:
+            tracked = self._imports.get(project_id)
+        if tracked is None or tracked.user != token_key(token):
+            return None
+        tracked.done.wait(timeout)
+        return tracked.as_dict()
+
+    def _finish(self, tracked, now):
+        tracked.finished_at = now
+        tracked.done.set()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                for project_id in [project_id for project_id, tracked in self._imports.items()
+                                   if tracked.finished_at and now - tracked.finished_at > IMPORT_KEEP_FINISHED]:
+                    del self._imports[project_id]
+                pending = [tracked for tracked in self._imports.values() if tracked.finished_at is None]
+                if not pending and not self._imports:
+                    self._thread = None
+                    return
+                due = [tracked for tracked in pending if tracked.next_at <= now]
+                if not due:
+                    next_at = min((tracked.next_at for tracked in pending), default=now + IMPORT_KEEP_FINISHED)
+                    self._condition.wait(max(0.05, next_at - now))
+                    continue
+
+            for group in group_by_user(due, lambda tracked: tracked.user).values():
+                self._poll_group(group)
+
+            now = time.monotonic()
+            with self._condition:
+                for tracked in due:
+                    if tracked.state != "importing":
+                        self._finish(tracked, now)
+                    elif now - tracked.started_at > IMPORT_TIMEOUT:
+                        tracked.error = "Délai d'import dépassé"
+                        self._finish(tracked, now)
+                    else:
+                        tracked.reschedule(now)
+
+    def _poll_group(self, group):
+        headers = {"Authorization": f"Bearer {group[0].token}"}
+        statuses = {}
+        try:
+            with httpx.Client(headers=headers, timeout=10) as client:
+                if len(group) > 1:
+                    params = batch_query([tracked.project_id for tracked in group])
+                    response = client.get(f"{self.forge_api_url}/projects", params=params)
+                    response.raise_for_status()
+                    statuses = import_statuses(response.json())
+                for tracked in group:
+                    if tracked.project_id not in statuses:
+                        response = client.get(f"{self.forge_api_url}/projects/{tracked.project_id}")
+                        response.raise_for_status()
+                        statuses.update(import_statuses([response.json()]))
+        except Exception as e:
+            logger.warning(f"Vérification des imports impossible: {e}")
+        for tracked in group:
+            if tracked.project_id in statuses:
+                tracked.import_status = statuses[tracked.project_id]
+                if import_state(tracked.import_status) == "failed":
+                    tracked.error = "L'import du dépôt a échoué"
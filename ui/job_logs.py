@@ -0,0 +1,194 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+
+from ui.project_index import token_key
+
+# Intervalle minimal (secondes) entre deux lectures du journal d'un job en cours
+JOB_LOG_POLL_INTERVAL = float(os.getenv("JOB_LOG_POLL_INTERVAL", "2"))
+# Taille maximale (octets) des journaux terminés conservés en mémoire
+JOB_LOG_CACHE_BYTES = int(os.getenv("JOB_LOG_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Les journaux en cours que plus personne ne suit sont oubliés après ce délai
+JOB_LOG_IDLE_TIMEOUT = 600
+# Taille maximale (octets) du texte envoyé en une fois au navigateur
+JOB_LOG_EVENT_BYTES = 256 * 1024
+
+# Le journal d'un job dans ces états ne changera plus : il est conservé
+COMPLETE_STATUSES = ("success", "failed", "canceled")
+# Jobs sans journal à suivre (pas encore lancés manuellement, ignorés)
+STOPPED_STATUSES = COMPLETE_STATUSES + ("skipped", "manual")
+
+logger = logging.getLogger(__name__)
+
+
+def _cut(data, limit, final=False):
+    """
+    Texte à envoyer : au plus `limit` octets sans couper un caractère UTF-8,
+    et uniquement des lignes complètes tant que le journal s'écrit encore
+    """
+    if len(data) > limit:
+        cut = limit
+        while cut > limit - 3 and 0x80 <= data[cut] <= 0xBF:
+            cut -= 1
+        return data[:cut]
+    if final:
+        return data
+    newline = data.rfind(b"\n")
+    return data[:newline + 1] if newline != -1 else b""
+
+
+class _JobLog:
+    def __init__(self, project_id, job_id, token):
+        self.project_id = project_id
+        self.job_id = job_id
+        self.token = token
+        self.data = bytearray()
+        self.status = None
+        self.error = None
+        self.fetching = False
+        self.fetched_at = 0.0
+        self.last_used = time.monotonic()
+        self.cond = threading.Condition()
+        self.client = None
+
+    @property
+    def complete(self):
+        return self.status in COMPLETE_STATUSES
+
+    @property
+    def stopped(self):
+        return self.status in STOPPED_STATUSES or self.error is not None
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+
+class JobLogTracker:
+    """
+    Journaux des jobs de CI lus au fil de leur écriture. Chaque journal suivi a
+    un curseur côté serveur (octets déjà reçus) : seuls les nouveaux octets sont
+    demandés à la forge (Range), au plus une fois par intervalle quel que soit
+    le nombre de pages qui le suivent. Les journaux terminés sont conservés et
+    relus sans nouveau téléchargement.
+    """
+
+    def __init__(self, forge_api_url, poll_interval=JOB_LOG_POLL_INTERVAL, cache_bytes=JOB_LOG_CACHE_BYTES):
+        self.forge_api_url = forge_api_url
+        self.poll_interval = poll_interval
+        self.cache_bytes = cache_bytes
+        self._logs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _job_url(self, entry):
+        return f"{self.forge_api_url}/projects/{entry.project_id}/jobs/{entry.job_id}"
+
+    def _entry(self, project_id, token, job_id):
+        # Journaux propres à chaque token : l'accès au projet a été vérifié par la forge
+        key = (token_key(token), project_id, job_id)
+        evicted = []
+        with self._lock:
+            entry = self._logs.get(key)
+            if entry is None or entry.error is not None:
+                entry = self._logs[key] = _JobLog(project_id, job_id, token)
+            self._logs.move_to_end(key)
+            entry.last_used = time.monotonic()
+            idle_before = entry.last_used - JOB_LOG_IDLE_TIMEOUT
+            complete_bytes = 0
+            # Parcours du plus récent au plus ancien : les journaux terminés les plus anciens sont évincés
+            for old_key in reversed(list(self._logs)):
+                old = self._logs[old_key]
+                if old.complete:
+                    complete_bytes += len(old.data)
+                    if complete_bytes <= self.cache_bytes:
+                        continue
+                elif old.last_used >= idle_before:
+                    continue
+                evicted.append(self._logs.pop(old_key))
+        for old in evicted:
+            old.close()
+        return entry
+
+    def _fetch(self, entry):
+        """Statut du job puis octets du journal écrits depuis la dernière lecture"""
+        if entry.client is None:
+            # Connexion conservée tant que le job est suivi ; pas de cache partagé (lecture en flux)
+            entry.client = httpx.Client(headers={"Authorization": f"Bearer {entry.token}"})
+        response = entry.client.get(self._job_url(entry))
+        response.raise_for_status()
+        status = response.json().get("status")
+
+        offset = len(entry.data)
+        received = bytearray()
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with entry.client.stream("GET", f"{self._job_url(entry)}/trace", headers=headers) as response:
+            # 404 : journal pas encore créé (job en attente) ; 416 : rien de nouveau
+            if response.status_code not in (404, 416):
+                response.raise_for_status()
+                # 206 : la forge a appliqué la plage ; sinon les octets déjà reçus sont sautés
+                skip = offset if response.status_code == 200 else 0
+                for chunk in response.iter_bytes():
+                    if skip:
+                        if len(chunk) <= skip:
+                            skip -= len(chunk)
+                            continue
+                        chunk = chunk[skip:]
+                        skip = 0
+                    received += chunk
+        return status, bytes(received)
+
+    def follow(self, project_id, token, job_id, offset=0, timeout=15):
+        """
+        Texte du journal après `offset` (octets), attendu au plus `timeout`
+        secondes. Retourne le texte (lignes complètes), le nouvel offset, le
+        statut du job et `done` quand le journal est entièrement transmis.
+        """
+        entry = self._entry(project_id, token, job_id)
+        deadline = time.monotonic() + timeout
+        while True:
+            with entry.cond:
+                available = bytes(entry.data[offset:]) if offset < len(entry.data) else b""
+                text = _cut(available, JOB_LOG_EVENT_BYTES, final=entry.stopped)
+                if text or entry.stopped:
+                    new_offset = offset + len(text)
+                    return {
+                        "text": text.decode("utf-8", errors="replace"),
+                        "offset": new_offset,
+                        "status": entry.status,
+                        "error": entry.error,
+                        "done": entry.stopped and new_offset >= len(entry.data),
+                    }
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return {"text": "", "offset": offset, "status": entry.status, "error": None, "done": False}
+                if entry.fetching:
+                    # Lecture en cours pour une autre page : son résultat est partagé
+                    entry.cond.wait(remaining)
+                    continue
+                wait = self.poll_interval - (time.monotonic() - entry.fetched_at)
+                if wait > 0:
+                    entry.cond.wait(min(remaining, wait))
+                    continue
+                entry.fetching = True
+
+            try:
+                status, received = self._fetch(entry)
+                error = None
+            except Exception as e:
+                logger.warning(f"Lecture du journal du job {job_id} (projet {project_id}) impossible: {e}")
+                status, received, error = entry.status, b"", str(e)
+            with entry.cond:
+                entry.data += received
+                entry.status = status
+                entry.error = error
+                entry.fetching = False
+                entry.fetched_at = time.monotonic()
+                if entry.stopped:
+                    # Journal complet (ou inaccessible) : plus de lecture, connexion libérée
+                    entry.close()
+                entry.cond.notify_all()
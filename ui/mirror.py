@@ -0,0 +1,294 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+
+from api.git_tools import git_env, run_git
+from ui.events import known_project_states
+from ui.project_index import token_key
+
+# Répertoire des miroirs locaux (vide : fonctionnalité désactivée)
+MIRROR_DIR = os.getenv("MIRROR_DIR", "")
+# Intervalle (secondes) entre deux vérifications de l'accès d'un utilisateur et de la tête distante
+MIRROR_VERIFY_INTERVAL = float(os.getenv("MIRROR_VERIFY_INTERVAL", "60"))
+# Nombre maximal de miroirs ouverts (processus `git cat-file` actifs)
+MIRROR_MAX_OPEN = int(os.getenv("MIRROR_MAX_OPEN", "32"))
+MIRROR_BRANCH = "master"
+READ_CHUNK = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class _CatFile:
+    """Processus `git cat-file --batch` persistant : lecture des objets sans relancer git"""
+
+    def __init__(self, git_dir):
+        self.git_dir = git_dir
+        self.process = None
+        self.lock = threading.Lock()
+
+    def _ensure(self):
+        if self.process is None or self.process.poll() is not None:
+            self.process = subprocess.Popen(
+                ["git", "--git-dir", self.git_dir, "cat-file", "--batch"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                env=git_env()
+            )
+
+    def read(self, spec):
+        """Retourne (sha, type, contenu) de l'objet désigné, ou None s'il n'existe pas"""
+        found = self.read_range(spec)
+        return found[:3] if found else None
+
+    def read_range(self, spec, start=0, length=None):
+        """
+        Retourne (sha, type, octets [start, start + length), taille) de l'objet
+        désigné, ou None s'il n'existe pas. Le reste du contenu est lu par
+        morceaux et ignoré : la mémoire reste bornée par `length`.
+        """
+        if "\n" in spec:
+            return None
+        with self.lock:
+            self._ensure()
+            try:
+                self.process.stdin.write(spec.encode("utf-8") + b"\n")
+                self.process.stdin.flush()
+                header = self.process.stdout.readline().decode("utf-8", "surrogateescape").rstrip("\n")
+                # Objet absent : « <spec> missing » (ou ambiguous), le spec pouvant contenir des espaces
+                if header.endswith((" missing", " ambiguous")):
+                    return None
+                sha, kind, size = header.split()
+                size = int(size)
+                start = min(start, size)
+                end = size if length is None else min(size, start + length)
+                self._skip(start)
+                data = self._read_exact(end - start)
+                # Fin du contenu et saut de ligne final
+                self._skip(size - end + 1)
+                return sha, kind, data, size
+            except Exception:
+                # Flux désynchronisé (processus arrêté, réponse tronquée) : relancé à la prochaine lecture
+                self._kill()
+                raise
+
+    def _read_exact(self, count):
+        data = self.process.stdout.read(count)
+        if len(data) != count:
+            raise EOFError("Sortie de git cat-file interrompue")
+        return data
+
+    def _skip(self, count):
+        while count > 0:
+            chunk = self.process.stdout.read(min(count, READ_CHUNK))
+            if not chunk:
+                raise EOFError("Sortie de git cat-file interrompue")
+            count -= len(chunk)
+
+    def _kill(self):
+        self.process.kill()
+        self.process.communicate()
+        self.process = None
+
+    def close(self):
+        with self.lock:
+            if self.process is not None:
+                self.process.stdin.close()
+                self.process.wait()
+                self.process = None
+
+
+class ProjectMirror:
+    """Clone nu d'un projet, mis à jour par fetch incrémental"""
+
+    def __init__(self, root, project_id):
+        self.project_id = project_id
+        self.path = os.path.join(root, f"{project_id}.git")
+        self.lock = threading.Lock()
+        self.cat_file = _CatFile(self.path)
+        self.head = None
+        self.stale = False
+        # Clé d'utilisateur -> instant où son accès au dépôt a été vérifié
+        self.authorized = {}
+        self._tree = (None, [])
+
+    def exists(self):
+        return os.path.isdir(self.path)
+
+    def clone(self, remote_url, token):
+        # Clone dans un répertoire temporaire puis renommage : pas de miroir à moitié écrit
+        parent = os.path.dirname(self.path)
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{self.project_id}-", dir=parent)
+        try:
+            run_git(["clone", "--bare", "--quiet", remote_url, tmp_dir], token=token)
+            os.replace(tmp_dir, self.path)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._read_head()
+
+    def fetch(self, token):
+        run_git(["fetch", "--prune", "--quiet", "origin", "+refs/heads/*:refs/heads/*"], self.path, token)
+        self.stale = False
+        self._read_head()
+
+    def remote_head(self, token):
+        output = run_git(["ls-remote", "origin", f"refs/heads/{MIRROR_BRANCH}"], self.path, token)
+        line = output.decode("utf-8").strip()
+        return line.split()[0] if line else None
+
+    def _read_head(self):
+        found = self.cat_file.read(f"refs/heads/{MIRROR_BRANCH}")
+        self.head = found[0] if found else None
+
+    def list_tree(self):
+        """Blobs de la branche, au format de l'API tree de la forge (mis en cache par commit)"""
+        if self.head is None:
+            return []
+        if self._tree[0] == self.head:
+            return self._tree[1]
+        output = run_git(["ls-tree", "-r", "-z", "--full-tree", self.head], self.path)
+        items = []
+        for entry in output.decode("utf-8", "surrogateescape").split("\0"):
+            if not entry:
+                continue
+            meta, path = entry.split("\t", 1)
+            mode, kind, sha = meta.split()
+            if kind == "blob":
+                items.append({"id": sha, "name": os.path.basename(path), "type": kind, "path": path, "mode": mode})
+        self._tree = (self.head, items)
+        return items
+
+    def read_file(self, path):
+        """Contenu d'un fichier de la branche : (sha du blob, octets), ou None s'il n'existe pas"""
+        if self.head is None:
+            return None
+        found = self.cat_file.read(f"{self.head}:{path}")
+        if found is None or found[1] != "blob":
+            return None
+        return found[0], found[2]
+
+    def read_range(self, path, start, length):
+        """Partie d'un fichier de la branche : (sha du blob, taille, octets), ou None s'il n'existe pas"""
+        if self.head is None:
+            return None
+        found = self.cat_file.read_range(f"{self.head}:{path}", start, length)
+        if found is None or found[1] != "blob":
+            return None
+        return found[0], found[3], found[2]
+
+    def read_blob(self, sha):
+        """Contenu d'un blob désigné par son SHA, ou None s'il n'existe pas"""
+        found = self.cat_file.read(sha)
+        if found is None or found[1] != "blob":
+            return None
+        return found[2]
+
+    def close(self):
+        self.cat_file.close()
+
+
+class MirrorManager:
+    """
+    Miroirs locaux (clones nus) des projets ouverts dans l'éditeur.
+    Une fois le miroir chaud, l'arborescence et les fichiers sont lus directement
+    dans la base d'objets git : aucune requête vers la forge. Le miroir est
+    rafraîchi par fetch incrémental quand la tête de la branche change (webhook
+    de push, ou `ls-remote` fait avec le token de l'utilisateur, qui vérifie
+    aussi son droit d'accès au dépôt).
+    """
+
+    def __init__(self, forge_api_url, root=MIRROR_DIR, verify_interval=MIRROR_VERIFY_INTERVAL,
+                 max_open=MIRROR_MAX_OPEN, remote_url_for=None):
+        self.forge_api_url = forge_api_url
+        self.root = root
+        self.verify_interval = verify_interval
+        self.max_open = max_open
+        self.remote_url_for = remote_url_for or self._forge_remote_url
+        self._mirrors = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.root)
+
+    def _forge_remote_url(self, project_id, token):
+        response = httpx.get(
+            f"{self.forge_api_url}/projects/{project_id}",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        response.raise_for_status()
+        return response.json()["http_url_to_repo"]
+
+    def _get(self, project_id):
+        with self._lock:
+            mirror = self._mirrors.get(project_id)
+            if mirror is None:
+                mirror = ProjectMirror(self.root, project_id)
+                self._mirrors[project_id] = mirror
+            self._mirrors.move_to_end(project_id)
+            evicted = []
+            while len(self._mirrors) > self.max_open:
+                evicted.append(self._mirrors.popitem(last=False)[1])
+        # Le clone reste sur disque : seul le processus de lecture est arrêté
+        for old in evicted:
+            old.close()
+        return mirror
+
+    def _pushed_head(self, project_id):
+        """Tête de branche connue grâce aux webhooks de push, si disponible"""
+        state = known_project_states([project_id]).get(project_id) or {}
+        head = state.get("head") or {}
+        if head.get("ref") == f"refs/heads/{MIRROR_BRANCH}":
+            return head.get("sha")
+        return None
+
+    def sync(self, project_id, token):
+        """Prépare le miroir d'un projet pour une lecture par cet utilisateur"""
+        mirror = self._get(project_id)
+        key = token_key(token)
+        with mirror.lock:
+            now = time.monotonic()
+            if not mirror.exists():
+                mirror.clone(self.remote_url_for(project_id, token), token)
+                mirror.authorized[key] = now
+                return mirror
+            if mirror.head is None:
+                mirror._read_head()
+
+            if now - mirror.authorized.get(key, 0.0) > self.verify_interval:
+                remote_head = mirror.remote_head(token)
+                mirror.authorized[key] = now
+                if mirror.stale or remote_head != mirror.head:
+                    mirror.fetch(token)
+            elif mirror.stale:
+                mirror.fetch(token)
+            else:
+                pushed = self._pushed_head(project_id)
+                if pushed and pushed != mirror.head:
+                    mirror.fetch(token)
+            return mirror
+
+    def list_files(self, project_id, token):
+        return self.sync(project_id, token).list_tree()
+
+    def read_file(self, project_id, token, path):
+        return self.sync(project_id, token).read_file(path)
+
+    def read_range(self, project_id, token, path, start, length):
+        return self.sync(project_id, token).read_range(path, start, length)
+
+    def read_blob(self, project_id, token, sha):
+        return self.sync(project_id, token).read_blob(sha)
+
+    def invalidate(self, project_id):
+        """Force un fetch à la prochaine lecture (après un commit depuis l'éditeur)"""
+        with self._lock:
+            mirror = self._mirrors.get(project_id)
+        if mirror is not None:
+            mirror.stale = True
@@ -0,0 +1,177 @@
+import mimetypes
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+
+from ui.project_index import token_key
+
+# Mémoire maximale (octets) des contenus de blobs gardés pour l'aperçu
+PREVIEW_CACHE_BYTES = int(os.getenv("PREVIEW_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Durée (secondes) pendant laquelle l'arborescence d'un projet est réutilisée
+PREVIEW_TREE_TTL = float(os.getenv("PREVIEW_TREE_TTL", "10"))
+# Durée de validité (secondes) d'une clé d'aperçu
+PREVIEW_GRANT_TTL = float(os.getenv("PREVIEW_GRANT_TTL", "3600"))
+PREVIEW_MAX_BLOB_BYTES = 20 * 1024 * 1024
+
+# Le contenu des élèves est exécuté dans un bac à sable : origine opaque, pas
+# d'accès aux cookies ni aux routes de L'Établi
+PREVIEW_CSP = "sandbox allow-scripts allow-forms allow-popups allow-modals"
+
+TEXT_MIMETYPES = ("application/javascript", "application/json", "application/xml", "image/svg+xml")
+EXTRA_MIMETYPES = {
+    ".js": "application/javascript",
+    ".mjs": "application/javascript",
+    ".css": "text/css",
+    ".svg": "image/svg+xml",
+    ".webp": "image/webp",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+    ".md": "text/markdown",
+    ".json": "application/json",
+    ".webmanifest": "application/manifest+json",
+}
+
+
+def mimetype_for(path):
+    """Type MIME d'un fichier du projet (avec charset pour les formats texte)"""
+    extension = os.path.splitext(path)[1].lower()
+    mimetype = EXTRA_MIMETYPES.get(extension) or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if mimetype.startswith("text/") or mimetype in TEXT_MIMETYPES:
+        mimetype += "; charset=utf-8"
+    return mimetype
+
+
+class PreviewServer:
+    """
+    Rendu des fichiers d'un projet sans passer par un pipeline Pages.
+    L'arborescence (chemin -> SHA du blob) est relue au plus toutes les
+    PREVIEW_TREE_TTL secondes ; les contenus sont mis en cache par SHA de blob,
+    donc jamais retéléchargés tant qu'ils ne changent pas.
+    """
+
+    def __init__(self, forge_api_url, mirrors=None, max_bytes=PREVIEW_CACHE_BYTES, tree_ttl=PREVIEW_TREE_TTL,
+                 grant_ttl=PREVIEW_GRANT_TTL):
+        self.forge_api_url = forge_api_url
+        # Miroirs git locaux, utilisés à la place de l'API lorsqu'ils sont activés
+        self.mirrors = mirrors
+        self.max_bytes = max_bytes
+        self.tree_ttl = tree_ttl
+        self.grant_ttl = grant_ttl
+        self._trees = {}
+        self._blobs = OrderedDict()
+        self._blob_bytes = 0
+        self._grants = {}
+        self._grants_purged_at = 0.0
+        self._lock = threading.Lock()
+
+    def grant(self, project_id, token):
+        """
+        Clé d'aperçu d'un projet pour cet utilisateur. Elle figure dans l'URL :
+        les documents en bac à sable n'envoient pas le cookie de session, et les
+        chemins relatifs des pages conservent ainsi l'accès au projet.
+        """
+        now = time.monotonic()
+        user_key = token_key(token)
+        with self._lock:
+            self._purge_grants(now)
+            for key, (grant_project, grant_user, _, expires) in self._grants.items():
+                if grant_project == project_id and grant_user == user_key and expires - now > self.grant_ttl / 2:
+                    return key
+            key = secrets.token_urlsafe(24)
+            self._grants[key] = (project_id, user_key, token, now + self.grant_ttl)
+            return key
+
+    def _purge_grants(self, now):
+        # Clés expirées oubliées (et leur token), au plus une fois par minute
+        if now - self._grants_purged_at < 60:
+            return
+        self._grants_purged_at = now
+        for key in [key for key, grant in self._grants.items() if grant[3] < now]:
+            del self._grants[key]
+
+    def token_for(self, project_id, key):
+        """Token associé à une clé d'aperçu valide pour ce projet, sinon None"""
+        now = time.monotonic()
+        with self._lock:
+            self._purge_grants(now)
+            grant = self._grants.get(key)
+        if grant is None or grant[0] != project_id or grant[3] < now:
+            return None
+        return grant[2]
+
+    def invalidate(self, project_id):
+        """Force la relecture de l'arborescence (après un commit depuis l'éditeur)"""
+        with self._lock:
+            for key in [key for key in self._trees if key[0] == project_id]:
+                del self._trees[key]
+
+    def tree(self, project_id, token):
+        """Dictionnaire {chemin: sha} des fichiers du projet, vu avec le token de l'utilisateur"""
+        if self.mirrors is not None and self.mirrors.enabled:
+            return {item["path"]: item["id"] for item in self.mirrors.list_files(project_id, token)}
+        key = (project_id, token_key(token))
+        with self._lock:
+            cached = self._trees.get(key)
+        if cached and time.monotonic() - cached[0] < self.tree_ttl:
+            return cached[1]
+
+        blobs = {}
+        page = "1"
+        with httpx.Client(headers={"Authorization": f"Bearer {token}"}) as client:
+            while page:
+                response = client.get(
+                    f"{self.forge_api_url}/projects/{project_id}/repository/tree",
+                    params={"ref": "master", "recursive": "true", "per_page": 100, "page": page}
+                )
+                response.raise_for_status()
+                for item in response.json():
+                    if item["type"] == "blob":
+                        blobs[item["path"]] = item["id"]
+                page = response.headers.get("X-Next-Page", "")
+        with self._lock:
+            self._trees[key] = (time.monotonic(), blobs)
+        return blobs
+
+    def blob(self, project_id, token, sha):
+        """Contenu d'un blob, depuis le cache ou la forge"""
+        with self._lock:
+            data = self._blobs.get(sha)
+            if data is not None:
+                self._blobs.move_to_end(sha)
+                return data
+        if self.mirrors is not None and self.mirrors.enabled:
+            return self.mirrors.read_blob(project_id, token, sha)
+        response = httpx.get(
+            f"{self.forge_api_url}/projects/{project_id}/repository/blobs/{sha}/raw",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        response.raise_for_status()
+        data = response.content
+        if len(data) <= PREVIEW_MAX_BLOB_BYTES:
+            with self._lock:
+                if sha not in self._blobs:
+                    self._blobs[sha] = data
+                    self._blob_bytes += len(data)
+                while self._blob_bytes > self.max_bytes:
+                    _, evicted = self._blobs.popitem(last=False)
+                    self._blob_bytes -= len(evicted)
+        return data
+
+    def resolve(self, project_id, token, path):
+        """
+        Résout un chemin demandé : retourne ("file", chemin, sha), ("redirect", chemin)
+        pour un répertoire sans barre finale, ou None s'il n'existe pas.
+        """
+        files = self.tree(project_id, token)
+        path = path.lstrip("/")
+        if path == "" or path.endswith("/"):
+            path += "index.html"
+        if path in files:
+            return "file", path, files[path]
+        if f"{path}/index.html" in files:
+            return "redirect", f"{path}/"
+        return None
@@ -0,0 +1,57 @@
+import logging
+import threading
+
+from flask import abort, g, jsonify, request
+
+from api import profiling
+
+logger = logging.getLogger(__name__)
+
+
+def init_profiling(app):
+    """
+    Profilage à la demande de l'interface, uniquement si PROFILE_ADMIN_TOKEN est
+    défini (sinon rien n'est enregistré : aucun coût par requête). Une requête
+    portant l'en-tête X-Profile-Token est profilée seule (thread qui la sert) ;
+    POST /admin/profile?seconds=30 profile tout le processus pendant une fenêtre.
+    """
+    if not profiling.enabled:
+        return app
+
+    @app.before_request
+    def start_request_profile():
+        if not request.path.startswith(profiling.PROFILE_ROUTES) and profiling.check_token(
+            request.headers.get(profiling.PROFILE_HEADER)
+        ):
+            g.profile = profiling.RequestProfile(
+                f"ui-{request.method}-{request.path}", thread_ids={threading.get_ident()}
+            )
+
+    @app.after_request
+    def finish_request_profile(response):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            # Corps en flux non compris : il est produit après cette fonction
+            name = profile.finish(response.status_code)
+            response.headers["X-Profile-Name"] = name
+            logger.info(f"Profil de {request.path} écrit: {name}")
+        return response
+
+    def require_token():
+        if not profiling.check_token(request.headers.get(profiling.PROFILE_HEADER)):
+            abort(404)
+
+    @app.route("/admin/profile", methods=["POST"])
+    def start_window_profile():
+        require_token()
+        try:
+            return jsonify(profiling.window.start(request.args.get("seconds", 30, type=float), "ui-window"))
+        except RuntimeError as e:
+            return jsonify({"error": str(e)}), 409
+
+    @app.route("/admin/profiles")
+    def list_window_profiles():
+        require_token()
+        return jsonify({**profiling.window.status(), "profiles": profiling.list_profiles()})
+
+    return app
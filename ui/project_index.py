@@ -0,0 +1,127 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import httpx
+
+# Durée (secondes) au-delà de laquelle l'index est reconstruit depuis la forge
+PROJECT_INDEX_TTL = float(os.getenv("PROJECT_INDEX_TTL", "300"))
+# Nombre maximal d'utilisateurs indexés simultanément
+PROJECT_INDEX_MAX_USERS = int(os.getenv("PROJECT_INDEX_MAX_USERS", "1000"))
+PER_PAGE = 100
+
+
+def token_key(token):
+    """Clé d'indexation dérivée du token (le token brut n'est jamais conservé)"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def project_path_for(name):
+    """Chemin que la forge dérive d'un nom de projet"""
+    path = re.sub(r"[^a-zA-Z0-9_.-]+", "-", name.strip()).strip("-.")
+    return path.lower()
+
+
+class _UserIndex:
+    def __init__(self):
+        # Compteurs : un même nom peut appartenir à plusieurs projets
+        self.names = Counter()
+        self.paths = Counter()
+        self.by_id = {}
+        self.built_at = time.monotonic()
+
+    def add(self, project):
+        if project["id"] in self.by_id:
+            return
+        name = project.get("name", "").lower()
+        path = project.get("path", "").lower()
+        self.by_id[project["id"]] = (name, path)
+        self.names[name] += 1
+        self.paths[path] += 1
+
+    def remove(self, project_id):
+        if project_id not in self.by_id:
+            return
+        name, path = self.by_id.pop(project_id)
+        self.names[name] -= 1
+        if self.names[name] <= 0:
+            del self.names[name]
+        self.paths[path] -= 1
+        if self.paths[path] <= 0:
+            del self.paths[path]
+
+
+class OwnedProjectIndex:
+    """
+    Index local, par utilisateur, des noms et chemins des projets qu'il possède.
+    Construit une fois depuis la liste paginée des projets puis tenu à jour à
+    chaque création, fork ou suppression : la vérification de doublon est une
+    simple recherche dans un ensemble. La forge n'est réinterrogée que lorsque
+    l'index a expiré.
+    """
+
+    def __init__(self, forge_api_url, ttl=PROJECT_INDEX_TTL, max_users=PROJECT_INDEX_MAX_USERS):
+        self.forge_api_url = forge_api_url
+        self.ttl = ttl
+        self.max_users = max_users
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fetch(self, token):
+        index = _UserIndex()
+        page = "1"
+        with httpx.Client(headers={"Authorization": f"Bearer {token}"}) as client:
+            while page:
+                response = client.get(
+                    f"{self.forge_api_url}/projects",
+                    params={"owned": "true", "simple": "true", "per_page": PER_PAGE, "page": page}
+                )
+                response.raise_for_status()
+                for project in response.json():
+                    index.add(project)
+                page = response.headers.get("X-Next-Page", "")
+        return index
+
+    def _get(self, token):
+        key = token_key(token)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None and time.monotonic() - index.built_at < self.ttl:
+                self._indexes.move_to_end(key)
+                return index
+        # Index absent ou expiré : reconstruction depuis la forge (hors verrou)
+        index = self._fetch(token)
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def exists(self, token, name):
+        """Indique si l'utilisateur possède déjà un projet portant ce nom ou ce chemin"""
+        index = self._get(token)
+        with self._lock:
+            return name.strip().lower() in index.names or project_path_for(name) in index.paths
+
+    def add(self, token, project):
+        """Ajoute un projet créé ou forké à l'index de l'utilisateur"""
+        with self._lock:
+            index = self._indexes.get(token_key(token))
+            if index is not None:
+                index.add(project)
+
+    def remove(self, token, project_id):
+        """Retire un projet supprimé de l'index de l'utilisateur"""
+        with self._lock:
+            index = self._indexes.get(token_key(token))
+            if index is not None:
+                index.remove(project_id)
+
+    def invalidate(self, token):
+        """Force la reconstruction de l'index au prochain accès"""
+        with self._lock:
+            self._indexes.pop(token_key(token), None)
@@ -0,0 +1,102 @@
+import math
+
+DEFAULT_PER_PAGE = 24
+MAX_PER_PAGE = 100
+SORTS = ("activity", "name", "pipeline")
+VISIBILITIES = ("public", "internal", "private")
+# Ordre du tri par statut de pipeline : échecs et pipelines en cours d'abord
+PIPELINE_ORDER = {"failed": 0, "running": 1, "pending": 2, "created": 3, "canceled": 4, "skipped": 5, "manual": 6, "success": 7}
+
+
+def _int_arg(value, default, minimum, maximum):
+    try:
+        return max(minimum, min(maximum, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+class RepoPage:
+    """Page de résultats d'une requête sur la liste des dépôts"""
+
+    def __init__(self, items, total, query):
+        self.items = items
+        self.total = total
+        self.query = query
+        self.pages = max(1, math.ceil(total / query.per_page))
+        self.page = min(query.page, self.pages)
+
+
+class RepoQuery:
+    """
+    Tri, filtre et pagination de la liste des dépôts d'un utilisateur.
+    S'applique à la liste déjà récupérée : seuls les dépôts de la page affichée
+    sont ensuite complétés (pages, pipeline) par des requêtes vers la forge.
+    """
+
+    def __init__(self, sort="activity", order="", visibility="", text="", page=1, per_page=DEFAULT_PER_PAGE):
+        self.sort = sort if sort in SORTS else "activity"
+        self.order = order if order in ("asc", "desc") else ""
+        # Par défaut : activité la plus récente d'abord, noms dans l'ordre alphabétique
+        self.descending = self.order == "desc" if self.order else self.sort == "activity"
+        self.visibility = visibility if visibility in VISIBILITIES else ""
+        self.text = text.strip()
+        self.page = page
+        self.per_page = per_page
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(
+            sort=args.get("sort", "activity"),
+            order=args.get("order", ""),
+            visibility=args.get("visibility", ""),
+            text=args.get("q", ""),
+            page=_int_arg(args.get("page"), 1, 1, 1_000_000),
+            per_page=_int_arg(args.get("per_page"), DEFAULT_PER_PAGE, 1, MAX_PER_PAGE),
+        )
+
+    def args(self, **changes):
+        """Paramètres d'URL de la requête (pour les liens de pagination et de tri)"""
+        args = {
+            "sort": self.sort,
+            "order": self.order,
+            "visibility": self.visibility,
+            "q": self.text,
+            "page": self.page,
+            "per_page": self.per_page,
+        }
+        args.update(changes)
+        return {key: value for key, value in args.items() if value not in ("", None)}
+
+    def _matches(self, repo):
+        if self.visibility and repo.get("visibility") != self.visibility:
+            return False
+        if self.text:
+            text = self.text.lower()
+            return any(text in (repo.get(field) or "").lower() for field in ("name", "path", "description"))
+        return True
+
+    def apply(self, repos, pipeline_statuses=None):
+        """
+        Filtre, trie et découpe `repos`. `pipeline_statuses` ({id: statut}) n'est
+        utilisé que pour le tri par pipeline ; les dépôts sans statut connu sont placés à la fin.
+        """
+        matching = [repo for repo in repos if self._matches(repo)]
+        if self.sort == "name":
+            matching.sort(key=lambda repo: (repo.get("name") or "").lower(), reverse=self.descending)
+        elif self.sort == "pipeline":
+            statuses = pipeline_statuses or {}
+            known = [repo for repo in matching if statuses.get(repo["id"])]
+            unknown = [repo for repo in matching if not statuses.get(repo["id"])]
+            known.sort(
+                key=lambda repo: (PIPELINE_ORDER.get(statuses[repo["id"]], len(PIPELINE_ORDER)), (repo.get("name") or "").lower()),
+                reverse=self.descending
+            )
+            matching = known + unknown
+        else:
+            # Dates ISO 8601 : l'ordre lexicographique est l'ordre chronologique
+            matching.sort(key=lambda repo: repo.get("last_activity_at") or "", reverse=self.descending)
+
+        page = RepoPage([], len(matching), self)
+        start = (page.page - 1) * self.per_page
+        page.items = matching[start:start + self.per_page]
+        return page
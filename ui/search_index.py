@@ -0,0 +1,275 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from ui.project_index import token_key
+
+# Nombre maximal de projets indexés en mémoire (les moins récemment utilisés sont évincés)
+SEARCH_MAX_PROJECTS = int(os.getenv("SEARCH_MAX_PROJECTS", "20"))
+# Budget mémoire (octets : texte des fichiers et index inversé) par projet
+SEARCH_MAX_PROJECT_BYTES = int(os.getenv("SEARCH_MAX_PROJECT_BYTES", str(8 * 1024 * 1024)))
+# Les fichiers plus gros ne sont pas indexés
+SEARCH_MAX_FILE_BYTES = int(os.getenv("SEARCH_MAX_FILE_BYTES", str(512 * 1024)))
+# Intervalle minimal (secondes) entre deux relectures de l'arborescence d'un projet
+SEARCH_REFRESH_INTERVAL = float(os.getenv("SEARCH_REFRESH_INTERVAL", "30"))
+SEARCH_MAX_RESULTS = 200
+SNIPPET_LENGTH = 160
+FETCH_WORKERS = 8
+# Coût mémoire mesuré de l'index inversé (CPython 64 bits) : clé nouvelle (chaîne, entrée du dictionnaire,
+# ensemble de chemins) et chemin ajouté à l'ensemble d'une clé
+POSTING_KEY_BYTES = 550
+POSTING_ENTRY_BYTES = 56
+
+# Extensions binaires qu'il est inutile de télécharger
+BINARY_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".bmp", ".avif", ".svgz",
+    ".pdf", ".zip", ".gz", ".tar", ".7z", ".mp3", ".mp4", ".webm", ".ogg", ".wav",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot",
+}
+
+_TOKEN_RE = re.compile(r"[\w-]+", re.UNICODE)
+
+
+def tokenize(text):
+    return {token for token in _TOKEN_RE.findall(text.lower()) if len(token) > 1}
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _IndexedFile:
+    __slots__ = ("sha", "lines", "lower_lines", "size")
+
+    def __init__(self, sha, text):
+        self.sha = sha
+        self.lines = text.splitlines()
+        self.lower_lines = text.lower().splitlines()
+        # Texte conservé deux fois (original et minuscules), ligne par ligne
+        self.size = sum(sys.getsizeof(line) for lines in (self.lines, self.lower_lines) for line in lines) \
+            + sys.getsizeof(self.lines) + sys.getsizeof(self.lower_lines)
+
+    def keys(self):
+        """Tokens et trigrammes du fichier, recalculés plutôt que conservés (l'index en a déjà la trace)"""
+        lower = "\n".join(self.lower_lines)
+        return tokenize(lower), trigrams(lower)
+
+
+class ProjectSearchIndex:
+    """
+    Index inversé d'un projet : tokens (mots entiers) et trigrammes (sous-chaînes).
+    Mis à jour incrémentalement : seuls les blobs dont le SHA a changé sont relus.
+    """
+
+    def __init__(self, project_id, max_bytes=SEARCH_MAX_PROJECT_BYTES):
+        self.project_id = project_id
+        self.max_bytes = max_bytes
+        self.files = {}
+        # SHA des blobs ignorés (binaires, trop gros, hors budget) pour ne pas les relire
+        self.skipped = {}
+        self.token_postings = {}
+        self.trigram_postings = {}
+        self.size = 0
+        self.refreshed_at = 0.0
+        # Clé d'utilisateur -> instant où son accès au projet a été vérifié
+        self.authorized = {}
+        self.lock = threading.Lock()
+
+    def _add(self, path, sha, text):
+        indexed = _IndexedFile(sha, text)
+        tokens, grams = indexed.keys()
+        size = indexed.size
+        for postings, keys in ((self.token_postings, tokens), (self.trigram_postings, grams)):
+            size += len(keys) * POSTING_ENTRY_BYTES + len(keys - postings.keys()) * POSTING_KEY_BYTES
+        if self.size + size > self.max_bytes:
+            self.skipped[path] = sha
+            return
+        self.files[path] = indexed
+        self.size += size
+        for token in tokens:
+            self.token_postings.setdefault(token, set()).add(path)
+        for trigram in grams:
+            self.trigram_postings.setdefault(trigram, set()).add(path)
+
+    def _remove(self, path):
+        self.skipped.pop(path, None)
+        indexed = self.files.pop(path, None)
+        if indexed is None:
+            return
+        self.size -= indexed.size
+        for postings, keys in zip((self.token_postings, self.trigram_postings), indexed.keys()):
+            for key in keys:
+                paths = postings.get(key)
+                if paths is not None and path in paths:
+                    paths.discard(path)
+                    self.size -= POSTING_ENTRY_BYTES
+                    if not paths:
+                        del postings[key]
+                        self.size -= POSTING_KEY_BYTES
+
+    def update(self, blobs, fetch_blob):
+        """
+        Synchronise l'index avec l'arborescence `blobs` ({chemin: sha}).
+        `fetch_blob(sha)` renvoie le contenu du blob (bytes) ou None s'il est ignoré.
+        """
+        known = {path: indexed.sha for path, indexed in self.files.items()}
+        known.update(self.skipped)
+        for path in set(known) - set(blobs):
+            self._remove(path)
+        changed = [(path, sha) for path, sha in blobs.items() if known.get(path) != sha]
+        for path, _ in changed:
+            self._remove(path)
+
+        to_fetch = []
+        for path, sha in changed:
+            if os.path.splitext(path)[1].lower() in BINARY_EXTENSIONS:
+                self.skipped[path] = sha
+            else:
+                to_fetch.append((path, sha))
+
+        if to_fetch:
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+                contents = executor.map(lambda item: fetch_blob(item[1]), to_fetch)
+                for (path, sha), data in zip(to_fetch, contents):
+                    text = _decode_text(data)
+                    if text is None:
+                        self.skipped[path] = sha
+                    else:
+                        self._add(path, sha, text)
+        self.refreshed_at = time.monotonic()
+
+    def _candidates(self, query):
+        words = query.split()
+        if len(query) >= 3:
+            # Sous-chaîne : intersection des listes de trigrammes
+            candidates = None
+            for trigram in trigrams(query):
+                paths = self.trigram_postings.get(trigram, set())
+                candidates = set(paths) if candidates is None else candidates & paths
+                if not candidates:
+                    return set()
+            return candidates
+        # Requête courte : correspondance sur les mots entiers
+        candidates = set()
+        for word in words:
+            candidates |= self.token_postings.get(word, set())
+        return candidates
+
+    def search(self, query, limit=SEARCH_MAX_RESULTS):
+        """Recherche une chaîne (insensible à la casse) : [{path, line, snippet}]"""
+        query = query.lower().strip()
+        if not query:
+            return []
+        candidates = self._candidates(query)
+        # Les fichiers où la requête est un mot entier sont présentés en premier
+        whole_word = self.token_postings.get(query, set())
+        ordered = sorted(candidates, key=lambda path: (path not in whole_word, path))
+        results = []
+        for path in ordered:
+            indexed = self.files[path]
+            for number, line in enumerate(indexed.lower_lines, start=1):
+                position = line.find(query)
+                if position < 0:
+                    continue
+                results.append({
+                    "path": path,
+                    "line": number,
+                    "snippet": _snippet(indexed.lines[number - 1], position, len(query)),
+                })
+                if len(results) >= limit:
+                    return results
+        return results
+
+
+def _decode_text(data):
+    if data is None or b"\x00" in data[:8192]:
+        return None
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def _snippet(line, position, length):
+    if len(line) <= SNIPPET_LENGTH:
+        return line.strip()
+    start = max(0, position - (SNIPPET_LENGTH - length) // 2)
+    snippet = line[start:start + SNIPPET_LENGTH].strip()
+    return ("…" if start > 0 else "") + snippet + ("…" if start + SNIPPET_LENGTH < len(line) else "")
+
+
+class SearchIndexManager:
+    """Index de recherche par projet, bornés en nombre avec éviction des projets froids"""
+
+    def __init__(self, forge_api_url, max_projects=SEARCH_MAX_PROJECTS, refresh_interval=SEARCH_REFRESH_INTERVAL):
+        self.forge_api_url = forge_api_url
+        self.max_projects = max_projects
+        self.refresh_interval = refresh_interval
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_index(self, project_id):
+        with self._lock:
+            index = self._indexes.get(project_id)
+            if index is None:
+                index = ProjectSearchIndex(project_id)
+                self._indexes[project_id] = index
+            self._indexes.move_to_end(project_id)
+            while len(self._indexes) > self.max_projects:
+                self._indexes.popitem(last=False)
+            return index
+
+    def invalidate(self, project_id):
+        """Force la relecture de l'arborescence (après un commit depuis l'éditeur)"""
+        with self._lock:
+            index = self._indexes.get(project_id)
+        if index is not None:
+            index.refreshed_at = 0.0
+
+    def _refresh(self, index, client):
+        blobs = {}
+        page = "1"
+        while page:
+            response = client.get(
+                f"{self.forge_api_url}/projects/{index.project_id}/repository/tree",
+                params={"ref": "master", "recursive": "true", "per_page": 100, "page": page}
+            )
+            response.raise_for_status()
+            for item in response.json():
+                if item["type"] == "blob":
+                    blobs[item["path"]] = item["id"]
+            page = response.headers.get("X-Next-Page", "")
+
+        def fetch_blob(sha):
+            # Lecture en flux pour ne jamais charger un fichier au-delà de la limite
+            with client.stream("GET", f"{self.forge_api_url}/projects/{index.project_id}/repository/blobs/{sha}/raw") as response:
+                if response.status_code != 200:
+                    return None
+                data = bytearray()
+                for chunk in response.iter_bytes():
+                    data.extend(chunk)
+                    if len(data) > SEARCH_MAX_FILE_BYTES:
+                        return None
+                return bytes(data)
+
+        index.update(blobs, fetch_blob)
+
+    def search(self, project_id, token, query):
+        index = self._get_index(project_id)
+        key = token_key(token)
+        with index.lock:
+            # Relire l'arborescence (avec le token de l'utilisateur) si l'index est
+            # ancien ou si l'accès de cet utilisateur n'a pas été vérifié récemment
+            now = time.monotonic()
+            if (now - index.refreshed_at > self.refresh_interval
+                    or now - index.authorized.get(key, 0.0) > self.refresh_interval):
+                with httpx.Client(headers={"Authorization": f"Bearer {token}"}) as client:
+                    self._refresh(index, client)
+                index.authorized[key] = time.monotonic()
+            return index.search(query)
@@ -0,0 +1,304 @@
+import json
+import logging
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from api.singleflight import sync_transport
+
+# Stockage des sessions : memory (par défaut), disk (un fichier par session) ou sqlite
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+# Répertoire (disk) ou fichier de base de données (sqlite) des sessions
+SESSION_PATH = os.getenv("SESSION_PATH", "")
+# Durée (secondes) d'inactivité au-delà de laquelle une session est supprimée
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", str(8 * 3600)))
+# Nombre maximal de sessions dont le client HTTP et les caches restent en mémoire
+SESSION_MAX_ACTIVE = int(os.getenv("SESSION_MAX_ACTIVE", "1000"))
+# Durée (secondes) de validité de l'identité (/user) mise en cache
+SESSION_IDENTITY_TTL = float(os.getenv("SESSION_IDENTITY_TTL", "600"))
+# Intervalle minimal entre deux mises à jour de la date d'accès d'une session inchangée
+TOUCH_INTERVAL = 60
+
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{32,64}$")
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Sessions conservées dans le processus (perdues au redémarrage)"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+        return (dict(entry[0]), entry[1]) if entry else None
+
+    def save(self, sid, data, accessed_at):
+        with self._lock:
+            self._sessions[sid] = (dict(data), accessed_at)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def purge(self, expired_before):
+        with self._lock:
+            for sid in [sid for sid, entry in self._sessions.items() if entry[1] < expired_before]:
+                del self._sessions[sid]
+
+
+class DiskBackend:
+    """Un fichier JSON par session ; la date de modification sert de date d'accès"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, f"{sid}.json")
+
+    def load(self, sid):
+        try:
+            path = self._path(sid)
+            with open(path, encoding="utf-8") as f:
+                return json.load(f), os.path.getmtime(path)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, sid, data, accessed_at):
+        path = self._path(sid)
+        tmp_path = f"{path}.{secrets.token_hex(4)}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        os.utime(path, (accessed_at, accessed_at))
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except OSError:
+            pass
+
+    def purge(self, expired_before):
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.name.endswith(".json") and entry.stat().st_mtime < expired_before:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class SQLiteBackend:
+    """Sessions dans une base SQLite locale, partagée entre les processus de l'interface"""
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS sessions_accessed_at ON sessions (accessed_at)")
+
+    def load(self, sid):
+        with self._lock:
+            row = self._connection.execute("SELECT data, accessed_at FROM sessions WHERE id = ?", (sid,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def save(self, sid, data, accessed_at):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, accessed_at) VALUES (?, ?, ?)",
+                (sid, json.dumps(data), accessed_at)
+            )
+
+    def delete(self, sid):
+        with self._lock:
+            self._connection.execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+    def purge(self, expired_before):
+        with self._lock:
+            self._connection.execute("DELETE FROM sessions WHERE accessed_at < ?", (expired_before,))
+
+
+def backend_from_env():
+    if SESSION_BACKEND == "disk":
+        return DiskBackend(SESSION_PATH or "sessions")
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteBackend(SESSION_PATH or "sessions.db")
+    if SESSION_BACKEND != "memory":
+        raise ValueError(f"SESSION_BACKEND inconnu: {SESSION_BACKEND} (attendu: memory, disk, sqlite)")
+    return MemoryBackend()
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session Flask dont seul l'identifiant circule dans le cookie"""
+
+    def __init__(self, initial=None, sid=None, new=False, accessed_at=0.0):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.accessed_at = accessed_at
+        self.modified = False
+        self.rotate = False
+
+
+class _SessionRuntime:
+    """État d'une session qui ne se sérialise pas : client HTTP, identité, caches"""
+
+    def __init__(self, token):
+        self.token = token
+        # En-têtes construits une fois ; connexions partagées et GET identiques simultanés regroupés
+        self.client = httpx.Client(headers={"Authorization": f"Bearer {token}"}, transport=sync_transport)
+        self.identity = None
+        self.identity_at = 0.0
+        self.caches = {}
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.client.close()
+
+
+class SessionStore(SessionInterface):
+    """
+    Sessions côté serveur : le cookie ne contient qu'un identifiant aléatoire,
+    le token de la forge reste sur le serveur. Chaque session active dispose en
+    mémoire d'un client HTTP réutilisant ses connexions, de l'identité de
+    l'utilisateur (/user) et de caches ; les sessions inactives sont évincées.
+    """
+
+    def __init__(self, forge_api_url, backend=None, idle_timeout=SESSION_IDLE_TIMEOUT, max_active=SESSION_MAX_ACTIVE):
+        self.forge_api_url = forge_api_url
+        self.backend = backend or backend_from_env()
+        self.idle_timeout = idle_timeout
+        self.max_active = max_active
+        self._runtimes = OrderedDict()
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+
+    # --- Interface Flask ---
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        now = time.time()
+        if sid and SESSION_ID.match(sid):
+            stored = self.backend.load(sid)
+            if stored is not None and now - stored[1] <= self.idle_timeout:
+                return ServerSession(stored[0], sid=sid, accessed_at=stored[1])
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        now = time.time()
+        self._purge(now)
+
+        if not session:
+            if not session.new:
+                self.backend.delete(session.sid)
+                self._drop_runtime(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.rotate and not session.new:
+            # Nouvel identifiant après connexion (fixation de session)
+            self.backend.delete(session.sid)
+            self._drop_runtime(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            session.new = True
+
+        if session.new or session.modified or now - session.accessed_at > TOUCH_INTERVAL:
+            self.backend.save(session.sid, dict(session), now)
+        if session.new or session.modified:
+            response.set_cookie(
+                name,
+                session.sid,
+                httponly=self.get_cookie_httponly(app),
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+                domain=domain,
+                path=path,
+            )
+
+    # --- État en mémoire des sessions actives ---
+
+    def _purge(self, now):
+        if now - self._purged_at < TOUCH_INTERVAL:
+            return
+        self._purged_at = now
+        self.backend.purge(now - self.idle_timeout)
+        evicted = []
+        with self._lock:
+            idle_before = time.monotonic() - self.idle_timeout
+            for sid in [sid for sid, runtime in self._runtimes.items() if runtime.last_used < idle_before]:
+                evicted.append(self._runtimes.pop(sid))
+        for runtime in evicted:
+            runtime.close()
+
+    def _drop_runtime(self, sid):
+        with self._lock:
+            runtime = self._runtimes.pop(sid, None)
+        if runtime is not None:
+            runtime.close()
+
+    def _runtime(self, session):
+        token = session["forge_token"]
+        evicted = []
+        with self._lock:
+            runtime = self._runtimes.get(session.sid)
+            if runtime is not None and runtime.token != token:
+                evicted.append(self._runtimes.pop(session.sid))
+                runtime = None
+            if runtime is None:
+                runtime = self._runtimes[session.sid] = _SessionRuntime(token)
+                while len(self._runtimes) > self.max_active:
+                    evicted.append(self._runtimes.popitem(last=False)[1])
+            else:
+                self._runtimes.move_to_end(session.sid)
+            runtime.last_used = time.monotonic()
+        for old in evicted:
+            old.close()
+        return runtime
+
+    def client(self, session):
+        """Client HTTP authentifié de la session (connexions réutilisées)"""
+        return self._runtime(session).client
+
+    def identity(self, session):
+        """Utilisateur de la forge associé à la session (id, username, name, namespace)"""
+        runtime = self._runtime(session)
+        with runtime.lock:
+            if runtime.identity is None or time.monotonic() - runtime.identity_at > SESSION_IDENTITY_TTL:
+                response = runtime.client.get(f"{self.forge_api_url}/user")
+                response.raise_for_status()
+                user = response.json()
+                runtime.identity = {
+                    "id": user["id"],
+                    "username": user["username"],
+                    "name": user.get("name", user["username"]),
+                    # Espace de noms personnel : celui des projets créés sans namespace explicite
+                    "namespace": user["username"],
+                }
+                runtime.identity_at = time.monotonic()
+            return runtime.identity
+
+    def cache(self, session, name):
+        """Dictionnaire de cache propre à la session, libéré avec elle"""
+        return self._runtime(session).caches.setdefault(name, {})
@@ -0,0 +1,201 @@
+import base64
+import json
+import os
+import posixpath
+import zipfile
+
+# Taille maximale (octets, décompressés) des fichiers d'un même envoi
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+# Nombre maximal de fichiers d'un même envoi
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "2000"))
+# Taille maximale (octets) du corps d'une requête de commit ; au-delà, l'envoi est réparti sur plusieurs commits
+UPLOAD_COMMIT_BYTES = int(os.getenv("UPLOAD_COMMIT_BYTES", str(64 * 1024 * 1024)))
+# Octets lus à la fois dans un fichier (multiple de 3 : base64 sans remplissage intermédiaire)
+READ_CHUNK = 3 * 64 * 1024
+# Entrées ignorées des archives et des dossiers (métadonnées de systèmes d'exploitation)
+IGNORED_NAMES = {".DS_Store", "Thumbs.db", "desktop.ini"}
+IGNORED_PREFIXES = ("__MACOSX/",)
+BRANCH = "master"
+
+
+class UploadError(ValueError):
+    """Envoi refusé (taille, nombre de fichiers, chemin invalide)"""
+
+
+def clean_path(target_dir, name):
+    """Chemin du fichier dans le dépôt ; None pour les entrées à ignorer"""
+    name = name.replace("\\", "/").lstrip("/")
+    if not name or name.endswith("/") or name.startswith(IGNORED_PREFIXES):
+        return None
+    if posixpath.basename(name) in IGNORED_NAMES:
+        return None
+    path = posixpath.normpath(posixpath.join(target_dir.strip("/"), name))
+    if path in (".", "..") or path.startswith("../") or path.startswith("/"):
+        raise UploadError(f"Chemin invalide: {name}")
+    return path
+
+
+class UploadMember:
+    """Fichier d'un envoi : chemin dans le dépôt, taille et ouverture en lecture"""
+    __slots__ = ("path", "size", "_open")
+
+    def __init__(self, path, size, open_):
+        self.path = path
+        self.size = size
+        self._open = open_
+
+    def open(self):
+        return self._open()
+
+    @property
+    def payload_size(self):
+        # Contenu en base64 et champs JSON de l'action
+        return 4 * ((self.size + 2) // 3) + len(self.path.encode("utf-8")) + 96
+
+
+class _Stream:
+    """Fichier reçu, relu depuis le début à chaque ouverture"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __enter__(self):
+        self.stream.seek(0)
+        return self.stream
+
+    def __exit__(self, *exc):
+        return False
+
+
+class UploadBatch:
+    """
+    Fichiers d'un envoi (archives ZIP décompressées, dossiers, fichiers isolés).
+    Les fichiers reçus restent dans les fichiers temporaires de Werkzeug et les
+    membres des archives sont lus en flux au moment du commit : rien n'est
+    chargé entièrement en mémoire.
+    """
+
+    def __init__(self, max_bytes=UPLOAD_MAX_BYTES, max_files=UPLOAD_MAX_FILES):
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.members = {}
+        self.total_bytes = 0
+        self._archives = []
+
+    def _add(self, path, size, open_):
+        if path is None:
+            return
+        previous = self.members.pop(path, None)
+        if previous is not None:
+            self.total_bytes -= previous.size
+        if len(self.members) >= self.max_files:
+            raise UploadError(f"Trop de fichiers (maximum {self.max_files})")
+        if self.total_bytes + size > self.max_bytes:
+            raise UploadError(f"Envoi trop volumineux (maximum {self.max_bytes // (1024 * 1024)} Mo)")
+        self.members[path] = UploadMember(path, size, open_)
+        self.total_bytes += size
+
+    def add_file(self, storage, target_dir, name=None):
+        """Fichier reçu tel quel ; `name` peut contenir un chemin relatif (envoi d'un dossier)"""
+        stream = storage.stream
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        self._add(clean_path(target_dir, name or storage.filename or ""), size, lambda: _Stream(stream))
+
+    def add_zip(self, storage, target_dir):
+        """Membres d'une archive ZIP, sous `target_dir`"""
+        try:
+            archive = zipfile.ZipFile(storage.stream)
+        except zipfile.BadZipFile:
+            raise UploadError(f"Archive ZIP invalide: {storage.filename}")
+        self._archives.append(archive)
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            # La taille annoncée borne aussi la lecture (ZipExtFile) : pas de bombe de décompression
+            self._add(clean_path(target_dir, info.filename), info.file_size, lambda info=info: archive.open(info))
+
+    def close(self):
+        for archive in self._archives:
+            archive.close()
+        self._archives = []
+
+    def __len__(self):
+        return len(self.members)
+
+
+def plan_commits(members, limit=UPLOAD_COMMIT_BYTES):
+    """
+    Répartit les membres en lots dont le corps de commit reste sous `limit`
+    octets, en aussi peu de lots que possible (plus gros fichiers d'abord, chacun
+    dans le premier lot où il tient). Un seul lot dans le cas courant.
+    """
+    batches = []
+    for member in sorted(members, key=lambda member: member.payload_size, reverse=True):
+        for batch in batches:
+            if batch[0] + member.payload_size <= limit:
+                batch[0] += member.payload_size
+                batch[1].append(member)
+                break
+        else:
+            batches.append([member.payload_size, [member]])
+    return [sorted(batch[1], key=lambda member: member.path) for batch in batches]
+
+
+def commit_body(members, commit_message, existing, branch=BRANCH):
+    """
+    Corps JSON d'un commit, produit au fil de la lecture des fichiers (envoi
+    chunked) : chaque fichier est encodé en base64 par blocs.
+    """
+    yield json.dumps({"branch": branch, "commit_message": commit_message})[:-1].encode("utf-8")
+    yield b', "actions": ['
+    for index, member in enumerate(members):
+        action = {
+            "action": "update" if member.path in existing else "create",
+            "file_path": member.path,
+            "encoding": "base64",
+        }
+        yield (b", " if index else b"") + json.dumps(action)[:-1].encode("utf-8") + b', "content": "'
+        with member.open() as f:
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    break
+                # Blocs de READ_CHUNK octets (multiple de 3) : les morceaux base64 se concatènent
+                while len(chunk) % 3 and len(chunk) < READ_CHUNK:
+                    more = f.read(READ_CHUNK - len(chunk))
+                    if not more:
+                        break
+                    chunk += more
+                yield base64.b64encode(chunk)
+        yield b'"}'
+    yield b"]}"
+
+
+def commit_upload(client, commits_url, batch, commit_message, existing, branch=BRANCH):
+    """
+    Publie les fichiers de `batch` en un commit (plusieurs si le corps dépasse
+    UPLOAD_COMMIT_BYTES). Produit un état d'avancement après chaque commit.
+    """
+    plan = plan_commits(batch.members.values())
+    done_files = done_bytes = 0
+    commits = []
+    for index, members in enumerate(plan, start=1):
+        message = commit_message if len(plan) == 1 else f"{commit_message} ({index}/{len(plan)})"
+        response = client.post(
+            commits_url,
+            content=commit_body(members, message, existing, branch),
+            headers={"Content-Type": "application/json"},
+        )
+        response.raise_for_status()
+        commits.append(response.json().get("id"))
+        done_files += len(members)
+        done_bytes += sum(member.size for member in members)
+        yield {
+            "stage": "commit",
+            "commit": index,
+            "commits": len(plan),
+            "files_done": done_files,
+            "bytes_done": done_bytes,
+            "commit_ids": list(commits),
+        }
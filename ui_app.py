@@ -1,94 +1,279 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory, send_file, stream_with_context
 import httpx
 import os
 import logging
 import random
-import glob
+import base64
+import time
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ui.assets import AssetManifest
+from ui.compression import init_compression
+from ui.profiling import init_profiling
+from api.images import AVATAR_MAX_INPUT_BYTES, prepare_avatar
+from ui.events import cached_pages_url, known_project_states, register_webhook, remember_pages_url
+from ui.project_index import OwnedProjectIndex
+from ui.search_index import SearchIndexManager
+from ui.mirror import MirrorManager
+from ui.preview import PREVIEW_CSP, PreviewServer, mimetype_for
+from ui.imports import ImportPoller
+from ui.sessions import SessionStore
+from ui.repo_query import RepoQuery
+from ui.file_windows import EDITOR_MAX_FILE_BYTES, FILE_WINDOW_BYTES, SNIFF_BYTES, FileWindowReader, describe
+from ui.job_logs import JobLogTracker
+from ui.uploads import UPLOAD_MAX_BYTES, UploadBatch, UploadError, commit_upload
+from api.singleflight import sync_transport
+from api.http_cache import cache as http_cache
+from api import metrics
 
 app = Flask(__name__)
+# Compression négociée (brotli/gzip) des pages HTML et réponses JSON
+init_compression(app)
+# Profilage à la demande (en-tête X-Profile-Token), seulement si PROFILE_ADMIN_TOKEN est défini
+init_profiling(app)
+# Délègue l'envoi des fichiers au serveur frontal (X-Sendfile) si demandé
+app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "false").lower() in ("true", "1", "t")
+
+# Manifeste des assets construit une seule fois au démarrage
+assets = AssetManifest(app.root_path).build()
+assets.build_variants_async()
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "public, max-age=300, must-revalidate"
+PLAIN_TEXT = {"Content-Type": "text/plain; charset=utf-8"}
+
+@app.context_processor
+def inject_assets():
+    return {"asset_url": assets.url, "asset_srcset": assets.srcset, "asset_variant_url": assets.variant_url}
+
+def serve_asset(directory, filename):
+    """Sert un asset (versionné ou non) avec des en-têtes de cache adaptés"""
+    asset, path, fingerprinted = assets.lookup(directory, filename)
+    if asset is None:
+        return send_from_directory(directory, filename)
+    
+    encoding = None
+    etag = os.path.basename(path)
+    if path == asset.path:
+        # Fichier d'origine : utiliser une version précompressée si le client l'accepte
+        mimetype = asset.mimetype
+        encoding, compressed_path = assets.preferred_encoding(asset, request.headers.get("Accept-Encoding", ""))
+        if encoding:
+            path = compressed_path
+            etag = f"{asset.fingerprinted_name}-{encoding}"
+        else:
+            etag = asset.fingerprinted_name
+    else:
+        # Variante redimensionnée (WebP ou JPEG)
+        mimetype = "image/webp" if path.endswith(".webp") else asset.mimetype
+
+    # send_file transmet le fichier via wsgi.file_wrapper (sendfile côté serveur)
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=etag, max_age=None)
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE if fingerprinted else REVALIDATE_CACHE
+    response.headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
 
 # Configuration pour servir les fichiers statiques des répertoires "medias" et "tuto"
 @app.route('/medias/<path:filename>')
 def serve_media(filename):
-    return send_from_directory('medias', filename)
+    return serve_asset('medias', filename)
 
 @app.route('/tuto/<path:filename>')
 def serve_tuto(filename):
-    return send_from_directory('tuto', filename)
-app.secret_key = "dev"  # À remplacer par une clé sécurisée en production
+    return serve_asset('tuto', filename)
+app.secret_key = os.getenv("SECRET_KEY", "dev")  # À définir en production
 
 # Configuration
 FORGE_API_URL = os.getenv("FORGE_API_URL", "https://forge.apps.education.fr/api/v4")
+# Requêtes simultanées vers la forge pour compléter le tableau de bord
+REPOS_STATUS_WORKERS = int(os.getenv("REPOS_STATUS_WORKERS", "8"))
+REPOS_STATUS_MAX = 100
+# Durée (secondes) de conservation de la liste des projets entre deux affichages du tableau de bord
+REPOS_LIST_TTL = float(os.getenv("REPOS_LIST_TTL", "30"))
+
+# Index local des projets possédés par chaque utilisateur (détection des doublons)
+owned_projects = OwnedProjectIndex(FORGE_API_URL)
+# Index de recherche plein texte des fichiers de chaque projet
+search_indexes = SearchIndexManager(FORGE_API_URL)
+# Miroirs git locaux pour la navigation dans l'éditeur (optionnel, MIRROR_DIR)
+mirrors = MirrorManager(FORGE_API_URL)
+# Aperçu instantané des fichiers des projets, sans pipeline
+previews = PreviewServer(FORGE_API_URL, mirrors)
+# Lecture par fenêtres des fichiers trop gros ou binaires pour l'éditeur
+file_windows = FileWindowReader(FORGE_API_URL, mirrors)
+# Suivi partagé des forks dont la forge importe encore le contenu
+imports = ImportPoller(FORGE_API_URL)
+# Journaux des jobs de CI suivis en direct (curseur par job, journaux terminés conservés)
+job_logs = JobLogTracker(FORGE_API_URL)
+# Sessions côté serveur : token, client HTTP, identité et caches de chaque utilisateur
+sessions = SessionStore(FORGE_API_URL)
+app.session_interface = sessions
+
+def forge():
+    """Client HTTP authentifié de la session courante vers la forge"""
+    return sessions.client(session)
+
+@app.context_processor
+def inject_current_user():
+    def current_user():
+        if "forge_token" not in session:
+            return None
+        try:
+            return sessions.identity(session)
+        except Exception:
+            return None
+    return {"current_user": current_user}
 
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
-        # Authentification
+        # Authentification (nouvel identifiant de session à chaque connexion)
+        session.clear()
+        session.rotate = True
         session["forge_token"] = request.form.get("token")
         return redirect(url_for("repos"))
     
-    # Récupérer la liste des images du répertoire "medias"
-    images = glob.glob("medias/*.jpg")
-    
-    # Sélectionner une image au hasard
-    random_image = None
-    if images:
-        random_image = random.choice(images)
-        # Convertir le chemin pour l'URL (enlever "medias/" du début)
-        random_image = random_image.replace("\\", "/")  # Pour Windows
-        # S'assurer que le chemin est correctement formaté pour l'URL
-        if random_image.startswith("medias/"):
-            random_image = random_image[7:]  # Enlever "medias/" du début
+    # Sélectionner une image au hasard parmi celles du manifeste
+    images = assets.images_in("medias")
+    random_image = random.choice(images) if images else None
     
     return render_template("auth.html", random_image=random_image)
 
+def _repo_status(client, repo_id, known_pipeline):
+    """URL des pages et statut du dernier pipeline d'un dépôt (interroge la forge si besoin)"""
+    pipeline_id = known_pipeline['id'] if known_pipeline else None
+    status = {"id": repo_id}
+
+    # Récupérer l'URL des pages (inchangée tant qu'aucun nouveau pipeline n'a tourné)
+    status['pages_url'] = cached_pages_url(repo_id, pipeline_id)
+    if status['pages_url'] is None:
+        try:
+            pages_response = client.get(
+                f"{FORGE_API_URL}/projects/{repo_id}/pages"
+            )
+            status['pages_url'] = ''
+            if pages_response.status_code == 200:
+                pages_info = pages_response.json()
+                status['pages_url'] = pages_info.get('url', '')
+            remember_pages_url(repo_id, pipeline_id, status['pages_url'])
+        except Exception:
+            status['pages_url'] = ''
+
+    if known_pipeline:
+        status['pipeline_status'] = known_pipeline.get('status', '')
+        return status
+
+    # Récupérer le statut du dernier pipeline
+    try:
+        pipelines_response = client.get(
+            f"{FORGE_API_URL}/projects/{repo_id}/pipelines",
+            params={"per_page": 1}  # Récupérer seulement le dernier pipeline
+        )
+        if pipelines_response.status_code == 200 and pipelines_response.json():
+            pipeline_info = pipelines_response.json()[0]  # Le premier est le plus récent
+            status['pipeline_status'] = pipeline_info.get('status', '')
+        else:
+            status['pipeline_status'] = ''
+    except Exception:
+        status['pipeline_status'] = ''
+    return status
+
+def _project_list():
+    """Liste complète des projets de l'utilisateur, conservée quelques secondes dans la session"""
+    cached = sessions.cache(session, "projects")
+    if cached.get("fetched_at", 0) > time.monotonic() - REPOS_LIST_TTL:
+        return cached["projects"]
+    projects = []
+    page = 1
+    while True:
+        projects_response = forge().get(
+            f"{FORGE_API_URL}/projects",
+            params={"membership": "true", "per_page": 100, "page": page}
+        )
+        projects_response.raise_for_status()
+        batch = projects_response.json()
+        projects.extend(batch)
+        if len(batch) < 100:
+            break
+        page += 1
+    cached.update(projects=projects, fetched_at=time.monotonic())
+    return projects
+
+def _forget_project_list():
+    sessions.cache(session, "projects").clear()
+
 @app.route("/repos")
 def repos():
     if "forge_token" not in session:
         return redirect(url_for("index"))
     
+    query = RepoQuery.from_args(request.args)
     try:
         # Récupérer la liste des projets
-        projects_response = httpx.get(
-            f"{FORGE_API_URL}/projects?membership=true&simple=true",
-            headers={"Authorization": f"Bearer {session['forge_token']}"}
-        )
-        projects_response.raise_for_status()
-        repos = projects_response.json()
+        projects = _project_list()
 
-        # Ajouter l'URL des pages et le statut du pipeline pour chaque projet
+        # Statuts de pipeline déjà connus (webhooks, chargements précédents) pour le tri
+        pipeline_statuses = None
+        if query.sort == "pipeline":
+            pipeline_statuses = dict(sessions.cache(session, "pipeline_status"))
+            for project_id, state in known_project_states([project['id'] for project in projects]).items():
+                if (state or {}).get('pipeline'):
+                    pipeline_statuses[project_id] = state['pipeline'].get('status', '')
+        result = query.apply(projects, pipeline_statuses)
+        # Copies : les dépôts de la liste en cache ne sont pas modifiés
+        repos = [dict(repo) for repo in result.items]
+
+        # État déjà connu grâce aux webhooks : affiché directement, sans requête vers la forge
+        known_states = known_project_states([repo['id'] for repo in repos])
         for repo in repos:
-            # Récupérer l'URL des pages
-            try:
-                pages_response = httpx.get(
-                    f"{FORGE_API_URL}/projects/{repo['id']}/pages",
-                    headers={"Authorization": f"Bearer {session['forge_token']}"}
-                )
-                if pages_response.status_code == 200:
-                    pages_info = pages_response.json()
-                    repo['pages_url'] = pages_info.get('url', '')
-            except Exception:
-                repo['pages_url'] = ''
-                
-            # Récupérer le statut du dernier pipeline
-            try:
-                pipelines_response = httpx.get(
-                    f"{FORGE_API_URL}/projects/{repo['id']}/pipelines",
-                    headers={"Authorization": f"Bearer {session['forge_token']}"},
-                    params={"per_page": 1}  # Récupérer seulement le dernier pipeline
-                )
-                if pipelines_response.status_code == 200 and pipelines_response.json():
-                    pipeline_info = pipelines_response.json()[0]  # Le premier est le plus récent
-                    repo['pipeline_status'] = pipeline_info.get('status', '')
-                else:
-                    repo['pipeline_status'] = ''
-            except Exception:
-                repo['pipeline_status'] = ''
+            known_pipeline = (known_states.get(repo['id']) or {}).get('pipeline')
+            pipeline_id = known_pipeline['id'] if known_pipeline else None
+            repo['pages_url'] = cached_pages_url(repo['id'], pipeline_id)
+            repo['pipeline_status'] = known_pipeline.get('status', '') if known_pipeline else None
+            # Les autres informations sont chargées par la page via /repos/status
+            repo['status_pending'] = repo['pages_url'] is None or repo['pipeline_status'] is None
     except Exception as e:
         flash(f"Erreur lors de la récupération des dépôts: {str(e)}", "error")
         repos = []
+        result = query.apply([])
     
-    return render_template("repos.html", repos=repos)
+    return render_template("repos.html", repos=repos, result=result, query=query)
+
+@app.route("/repos/status")
+def repos_status():
+    if "forge_token" not in session:
+        return {"error": "Non authentifié"}, 401
+    
+    repo_ids = [int(repo_id) for repo_id in request.args.get("ids", "").split(",") if repo_id.isdigit()][:REPOS_STATUS_MAX]
+    try:
+        # Seuls les projets de l'utilisateur : les états connus (webhooks, pages) ne sont pas vérifiés par la forge
+        own_ids = {project['id'] for project in _project_list()}
+    except Exception as e:
+        return {"error": f"Erreur lors de la récupération des projets: {str(e)}"}, 502
+    repo_ids = [repo_id for repo_id in repo_ids if repo_id in own_ids]
+    client = forge()
+    known_states = known_project_states(repo_ids)
+    # Statuts conservés dans la session pour le tri par pipeline
+    pipeline_statuses = sessions.cache(session, "pipeline_status")
+    
+    def stream():
+        # Une ligne JSON par dépôt, envoyée dès que ses informations sont connues
+        with ThreadPoolExecutor(max_workers=REPOS_STATUS_WORKERS) as executor:
+            futures = [
+                executor.submit(_repo_status, client, repo_id, (known_states.get(repo_id) or {}).get('pipeline'))
+                for repo_id in repo_ids
+            ]
+            for future in as_completed(futures):
+                status = future.result()
+                pipeline_statuses[status['id']] = status['pipeline_status']
+                yield json.dumps(status) + "\n"
+    
+    response = app.response_class(stream(), mimetype="application/x-ndjson")
+    response.headers["Cache-Control"] = "no-store"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 @app.route("/create-repo", methods=["GET", "POST"])
 def create_repo():
@@ -97,21 +282,14 @@ def create_repo():
     
     if request.method == "POST":
         try:
-            # Vérifier si le dépôt existe déjà
-            repos_response = httpx.get(
-                f"{FORGE_API_URL}/projects?membership=true&search={request.form.get('name')}",
-                headers={"Authorization": f"Bearer {session['forge_token']}"}
-            )
-            repos_response.raise_for_status()
-            
-            if len(repos_response.json()) > 0:
+            # Vérifier si le dépôt existe déjà (index local, correspondance exacte)
+            if owned_projects.exists(session["forge_token"], request.form.get("name", "")):
                 flash("Un dépôt avec ce nom existe déjà", "error")
                 return redirect(url_for("create_repo"))
                 
             # Créer le dépôt
-            response = httpx.post(
+            response = forge().post(
                 f"{FORGE_API_URL}/projects",
-                headers={"Authorization": f"Bearer {session['forge_token']}"},
                 json={
                     "name": request.form.get("name"),
                     "description": request.form.get("description"),
@@ -119,6 +297,9 @@ def create_repo():
                 }
             )
             response.raise_for_status()
+            owned_projects.add(session["forge_token"], response.json())
+            _forget_project_list()
+            register_webhook(response.json()["id"], session["forge_token"])
             flash("Dépôt créé avec succès!", "success")
             return redirect(url_for("repos"))
         except Exception as e:
@@ -132,34 +313,132 @@ def get_file(project_id):
         return {"error": "Unauthorized"}, 401
     
     file_path = request.args.get('path')
+    if mirrors.enabled:
+        try:
+            # Au plus la taille maximale de l'éditeur (+1 octet pour détecter un fichier plus gros)
+            found = mirrors.read_range(project_id, session["forge_token"], file_path, 0, EDITOR_MAX_FILE_BYTES + 1)
+            if found is None:
+                return {"error": f"Fichier introuvable: {file_path}"}, 404
+            blob_id, size, data = found
+            info = describe(file_path, size, blob_id, data)
+            if size > EDITOR_MAX_FILE_BYTES:
+                return {"error": "Fichier trop volumineux pour l'éditeur: utilisez /file-window", **info}, 413
+            return {
+                **info,
+                "file_name": os.path.basename(file_path),
+                "encoding": "base64",
+                "content": base64.b64encode(data).decode("ascii"),
+                "ref": "master",
+            }
+        except Exception as e:
+            logging.warning(f"Miroir indisponible pour le projet {project_id}, lecture via la forge: {e}")
     try:
-        response = httpx.get(
+        # Taille d'abord (HEAD) : un gros fichier n'est pas téléchargé en base64
+        stat = file_windows.stat(project_id, session["forge_token"], file_path)
+        if stat is None:
+            return {"error": f"Fichier introuvable: {file_path}"}, 404
+        if stat[0] > EDITOR_MAX_FILE_BYTES:
+            info = file_windows.info(project_id, session["forge_token"], file_path)
+            return {"error": "Fichier trop volumineux pour l'éditeur: utilisez /file-window", **info}, 413
+        response = forge().get(
             f"{FORGE_API_URL}/projects/{project_id}/repository/files/{file_path.replace('/', '%2F')}",
-            headers={"Authorization": f"Bearer {session['forge_token']}"},
             params={"ref": "master"}
         )
         response.raise_for_status()
-        return response.json()
+        data = response.json()
+        sample = base64.b64decode(data.get("content", "")[:4 * (SNIFF_BYTES // 3)])
+        return {**describe(file_path, data.get("size", stat[0]), data.get("blob_id"), sample), **data}
+    except Exception as e:
+        return {"error": str(e)}, 400
+
+@app.route("/file-info/<int:project_id>")
+def file_info(project_id):
+    if "forge_token" not in session:
+        return {"error": "Unauthorized"}, 401
+    
+    file_path = request.args.get('path', '')
+    try:
+        info = file_windows.info(project_id, session["forge_token"], file_path)
+        if info is None:
+            return {"error": f"Fichier introuvable: {file_path}"}, 404
+        return info
+    except Exception as e:
+        return {"error": str(e)}, 400
+
+@app.route("/file-window/<int:project_id>")
+def file_window(project_id):
+    if "forge_token" not in session:
+        return {"error": "Unauthorized"}, 401
+    
+    file_path = request.args.get('path', '')
+    try:
+        # offset : fenêtre suivante (vers la fin du fichier) ; before : fenêtre précédente
+        window = file_windows.window(
+            project_id,
+            session["forge_token"],
+            file_path,
+            request.args.get('length', FILE_WINDOW_BYTES, type=int),
+            offset=request.args.get('offset', type=int),
+            before=request.args.get('before', type=int),
+            binary=request.args.get('mode') == 'binary'
+        )
+        if window is None:
+            return {"error": f"Fichier introuvable: {file_path}"}, 404
+        return window
     except Exception as e:
         return {"error": str(e)}, 400
 
+@app.route("/search/<int:project_id>")
+def search_files(project_id):
+    if "forge_token" not in session:
+        return {"error": "Unauthorized"}, 401
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return {"query": query, "results": []}
+    try:
+        results = search_indexes.search(project_id, session["forge_token"], query)
+        return {"query": query, "results": results}
+    except Exception as e:
+        return {"error": str(e)}, 400
+
+def _project_files(project_id):
+    """Fichiers du projet (depuis le miroir local s'il est activé), sans les .gitkeep"""
+    files = None
+    if mirrors.enabled:
+        try:
+            files = mirrors.list_files(project_id, session["forge_token"])
+        except Exception as e:
+            logging.warning(f"Miroir indisponible pour le projet {project_id}, lecture via la forge: {e}")
+    if files is None:
+        files = []
+        page = "1"
+        # Arborescence complète : toutes les pages (l'envoi de fichiers distingue création et mise à jour)
+        while page:
+            tree_response = forge().get(
+                f"{FORGE_API_URL}/projects/{project_id}/repository/tree",
+                params={"ref": "master", "recursive": "true", "per_page": 100, "page": page}
+            )
+            if tree_response.status_code != 200:
+                break
+            files += [item for item in tree_response.json() if item['type'] == 'blob']
+            page = tree_response.headers.get("X-Next-Page")
+    # Exclure les fichiers système comme .gitkeep
+    return [f for f in files if not f['path'].endswith('.gitkeep')]
+
+def _files_changed(project_id):
+    search_indexes.invalidate(project_id)
+    mirrors.invalidate(project_id)
+    previews.invalidate(project_id)
+
 @app.route("/edit/<int:project_id>", methods=["GET", "POST"])
 def edit_file(project_id):
     if "forge_token" not in session:
         return redirect(url_for("index"))
     
-    # Récupérer la liste de tous les fichiers
     files = []
     try:
-        tree_response = httpx.get(
-            f"{FORGE_API_URL}/projects/{project_id}/repository/tree",
-            headers={"Authorization": f"Bearer {session['forge_token']}"},
-            params={"ref": "master", "recursive": "true"}
-        )
-        if tree_response.status_code == 200:
-            files = [item for item in tree_response.json() if item['type'] == 'blob']
-            # Exclure les fichiers système comme .gitkeep
-            files = [f for f in files if not f['path'].endswith('.gitkeep')]
+        files = _project_files(project_id)
     except Exception as e:
         flash(f"Erreur lors de la récupération des fichiers: {str(e)}", "error")
     
@@ -173,18 +452,16 @@ def edit_file(project_id):
                 
                 # Vérifier si le fichier existe
                 try:
-                    httpx.get(
+                    forge().get(
                         f"{FORGE_API_URL}/projects/{project_id}/repository/files/{file_path.replace('/', '%2F')}",
-                        headers={"Authorization": f"Bearer {session['forge_token']}"},
                         params={"ref": "master"}
                     )
                     file_action = "update"
                 except httpx.HTTPStatusError:
                     file_action = "create"
 
-                response = httpx.post(
+                response = forge().post(
                     f"{FORGE_API_URL}/projects/{project_id}/repository/commits",
-                    headers={"Authorization": f"Bearer {session['forge_token']}"},
                     json={
                         "branch": "master",
                         "commit_message": commit_message,
@@ -200,9 +477,8 @@ def edit_file(project_id):
             
             elif action == 'delete':
                 file_path = request.form.get('file_path')
-                response = httpx.post(
+                response = forge().post(
                     f"{FORGE_API_URL}/projects/{project_id}/repository/commits",
-                    headers={"Authorization": f"Bearer {session['forge_token']}"},
                     json={
                         "branch": "master",
                         "commit_message": f"Suppression de {file_path}",
@@ -218,9 +494,8 @@ def edit_file(project_id):
             elif action == 'create_dir':
                 dir_path = request.form.get('dir_path')
                 # Créer un fichier vide pour créer le répertoire
-                response = httpx.post(
+                response = forge().post(
                     f"{FORGE_API_URL}/projects/{project_id}/repository/commits",
-                    headers={"Authorization": f"Bearer {session['forge_token']}"},
                     json={
                         "branch": "master",
                         "commit_message": f"Création du répertoire {dir_path}",
@@ -234,44 +509,137 @@ def edit_file(project_id):
                 response.raise_for_status()
                 flash("Répertoire créé avec succès!", "success")
             
-            elif action == 'upload':
-                file = request.files['file']
-                file_path = request.form.get('file_path')
-                file_content = file.read()
-                
-                # Détecter si c'est un fichier texte ou binaire
-                try:
-                    content = file_content.decode('utf-8')
-                    encoding = 'text'
-                except UnicodeDecodeError:
-                    import base64
-                    content = base64.b64encode(file_content).decode('utf-8')
-                    encoding = 'base64'
-                
-                response = httpx.post(
-                    f"{FORGE_API_URL}/projects/{project_id}/repository/commits",
-                    headers={"Authorization": f"Bearer {session['forge_token']}"},
-                    json={
-                        "branch": "master",
-                        "commit_message": f"Ajout de {file_path}",
-                        "actions": [{
-                            "action": "create",
-                            "file_path": file_path,
-                            "content": content,
-                            "encoding": encoding
-                        }]
-                    }
-                )
-                response.raise_for_status()
-                flash("Fichier uploadé avec succès!", "success")
-            
+            _files_changed(project_id)
             return redirect(url_for("edit_file", project_id=project_id))
         except Exception as e:
             flash(f"Erreur lors de l'opération: {str(e)}", "error")
     
+    preview_key = previews.grant(project_id, session["forge_token"])
     return render_template("editor.html", 
                          project_id=project_id,
-                         files=files)
+                         files=files,
+                         preview_base=url_for("preview_file", project_id=project_id, key=preview_key, path=""))
+
+@app.route("/upload/<int:project_id>", methods=["POST"])
+def upload_files(project_id):
+    """
+    Envoi de fichiers, de dossiers et d'archives ZIP (décompressées), publiés
+    en un seul commit. Avec `Accept: application/x-ndjson`, l'avancement est
+    renvoyé en flux (une ligne JSON par étape) ; sinon redirection vers l'éditeur.
+    """
+    if "forge_token" not in session:
+        return {"error": "Unauthorized"}, 401
+    
+    streaming = "application/x-ndjson" in request.headers.get("Accept", "")
+    
+    def refuse(message, status):
+        if streaming:
+            return {"error": message}, status
+        flash(message, "error")
+        return redirect(url_for("edit_file", project_id=project_id))
+    
+    # Refus avant la lecture du corps de la requête
+    if (request.content_length or 0) > UPLOAD_MAX_BYTES:
+        return refuse(f"Envoi trop volumineux (maximum {UPLOAD_MAX_BYTES // (1024 * 1024)} Mo)", 413)
+    
+    target_dir = request.form.get('target_dir', '')
+    extract = request.form.get('extract_zip', 'on') == 'on'
+    batch = UploadBatch()
+    try:
+        for storage in request.files.getlist('files'):
+            if not storage.filename:
+                continue
+            if extract and storage.filename.lower().endswith('.zip'):
+                batch.add_zip(storage, target_dir)
+            else:
+                batch.add_file(storage, target_dir)
+        if not batch:
+            raise UploadError("Aucun fichier à envoyer")
+        existing = {f['path'] for f in _project_files(project_id)}
+    except UploadError as e:
+        batch.close()
+        return refuse(str(e), 400)
+    except Exception as e:
+        batch.close()
+        return refuse(f"Erreur lors de l'opération: {str(e)}", 400)
+    
+    commit_message = request.form.get('commit_message') or f"Ajout de {len(batch)} fichier(s)"
+    client = forge()
+    commits_url = f"{FORGE_API_URL}/projects/{project_id}/repository/commits"
+    
+    def progress():
+        yield {"stage": "received", "files": len(batch), "bytes": batch.total_bytes}
+        try:
+            yield from commit_upload(client, commits_url, batch, commit_message, existing)
+            yield {"stage": "done", "files": len(batch), "bytes": batch.total_bytes}
+        except Exception as e:
+            yield {"stage": "error", "error": str(e)}
+        finally:
+            batch.close()
+            _files_changed(project_id)
+    
+    if not streaming:
+        events = list(progress())
+        if events[-1]["stage"] == "done":
+            commits = sum(1 for event in events if event["stage"] == "commit")
+            flash(f"{len(batch)} fichier(s) envoyé(s) en {commits} commit(s)", "success")
+        else:
+            flash(f"Erreur lors de l'envoi: {events[-1]['error']}", "error")
+        return redirect(url_for("edit_file", project_id=project_id))
+    
+    response = app.response_class(
+        stream_with_context(json.dumps(event) + "\n" for event in progress()),
+        mimetype="application/x-ndjson"
+    )
+    response.headers["Cache-Control"] = "no-store"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@app.route("/preview/<int:project_id>/", defaults={"path": ""})
+@app.route("/preview/<int:project_id>/<path:path>")
+def preview_project(project_id, path):
+    if "forge_token" not in session:
+        return redirect(url_for("index"))
+    
+    # Redirection vers l'URL de l'aperçu portant la clé d'accès
+    key = previews.grant(project_id, session["forge_token"])
+    return redirect(url_for("preview_file", project_id=project_id, key=key, path=path))
+
+@app.route("/preview/<int:project_id>/~<key>/", defaults={"path": ""})
+@app.route("/preview/<int:project_id>/~<key>/<path:path>")
+def preview_file(project_id, key, path):
+    response = app.make_response(_preview_response(project_id, key, path))
+    # La clé d'accès figure dans l'URL : jamais transmise aux sites liés ou chargés par la page
+    response.headers["Referrer-Policy"] = "no-referrer"
+    # Contenu des élèves (et messages d'erreur) isolé de l'origine de l'application
+    response.headers["Content-Security-Policy"] = PREVIEW_CSP
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+def _preview_response(project_id, key, path):
+    token = previews.token_for(project_id, key)
+    if token is None:
+        return "Aperçu expiré : rouvrez-le depuis l'éditeur", 403, PLAIN_TEXT
+    
+    try:
+        resolved = previews.resolve(project_id, token, path)
+        if resolved is None:
+            # Chemin issu de l'URL : renvoyé en texte brut, jamais interprété comme du HTML
+            return f"Fichier introuvable: {path}", 404, PLAIN_TEXT
+        if resolved[0] == "redirect":
+            return redirect(url_for("preview_file", project_id=project_id, key=key, path=resolved[1]))
+        
+        _, file_path, blob_id = resolved
+        # Le SHA du blob identifie exactement le contenu : ETag sans relire le fichier
+        if request.if_none_match.contains(blob_id):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(previews.blob(project_id, token, blob_id), content_type=mimetype_for(file_path))
+        response.set_etag(blob_id)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+    except Exception as e:
+        return f"Erreur lors de l'aperçu: {str(e)}", 502, PLAIN_TEXT
 
 @app.route("/trigger-pipeline/<int:project_id>", methods=["POST"])
 def trigger_pipeline(project_id):
@@ -279,29 +647,27 @@ def trigger_pipeline(project_id):
         return redirect(url_for("index"))
     
     try:
-        # Vérifier quelle branche existe (master ou main)
-        default_branch = "master"
-        branch_response = httpx.get(
-            f"{FORGE_API_URL}/projects/{project_id}/repository/branches/master",
-            headers={"Authorization": f"Bearer {session['forge_token']}"}
-        )
-        if branch_response.status_code != 200:
-            branch_response = httpx.get(
-                f"{FORGE_API_URL}/projects/{project_id}/repository/branches/main",
-                headers={"Authorization": f"Bearer {session['forge_token']}"}
+        # Vérifier quelle branche existe (master ou main), une fois par session et par projet
+        default_branches = sessions.cache(session, "default_branch")
+        default_branch = default_branches.get(project_id)
+        if default_branch is None:
+            default_branch = "master"
+            branch_response = forge().get(
+                f"{FORGE_API_URL}/projects/{project_id}/repository/branches/master"
             )
-            if branch_response.status_code == 200:
-                default_branch = "main"
-            else:
-                raise Exception("Aucune branche principale (master/main) trouvée")
+            if branch_response.status_code != 200:
+                branch_response = forge().get(
+                    f"{FORGE_API_URL}/projects/{project_id}/repository/branches/main"
+                )
+                if branch_response.status_code == 200:
+                    default_branch = "main"
+                else:
+                    raise Exception("Aucune branche principale (master/main) trouvée")
+            default_branches[project_id] = default_branch
 
         # Lancer le pipeline avec une requête plus simple
-        response = httpx.post(
+        response = forge().post(
             f"{FORGE_API_URL}/projects/{project_id}/pipeline",
-            headers={
-                "Authorization": f"Bearer {session['forge_token']}",
-                "Content-Type": "application/json"
-            },
             json={
                 "ref": default_branch
             }
@@ -312,11 +678,86 @@ def trigger_pipeline(project_id):
         logging.info(f"Body: {response.text}")
         response.raise_for_status()
         flash("Pipeline lancé avec succès!", "success")
+        # Suivi des journaux des jobs du pipeline lancé
+        return redirect(url_for("pipeline_view", project_id=project_id, pipeline_id=response.json()["id"]))
     except Exception as e:
         flash(f"Erreur lors du lancement du pipeline: {str(e)}", "error")
     
     return redirect(url_for("repos"))
 
+@app.route("/pipeline/<int:project_id>", defaults={"pipeline_id": None})
+@app.route("/pipeline/<int:project_id>/<int:pipeline_id>")
+def pipeline_view(project_id, pipeline_id):
+    if "forge_token" not in session:
+        return redirect(url_for("index"))
+    
+    try:
+        if pipeline_id is None:
+            # Dernier pipeline du projet
+            response = forge().get(
+                f"{FORGE_API_URL}/projects/{project_id}/pipelines",
+                params={"per_page": 1}
+            )
+            response.raise_for_status()
+            pipelines = response.json()
+            if not pipelines:
+                flash("Aucun pipeline pour ce dépôt", "info")
+                return redirect(url_for("repos"))
+            return redirect(url_for("pipeline_view", project_id=project_id, pipeline_id=pipelines[0]["id"]))
+        
+        response = forge().get(f"{FORGE_API_URL}/projects/{project_id}/pipelines/{pipeline_id}")
+        response.raise_for_status()
+        pipeline = response.json()
+        response = forge().get(
+            f"{FORGE_API_URL}/projects/{project_id}/pipelines/{pipeline_id}/jobs",
+            params={"per_page": 100}
+        )
+        response.raise_for_status()
+        jobs = sorted(response.json(), key=lambda job: job["id"])
+    except Exception as e:
+        flash(f"Erreur lors de la récupération du pipeline: {str(e)}", "error")
+        return redirect(url_for("repos"))
+    
+    # Job affiché : celui demandé, sinon le premier en échec, en cours, ou le dernier
+    selected = request.args.get('job', type=int)
+    if selected not in [job["id"] for job in jobs]:
+        selected = next(
+            (job["id"] for status in ("failed", "running") for job in jobs if job["status"] == status),
+            jobs[-1]["id"] if jobs else None
+        )
+    return render_template("pipeline.html", project_id=project_id, pipeline=pipeline, jobs=jobs, selected=selected)
+
+@app.route("/jobs/<int:project_id>/<int:job_id>/events")
+def job_log_events(project_id, job_id):
+    if "forge_token" not in session:
+        return {"error": "Non authentifié"}, 401
+    
+    token = session["forge_token"]
+    # Reprise après reconnexion : l'identifiant du dernier événement reçu est l'offset du journal
+    start = request.headers.get("Last-Event-ID") or request.args.get("offset", "0")
+    
+    def stream():
+        offset = int(start) if start.isdigit() else 0
+        status = None
+        while True:
+            update = job_logs.follow(project_id, token, job_id, offset)
+            if update["status"] != status:
+                status = update["status"]
+                yield f"event: status\ndata: {json.dumps({'status': status})}\n\n"
+            if update["text"]:
+                offset = update["offset"]
+                yield f"id: {offset}\nevent: log\ndata: {json.dumps({'text': update['text']})}\n\n"
+            if update["done"]:
+                yield f"event: end\ndata: {json.dumps({'status': status, 'error': update['error']})}\n\n"
+                return
+            if not update["text"]:
+                yield ": running\n\n"
+    
+    response = app.response_class(stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
 @app.route("/upload-avatar/<int:project_id>", methods=["POST"])
 def upload_avatar(project_id):
     if "forge_token" not in session:
@@ -332,23 +773,20 @@ def upload_avatar(project_id):
             flash("Aucun fichier sélectionné", "error")
             return redirect(url_for("repos"))
             
-        # Vérifier le type de fichier
-        if not avatar_file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-            flash("Format de fichier non supporté. Utilisez PNG, JPG, JPEG ou GIF.", "error")
-            return redirect(url_for("repos"))
-            
-        # Lire le contenu du fichier
-        avatar_data = avatar_file.read()
+        # Lire le fichier en bornant la quantité de données chargée en mémoire
+        avatar_data = avatar_file.stream.read(AVATAR_MAX_INPUT_BYTES + 1)
         
-        # Convertir en base64
-        import base64
-        avatar_base64 = base64.b64encode(avatar_data).decode('utf-8')
+        # Vérifier le type réel de l'image, la réduire et la recompresser
+        try:
+            content, filename, mimetype = prepare_avatar(avatar_data)
+        except ValueError as e:
+            flash(str(e), "error")
+            return redirect(url_for("repos"))
         
-        # Mettre à jour l'avatar du projet
-        response = httpx.put(
+        # Mettre à jour l'avatar du projet (envoi multipart, sans base64)
+        response = forge().put(
             f"{FORGE_API_URL}/projects/{project_id}",
-            headers={"Authorization": f"Bearer {session['forge_token']}"},
-            json={"avatar": avatar_base64}
+            files={"avatar": (filename, content, mimetype)}
         )
         response.raise_for_status()
         flash("Avatar du dépôt mis à jour avec succès!", "success")
@@ -364,9 +802,8 @@ def edit_repo(project_id):
     
     try:
         # Récupérer les détails du dépôt
-        response = httpx.get(
-            f"{FORGE_API_URL}/projects/{project_id}",
-            headers={"Authorization": f"Bearer {session['forge_token']}"}
+        response = forge().get(
+            f"{FORGE_API_URL}/projects/{project_id}"
         )
         response.raise_for_status()
         repo = response.json()
@@ -388,12 +825,12 @@ def update_repo(project_id):
             description = request.form.get("description")
             
             # Mettre à jour la description du dépôt
-            response = httpx.put(
+            response = forge().put(
                 f"{FORGE_API_URL}/projects/{project_id}",
-                headers={"Authorization": f"Bearer {session['forge_token']}"},
                 json={"description": description}
             )
             response.raise_for_status()
+            _forget_project_list()
             flash("Description du dépôt mise à jour avec succès!", "success")
         
     except Exception as e:
@@ -414,11 +851,12 @@ def delete_repo(project_id):
     
     try:
         # Supprimer le dépôt
-        response = httpx.delete(
-            f"{FORGE_API_URL}/projects/{project_id}",
-            headers={"Authorization": f"Bearer {session['forge_token']}"}
+        response = forge().delete(
+            f"{FORGE_API_URL}/projects/{project_id}"
         )
         response.raise_for_status()
+        owned_projects.remove(session["forge_token"], project_id)
+        _forget_project_list()
         flash("Dépôt supprimé avec succès!", "success")
     except Exception as e:
         flash(f"Erreur lors de la suppression du dépôt: {str(e)}", "error")
@@ -435,18 +873,32 @@ def toggle_visibility(project_id):
         # Inverser la visibilité
         new_visibility = "private" if current_visibility == "public" else "public"
         
-        response = httpx.put(
+        response = forge().put(
             f"{FORGE_API_URL}/projects/{project_id}",
-            headers={"Authorization": f"Bearer {session['forge_token']}"},
             json={"visibility": new_visibility}
         )
         response.raise_for_status()
+        _forget_project_list()
         flash(f"Visibilité du dépôt modifiée avec succès en '{new_visibility}'!", "success")
     except Exception as e:
         flash(f"Erreur lors de la modification de la visibilité: {str(e)}", "error")
     
     return redirect(url_for("repos"))
 
+@app.route("/health")
+def health():
+    # Sonde de disponibilité utilisée par les lanceurs et l'orchestrateur
+    return {"status": "ok"}
+
+@app.route("/metrics/forge")
+def forge_metrics():
+    # Réservé à la supervision, comme les métriques de l'API
+    error = metrics.check_token(request.headers.get(metrics.METRICS_HEADER))
+    if error is not None:
+        return {"error": "Accès aux métriques refusé"}, error
+    # Requêtes vers la forge regroupées entre sessions (`coalesced` : appels amont évités) et cache de revalidation
+    return {**sync_transport.metrics(), "http_cache": http_cache.metrics()}
+
 @app.route("/help")
 def help_page():
     return render_template("help.html")
@@ -457,33 +909,78 @@ def fork_template():
         return redirect(url_for("index"))
     
     try:
-        # Vérifier si le dépôt existe déjà
-        repos_response = httpx.get(
-            f"{FORGE_API_URL}/projects?membership=true&search={request.form.get('new_name')}",
-            headers={"Authorization": f"Bearer {session['forge_token']}"}
-        )
-        repos_response.raise_for_status()
-        
-        if len(repos_response.json()) > 0:
+        # Vérifier si le dépôt existe déjà (index local, correspondance exacte)
+        if owned_projects.exists(session["forge_token"], request.form.get("new_name", "")):
             flash("Un dépôt avec ce nom existe déjà", "error")
             return redirect(url_for("repos"))
             
         # Forker le template
-        response = httpx.post(
+        response = forge().post(
             f"{FORGE_API_URL}/projects/spy%2Ftemplatehtml/fork",  # URL du template: https://forge.apps.education.fr/spy/templatehtml.git
-            headers={"Authorization": f"Bearer {session['forge_token']}"},
             json={
                 "name": request.form.get("new_name"),
                 "path": request.form.get("new_name"),  # Ajout du path pour éviter les conflits
-                "namespace": request.form.get("namespace")
+                "namespace": request.form.get("namespace") or sessions.identity(session)["namespace"]
             }
         )
         response.raise_for_status()
-        flash("Template forké avec succès!", "success")
+        project = response.json()
+        owned_projects.add(session["forge_token"], project)
+        _forget_project_list()
+        register_webhook(project["id"], session["forge_token"])
+        # L'import du contenu est asynchrone côté forge : attente sur une page dédiée
+        imports.track(project["id"], session["forge_token"])
+        return redirect(url_for("fork_wait", project_id=project["id"], name=project.get("name", "")))
     except Exception as e:
         flash(f"Erreur lors du fork: {str(e)}", "error")
     
     return redirect(url_for("repos"))
 
+@app.route("/fork-wait/<int:project_id>")
+def fork_wait(project_id):
+    if "forge_token" not in session:
+        return redirect(url_for("index"))
+    
+    status = imports.status(project_id, session["forge_token"])
+    if status is None or status["state"] == "ready":
+        return redirect(url_for("edit_file", project_id=project_id))
+    return render_template("fork_wait.html", project_id=project_id, name=request.args.get("name", ""))
+
+@app.route("/fork-status/<int:project_id>")
+def fork_status(project_id):
+    if "forge_token" not in session:
+        return {"error": "Non authentifié"}, 401
+    
+    status = imports.status(project_id, session["forge_token"])
+    if status is None:
+        # Import inconnu (déjà terminé et oublié) : le dépôt est utilisable
+        status = {"project_id": project_id, "state": "ready", "import_status": None, "error": None}
+    return status
+
+@app.route("/fork-status/<int:project_id>/events")
+def fork_events(project_id):
+    if "forge_token" not in session:
+        return {"error": "Non authentifié"}, 401
+    
+    token = session["forge_token"]
+    
+    def stream():
+        # Un événement par changement d'état ; commentaire périodique pour garder la connexion
+        while True:
+            status = imports.wait(project_id, token, 15)
+            if status is None:
+                status = {"project_id": project_id, "state": "ready", "import_status": None, "error": None}
+            if status["state"] != "importing":
+                yield f"event: status\ndata: {json.dumps(status)}\n\n"
+                return
+            yield ": importing\n\n"
+    
+    response = app.response_class(stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host=os.getenv("FLASK_HOST", "0.0.0.0"),
+            port=int(os.getenv("FLASK_PORT", "5000")),
+            debug=os.getenv("FLASK_DEBUG", "True").lower() in ("true", "1", "t"))